@@ -0,0 +1,114 @@
+"""
+Compare the throughput of the selector-based pipe pump used by :meth:`virtool.jobs.job.Job.run_subprocess` with the
+thread and queue implementation it replaced.
+
+Usage:
+
+.. code-block:: bash
+
+    python benchmarks/pipes.py --lines 2000000
+
+"""
+import argparse
+import io
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import virtool.jobs.classes  # noqa: F401 (avoids a circular import)
+import virtool.jobs.job
+import virtool.sam
+
+#: A SAM-like line similar to those written by Bowtie2.
+LINE = "read_1\t0\tNC_016509\t1250\t42\t100M\t*\t0\t0\t" + "A" * 100 + "\t" + "I" * 100 + "\tAS:i:0\tXN:i:0"
+
+
+def watch_pipe(stream: io.BufferedReader, q: queue.Queue):
+    while True:
+        line = stream.readline()
+
+        if not line:
+            return
+
+        q.put(line)
+
+
+def run_threaded(process: subprocess.Popen, handler):
+    """
+    The original thread and queue pipe handling from :meth:`virtool.jobs.job.Job.run_subprocess`.
+
+    """
+    stdout_queue = queue.Queue()
+    stderr_queue = queue.Queue()
+
+    stdout_thread = threading.Thread(target=watch_pipe, args=(process.stdout, stdout_queue), daemon=True)
+    stderr_thread = threading.Thread(target=watch_pipe, args=(process.stderr, stderr_queue), daemon=True)
+
+    stdout_thread.start()
+    stderr_thread.start()
+
+    while True:
+        while not stdout_queue.empty():
+            handler(stdout_queue.get())
+
+        while not stderr_queue.empty():
+            stderr_queue.get()
+
+        alive = stdout_thread.is_alive() or stderr_thread.is_alive()
+
+        if not alive and stderr_queue.empty() and stdout_queue.empty() and process.poll() is not None:
+            break
+
+
+def run_selector(process: subprocess.Popen, handler, block_size=None):
+    virtool.jobs.job.pump_pipes({
+        process.stdout: (handler, block_size),
+        process.stderr: (lambda line: None, None)
+    })
+
+    process.wait()
+
+
+def measure(name: str, count: int, pump, **kwargs):
+    script = f"import sys; sys.stdout.writelines([{LINE!r} + '\\n'] * {count})"
+
+    process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    received = [0, 0]
+
+    def handler(data):
+        received[0] += 1
+        received[1] += len(data)
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    pump(process, handler, **kwargs)
+
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    assert received[1] == count * (len(LINE) + 1)
+
+    print(f"{name:<20}{count / wall:>14,.0f}{wall:>10.2f}{cpu:>10.2f}{received[0]:>12,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lines", type=int, default=1000000, help="number of lines written by the subprocess")
+    args = parser.parse_args()
+
+    print(f"{'implementation':<20}{'lines/s':>14}{'wall (s)':>10}{'cpu (s)':>10}{'calls':>12}")
+
+    measure("thread + queue", args.lines, run_threaded)
+    measure("selector (lines)", args.lines, run_selector)
+    measure("selector (blocks)", args.lines, run_selector, block_size=virtool.sam.BLOCK_SIZE)
+
+
+if __name__ == "__main__":
+    main()
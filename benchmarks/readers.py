@@ -0,0 +1,176 @@
+"""
+Compare the chunked FASTA and FASTQ readers in :mod:`virtool.bio` with the line-by-line generators they replaced.
+
+Uncompressed and GZIP-compressed fixtures are generated in a temporary directory.
+
+Usage:
+
+.. code-block:: bash
+
+    python benchmarks/readers.py --reads 2000000 --contigs 20000
+
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import virtool.bio
+
+
+def read_fasta_lines(path: str) -> list:
+    """
+    The original line-by-line implementation of :func:`virtool.bio.read_fasta`.
+
+    """
+    data = list()
+
+    with open(path, "r") as f:
+        header = None
+        seq = []
+
+        for line in f:
+            if line[0] == ">":
+                if header:
+                    data.append((header, "".join(seq)))
+
+                header = line.rstrip().replace(">", "")
+                seq = []
+                continue
+
+            if header:
+                seq.append(line.rstrip())
+                continue
+
+            raise IOError(f"Illegal FASTA line: {line}")
+
+        if header:
+            data.append((header, "".join(seq)))
+
+    return data
+
+
+def read_fastq_from_path_lines(path: str):
+    """
+    The original implementation of :func:`virtool.bio.read_fastq_from_path`. GZIP is detected by catching
+    :class:`UnicodeDecodeError`.
+
+    """
+    try:
+        with open(path, "r") as f:
+            yield from virtool.bio.read_fastq(f)
+    except UnicodeDecodeError:
+        with gzip.open(path, "rt") as f:
+            yield from virtool.bio.read_fastq(f)
+
+
+def read_fastq_headers_lines(path: str) -> list:
+    """
+    The original line-by-line implementation of :func:`virtool.bio.read_fastq_headers`.
+
+    """
+    headers = list()
+
+    had_plus = False
+
+    with open(path, "r") as f:
+        for line in f:
+            if line == "+\n":
+                had_plus = True
+                continue
+
+            if not had_plus and line[0] == "@":
+                headers.append(line.rstrip())
+                continue
+
+            if had_plus:
+                had_plus = False
+
+    return headers
+
+
+def write_fixtures(path: str, reads: int, contigs: int) -> dict:
+    random.seed(1)
+
+    fastq_path = os.path.join(path, "reads.fq")
+    fasta_path = os.path.join(path, "contigs.fa")
+
+    sequence = "".join(random.choice("ACGT") for _ in range(100))
+
+    with open(fastq_path, "w") as f:
+        for i in range(reads):
+            f.write(f"@HWI-ST1410:82:C2VAGACXX:7:1101:{i}:1859 1:N:0:AGTCAA\n{sequence}\n+\n{'I' * 100}\n")
+
+    with open(fastq_path, "rb") as f, gzip.open(fastq_path + ".gz", "wb", compresslevel=1) as g:
+        g.write(f.read())
+
+    with open(fasta_path, "w") as f:
+        for i in range(contigs):
+            contig = sequence * random.randint(3, 30)
+            lines = [contig[j:j + 60] for j in range(0, len(contig), 60)]
+            f.write(f">NODE_{i}_length_{len(contig)}\n" + "\n".join(lines) + "\n")
+
+    return {
+        "fastq": fastq_path,
+        "fastq.gz": fastq_path + ".gz",
+        "fasta": fasta_path
+    }
+
+
+def count_batches(path: str, **kwargs) -> int:
+    return sum(len(batch.headers) for batch in virtool.bio.read_fastq_batches(path, **kwargs))
+
+
+def measure(name: str, func, path: str) -> int:
+    wall = time.perf_counter()
+
+    result = func(path)
+
+    wall = time.perf_counter() - wall
+
+    count = result if isinstance(result, int) else len(result)
+
+    print(f"{name:<32}{count / wall:>16,.0f}{wall:>10.2f}")
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reads", type=int, default=1000000, help="number of reads in the FASTQ fixture")
+    parser.add_argument("--contigs", type=int, default=10000, help="number of contigs in the FASTA fixture")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        paths = write_fixtures(path, args.reads, args.contigs)
+
+        print(f"{'implementation':<32}{'records/s':>16}{'wall (s)':>10}")
+
+        for key in ("fastq", "fastq.gz"):
+            counts = {
+                measure(f"{key} lines", lambda p: list(read_fastq_from_path_lines(p)), paths[key]),
+                measure(f"{key} chunked", lambda p: list(virtool.bio.read_fastq_from_path(p)), paths[key]),
+                measure(f"{key} batches", count_batches, paths[key]),
+                measure(f"{key} batches (arrays)", lambda p: count_batches(p, as_arrays=True), paths[key])
+            }
+
+            assert len(counts) == 1
+
+        assert read_fastq_headers_lines(paths["fastq"]) == virtool.bio.read_fastq_headers(paths["fastq"])
+
+        measure("fastq headers lines", read_fastq_headers_lines, paths["fastq"])
+        measure("fastq headers chunked", virtool.bio.read_fastq_headers, paths["fastq"])
+
+        assert read_fasta_lines(paths["fasta"]) == virtool.bio.read_fasta(paths["fasta"])
+
+        measure("fasta lines", read_fasta_lines, paths["fasta"])
+        measure("fasta chunked", virtool.bio.read_fasta, paths["fasta"])
+
+
+if __name__ == "__main__":
+    main()
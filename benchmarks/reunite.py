@@ -0,0 +1,115 @@
+"""
+Compare the paired-read reunion used by :meth:`virtool.jobs.nuvs.Job.reunite_pairs` with the header set and
+text parsing implementation it replaced.
+
+A fixture of gzipped paired FASTQ files is generated in a temporary directory. One in four pairs is chosen as unmapped.
+
+Usage:
+
+.. code-block:: bash
+
+    python benchmarks/reunite.py --pairs 10000000 --threads 4
+
+"""
+import argparse
+import gzip
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import virtool.bio
+from readers import read_fastq_from_path_lines, read_fastq_headers_lines
+
+#: A sequence and quality similar to those in a 100 bp Illumina read.
+SEQUENCE = "ACGT" * 25
+QUALITY = "I" * 100
+
+
+def write_fixture(path: str, pairs: int):
+    random.seed(1)
+
+    read_paths = [os.path.join(path, f"reads_{suffix}.fq.gz") for suffix in (1, 2)]
+    unmapped_path = os.path.join(path, "unmapped_hosts.fq")
+
+    with gzip.open(read_paths[0], "wt", compresslevel=1) as left, \
+            gzip.open(read_paths[1], "wt", compresslevel=1) as right, \
+            open(unmapped_path, "w") as unmapped:
+        for i in range(pairs):
+            root = f"@HWI-ST1410:82:C2VAGACXX:7:{i // 1000000}:{i % 1000000}:{random.randrange(100000)}"
+
+            left.write(f"{root} 1:N:0:AGTCAA\n{SEQUENCE}\n+\n{QUALITY}\n")
+            right.write(f"{root} 2:N:0:AGTCAA\n{SEQUENCE}\n+\n{QUALITY}\n")
+
+            if random.random() < 0.25:
+                unmapped.write(f"{root} 1:N:0:AGTCAA\n{SEQUENCE}\n+\n{QUALITY}\n")
+
+    return read_paths, unmapped_path
+
+
+def run_original(read_paths, unmapped_path, output_paths, threads):
+    """
+    The original header set implementation from :meth:`virtool.jobs.nuvs.Job.reunite_pairs`.
+
+    """
+    headers = read_fastq_headers_lines(unmapped_path)
+
+    unmapped_roots = {h.split(" ")[0] for h in headers}
+
+    for read_path, output_path in zip(read_paths, output_paths):
+        with open(output_path, "w") as f:
+            for header, seq, quality in read_fastq_from_path_lines(read_path):
+                if header.split(" ")[0] in unmapped_roots:
+                    f.write("\n".join([header, seq, "+", quality]) + "\n")
+
+
+def run_hashed(read_paths, unmapped_path, output_paths, threads):
+    root_hashes = virtool.bio.read_fastq_root_hashes(unmapped_path)
+    virtool.bio.write_paired_reads(read_paths, output_paths, root_hashes, threads)
+
+
+def measure(name: str, func, read_paths, unmapped_path, path, threads):
+    output_paths = [os.path.join(path, f"{name}_{suffix}.fq") for suffix in (1, 2)]
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    func(read_paths, unmapped_path, output_paths, threads)
+
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    # The peak resident set size of this process so far in megabytes.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"{name:<12}{wall:>10.2f}{cpu:>10.2f}{peak:>12,.0f}")
+
+    return output_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pairs", type=int, default=1000000, help="number of read pairs in the fixture")
+    parser.add_argument("--threads", type=int, default=1, help="decompression threads per read file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        read_paths, unmapped_path = write_fixture(path, args.pairs)
+
+        print(f"{'method':<12}{'wall (s)':>10}{'cpu (s)':>10}{'peak (MB)':>12}")
+
+        # The hashed method runs first so that its peak memory is not inflated by the original.
+        hashed = measure("hashed", run_hashed, read_paths, unmapped_path, path, args.threads)
+        original = measure("original", run_original, read_paths, unmapped_path, path, args.threads)
+
+        for left, right in zip(hashed, original):
+            with open(left, "rb") as f, open(right, "rb") as g:
+                assert f.read() == g.read()
+
+
+if __name__ == "__main__":
+    main()
@@ -113,8 +113,15 @@ export default function WSConnection({ getState, dispatch }) {
             this.interval = 500;
         };
 
+        // A frame contains a single message or an array of messages batched by the server.
         this.connection.onmessage = e => {
-            this.handle(JSON.parse(e.data));
+            const data = JSON.parse(e.data);
+
+            if (Array.isArray(data)) {
+                return data.forEach(this.handle);
+            }
+
+            this.handle(data);
         };
 
         this.connection.onclose = () => {
@@ -159,6 +159,76 @@ async def test_remove(mocker, error, spawn_client, resp_is):
     assert m_remove.called_with("data/samples/baz/analyses/foobar", True)
 
 
+@pytest.mark.parametrize("error", [None, "400_level", "404_analysis", "404_sequence", "409_workflow", "409_ready"])
+async def test_get_coverage(error, spawn_client, resp_is):
+    client = await spawn_client(authorize=True)
+
+    await client.db.samples.insert_one({
+        "_id": "baz",
+        "all_read": True,
+        "all_write": False,
+        "group": "tech",
+        "group_read": True,
+        "group_write": True,
+        "user": {
+            "id": "fred"
+        }
+    })
+
+    if error != "404_analysis":
+        await client.db.analyses.insert_one({
+            "_id": "foobar",
+            "ready": error != "409_ready",
+            "workflow": "nuvs" if error == "409_workflow" else "pathoscope_bowtie",
+            "results": [
+                {
+                    "id": "foo",
+                    "align": [0, 1, 1, 0]
+                }
+            ],
+            "sample": {
+                "id": "baz"
+            }
+        })
+
+    sequence_id = "bar" if error == "404_sequence" else "foo"
+    level = 7 if error == "400_level" else 2
+
+    resp = await client.get(f"/api/analyses/foobar/coverage/{sequence_id}?level={level}")
+
+    if error == "400_level":
+        assert await resp_is.bad_request(resp, "Invalid level")
+        return
+
+    if error == "404_analysis":
+        assert await resp_is.not_found(resp)
+        return
+
+    if error == "404_sequence":
+        assert await resp_is.not_found(resp, "Sequence not found")
+        return
+
+    if error == "409_workflow":
+        assert await resp_is.conflict(resp, "Not a Pathoscope analysis")
+        return
+
+    if error == "409_ready":
+        assert await resp_is.conflict(resp, "Analysis is still running")
+        return
+
+    assert resp.status == 200
+
+    assert await resp.json() == {
+        "id": "foo",
+        "level": 2,
+        "levels": 3,
+        "coordinates": [[0, 0], [1, 1], [2, 1], [3, 0]]
+    }
+
+    # The coverage documents are stored for later requests.
+    assert await client.db.coverage.count_documents({"analysis.id": "foobar"}) == 2
+
+
 @pytest.mark.parametrize("error", [None, "400", "403", "404_analysis", "404_sequence", "409_workflow", "409_ready"])
 async def test_blast(error, mocker, spawn_client, resp_is, static_time):
     """
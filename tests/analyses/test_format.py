@@ -3,6 +3,7 @@ import json
 import pytest
 
 import virtool.analyses.format
+import virtool.analyses.utils
 
 
 @pytest.mark.parametrize("loadable", [True, False])
@@ -72,3 +73,111 @@ async def test_load_results(loadable, mocker, tmpdir):
 
 
 
+
+
+@pytest.mark.parametrize("ready", [True, False])
+async def test_format_cached(ready, mocker):
+    """
+    Test that formatted results are cached for ready analyses and that the rest of the document is always taken from
+    the passed document.
+
+    """
+    app = {
+        "formatted_analyses": virtool.analyses.utils.FormattedCache()
+    }
+
+    calls = list()
+
+    async def func(_, document):
+        calls.append(document["_id"])
+        return {**document, "results": [{"id": "otu", "version": 2}]}
+
+    document = {
+        "_id": "foo",
+        "ready": ready,
+        "workflow": "pathoscope_bowtie",
+        "index": {
+            "id": "bar",
+            "version": 1
+        },
+        "subtraction": {
+            "id": "Arabidopsis"
+        }
+    }
+
+    first = await virtool.analyses.format.format_cached(app, document, func)
+
+    second = await virtool.analyses.format.format_cached(app, {**document, "subtraction": {"id": "Human"}}, func)
+
+    assert first["results"] == second["results"] == [{"id": "otu", "version": 2}]
+    assert second["subtraction"] == {"id": "Human"}
+
+    assert calls == (["foo"] if ready else ["foo", "foo"])
+    assert ("foo" in app["formatted_analyses"]) is ready
+
+
+async def test_gather_patched_otus(mocker):
+    """
+    Test that each OTU version is only patched once and no more than :data:`.PATCH_CONCURRENCY` OTUs are patched at a
+    time.
+
+    """
+    import asyncio
+
+    mocker.patch("virtool.analyses.format.PATCH_CONCURRENCY", 3)
+
+    running = list()
+    peak = list()
+
+    async def get_patched_otu(_, otu_id, version):
+        running.append(otu_id)
+        peak.append(len(running))
+        await asyncio.sleep(0)
+        running.remove(otu_id)
+        return {"_id": otu_id, "version": version}
+
+    mocker.patch("virtool.history.db.get_patched_otu", new=get_patched_otu)
+
+    results = [{"otu": {"id": f"otu_{i % 10}", "version": 1}} for i in range(20)]
+
+    patched = await virtool.analyses.format.gather_patched_otus({}, results)
+
+    assert patched == {f"otu_{i}": {"_id": f"otu_{i}", "version": 1} for i in range(10)}
+    assert max(peak) == 3
+
+
+async def test_get_coverage_level(mocker, dbi):
+    """
+    Test that stored coverage levels are returned without loading the analysis results.
+
+    """
+    m_load_results = mocker.patch("virtool.analyses.format.load_results")
+
+    await dbi.coverage.insert_one({
+        "_id": "foobar.foo",
+        "analysis": {
+            "id": "foobar"
+        },
+        "sequence": {
+            "id": "foo"
+        },
+        "levels": [[[0, 0], [3, 0]], [[0, 0], [1, 1], [2, 1], [3, 0]]]
+    })
+
+    app = {
+        "db": dbi,
+        "settings": {
+            "data_path": "/foo"
+        }
+    }
+
+    document = {
+        "_id": "foobar",
+        "sample": {
+            "id": "baz"
+        }
+    }
+
+    assert await virtool.analyses.format.get_coverage_level(app, document, "foo", 1) == [[0, 0], [1, 1], [2, 1], [3, 0]]
+
+    assert not m_load_results.called
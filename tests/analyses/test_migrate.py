@@ -2,6 +2,7 @@ import os
 import pytest
 import json
 import virtool.analyses.migrate
+import virtool.analyses.utils
 from aiohttp.test_utils import make_mocked_coro
 
 
@@ -125,6 +126,11 @@ async def test_migrate_analyses(mocker, dbi):
         make_mocked_coro()
     )
 
+    m_move_coverage_to_files = mocker.patch(
+        "virtool.analyses.migrate.move_coverage_to_files",
+        make_mocked_coro()
+    )
+
     m_delete_unready = mocker.patch(
         "virtool.db.migrate.delete_unready",
         make_mocked_coro()
@@ -136,6 +142,7 @@ async def test_migrate_analyses(mocker, dbi):
     m_rename_results_field.assert_called_with(dbi)
     m_convert_pathoscope_files.assert_called_with(dbi, settings)
     m_rename_analysis_json_files.assert_called_with(settings)
+    m_move_coverage_to_files.assert_called_with(app)
     m_delete_unready.assert_called_with(dbi.analyses)
 
 
@@ -217,6 +224,78 @@ async def test_convert_pathoscope_files(exclusion, mocker, dbi):
     ])
 
 
+@pytest.mark.parametrize("in_file", [True, False])
+async def test_move_coverage_to_file(in_file, dbi, tmpdir):
+    """
+    Test that depth lists are moved into a coverage file, median depths are added to hits that don't have them, and
+    results stored in a file are moved back into the analysis document.
+
+    """
+    async def run_in_thread(func, *args):
+        return func(*args)
+
+    app = {
+        "db": dbi,
+        "run_in_thread": run_in_thread,
+        "settings": {
+            "data_path": str(tmpdir)
+        }
+    }
+
+    results = [
+        {
+            "id": "foo",
+            "align": [1, 2, 2, 5]
+        },
+        {
+            "id": "bar",
+            "align": [3, 3, 3],
+            "median": 3
+        }
+    ]
+
+    analysis_dir = tmpdir.mkdir("samples").mkdir("baz").mkdir("analysis").mkdir("bar")
+
+    if in_file:
+        analysis_dir.join("results.json").write(json.dumps(results))
+
+    document = {
+        "_id": "bar",
+        "results": "file" if in_file else results,
+        "sample": {
+            "id": "baz"
+        }
+    }
+
+    await dbi.analyses.insert_one(document)
+
+    await virtool.analyses.migrate.move_coverage_to_file(app, document)
+
+    assert await dbi.analyses.find_one() == {
+        "_id": "bar",
+        "results": [
+            {
+                "id": "foo",
+                "median": 2
+            },
+            {
+                "id": "bar",
+                "median": 3
+            }
+        ],
+        "sample": {
+            "id": "baz"
+        }
+    }
+
+    assert not analysis_dir.join("results.json").exists()
+
+    assert virtool.analyses.utils.read_coverage_file(str(analysis_dir.join("coverage.npz"))) == {
+        "foo": [1, 2, 2, 5],
+        "bar": [3, 3, 3]
+    }
+
+
 async def test_rename_analysis_json_files(tmpdir):
     """
     Test that all and only the `nuvs.json` and `pathoscope.json` files are renamed.
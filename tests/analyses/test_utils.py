@@ -1,3 +1,4 @@
+import numpy
 import pytest
 
 import virtool.analyses.utils
@@ -30,3 +31,183 @@ def test_get_json_path(name):
     """
     path = virtool.analyses.utils.join_analysis_json_path("/data", "bar", "foo")
     assert path == "/data/samples/foo/analysis/bar/results.json"
+
+
+class TestFormattedCache:
+
+    def test_get(self):
+        cache = virtool.analyses.utils.FormattedCache()
+
+        cache.set("foo", ("pathoscope_bowtie", "bar", "baz", 2), [{"id": "otu"}], {"otu": 3})
+
+        assert cache.get("foo", ("pathoscope_bowtie", "bar", "baz", 2)) == [{"id": "otu"}]
+        assert cache.get("bar", ("pathoscope_bowtie", "bar", "baz", 2)) is None
+
+    def test_get_key_mismatch(self):
+        """
+        Test that results formatted against a different index version are not returned.
+
+        """
+        cache = virtool.analyses.utils.FormattedCache()
+
+        cache.set("foo", ("pathoscope_bowtie", "bar", "baz", 2), [{"id": "otu"}], {"otu": 3})
+
+        assert cache.get("foo", ("pathoscope_bowtie", "bar", "baz", 3)) is None
+
+    def test_eviction(self):
+        """
+        Test that the least recently used entry is dropped when the cache is full.
+
+        """
+        cache = virtool.analyses.utils.FormattedCache(size=2)
+
+        cache.set("a", 1, [], {})
+        cache.set("b", 1, [], {})
+
+        # Access "a" so "b" becomes the least recently used entry.
+        cache.get("a", 1)
+
+        cache.set("c", 1, [], {})
+
+        assert len(cache) == 2
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_remove(self):
+        cache = virtool.analyses.utils.FormattedCache()
+
+        cache.set("foo", 1, [], {})
+
+        cache.remove("foo")
+        cache.remove("bar")
+
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("version,removed", [(2, True), (3, True), (4, False)])
+    def test_remove_otu(self, version, removed):
+        """
+        Test that entries containing an OTU at or after a reverted version are removed and others are kept.
+
+        """
+        cache = virtool.analyses.utils.FormattedCache()
+
+        cache.set("foo", 1, [], {"otu": 3})
+        cache.set("bar", 1, [], {"other": 5})
+
+        cache.remove_otu("otu", version)
+
+        assert ("foo" not in cache) is removed
+        assert "bar" in cache
+
+
+def test_compose_formatted_cache_key():
+    document = {
+        "workflow": "pathoscope_bowtie",
+        "reference": {
+            "id": "foo"
+        },
+        "index": {
+            "id": "bar",
+            "version": 4
+        }
+    }
+
+    assert virtool.analyses.utils.compose_formatted_cache_key(document) == ("pathoscope_bowtie", "foo", "bar", 4)
+
+
+@pytest.mark.parametrize("has_cache", [True, False])
+def test_get_formatted_cache(has_cache):
+    cache = virtool.analyses.utils.FormattedCache()
+
+    app = {"formatted_analyses": cache} if has_cache else {}
+
+    assert virtool.analyses.utils.get_formatted_cache(app) is (cache if has_cache else None)
+
+
+@pytest.mark.parametrize("depths,expected_x,expected_y", [
+    ([], [], []),
+    ([3], [0], [3]),
+    ([5, 5, 5], [0, 2], [5, 5]),
+    ([0, 1, 1, 0], [0, 1, 2, 3], [0, 1, 1, 0])
+])
+def test_encode_coverage(depths, expected_x, expected_y):
+    x, y = virtool.analyses.utils.encode_coverage(depths)
+
+    assert x.tolist() == expected_x
+    assert y.tolist() == expected_y
+
+
+@pytest.mark.parametrize("max_points", [None, 10, 50, 500])
+def test_simplify_coordinates(max_points):
+    """
+    Test that coordinates are reduced to `max_points`, that the first, last, highest, and lowest coordinates are kept,
+    and that x values stay in ascending order.
+
+    """
+    depths = [(i * 7919) % 101 for i in range(1000)]
+
+    x, y = virtool.analyses.utils.encode_coverage(depths)
+
+    simplified_x, simplified_y = virtool.analyses.utils.simplify_coordinates(x, y, max_points)
+
+    if max_points is None or max_points >= x.size:
+        assert simplified_x.tolist() == x.tolist()
+        return
+
+    assert simplified_x.size <= max_points
+    assert (numpy.diff(simplified_x) > 0).all()
+
+    assert simplified_x[0] == 0
+    assert simplified_x[-1] == 999
+
+    assert simplified_y.max() == 100
+    assert simplified_y.min() == 0
+
+
+def test_compose_coverage_documents(mocker):
+    mocker.patch("virtool.analyses.utils.COVERAGE_LEVELS", (6, None))
+
+    depths = {
+        "foo": [0, 1, 2, 3, 4, 5, 6, 7],
+        "bar": [1, 1]
+    }
+
+    assert virtool.analyses.utils.compose_coverage_documents("baz", depths) == [
+        {
+            "_id": "baz",
+            "analysis": {
+                "id": "baz"
+            },
+            "sequences": {
+                "foo": [[0, 0], [3, 3], [4, 4], [7, 7]],
+                "bar": [[0, 1], [1, 1]]
+            }
+        },
+        {
+            "_id": "baz.foo",
+            "analysis": {
+                "id": "baz"
+            },
+            "sequence": {
+                "id": "foo"
+            },
+            "levels": [
+                [[0, 0], [3, 3], [4, 4], [7, 7]],
+                [[0, 0], [1, 1], [2, 2], [3, 3], [4, 4], [5, 5], [6, 6], [7, 7]]
+            ]
+        },
+        {
+            "_id": "baz.bar",
+            "analysis": {
+                "id": "baz"
+            },
+            "sequence": {
+                "id": "bar"
+            },
+            "levels": [
+                [[0, 1], [1, 1]],
+                [[0, 1], [1, 1]]
+            ]
+        }
+    ]
@@ -52,3 +52,44 @@ class TestApplyProjection:
             virtool.db.utils.apply_projection({}, "_id")
 
         assert "Invalid type for projection: <class 'str'>" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("code", [11000, 121])
+async def test_insert_many_with_new_ids(code, mocker):
+    """
+    Test that documents with colliding generated ids are inserted again with new ids and that other write errors are
+    raised.
+
+    """
+    import pymongo.errors
+
+    collection = mocker.Mock()
+
+    calls = list()
+
+    async def insert_many(documents, ordered=True):
+        calls.append([dict(d) for d in documents])
+
+        if len(calls) == 1:
+            raise pymongo.errors.BulkWriteError({"writeErrors": [{"index": 1, "code": code}]})
+
+    collection.insert_many = insert_many
+
+    mocker.patch("virtool.utils.random_alphanumeric", side_effect=["foo", "bar", "baz"])
+
+    documents = [{"name": "a"}, {"name": "b"}]
+
+    if code != 11000:
+        with pytest.raises(pymongo.errors.BulkWriteError):
+            await virtool.db.utils.insert_many_with_new_ids(collection, documents)
+
+        return
+
+    await virtool.db.utils.insert_many_with_new_ids(collection, documents)
+
+    assert calls == [
+        [{"_id": "foo", "name": "a"}, {"_id": "bar", "name": "b"}],
+        [{"_id": "baz", "name": "b"}]
+    ]
+
+    assert documents == [{"_id": "foo", "name": "a"}, {"_id": "baz", "name": "b"}]
@@ -1,6 +1,8 @@
+import os
+
 import pytest
 
-import virtool.downloads
+import virtool.downloads.utils
 
 
 def test_format_fasta_entry():
@@ -35,3 +37,64 @@ def test_format_fasta_filename(parts, filename):
 
     else:
         assert virtool.downloads.utils.format_fasta_filename(*parts) == filename
+
+
+@pytest.mark.parametrize("cache", [True, False])
+async def test_gzip_stream_writer(cache, mocker, tmpdir):
+    """
+    Test that written text is sent as a single gzip stream in blocks and that the cache file only appears once the
+    writer is closed.
+
+    """
+    import gzip
+
+    mocker.patch("virtool.downloads.utils.STREAM_BUFFER_SIZE", 10)
+
+    class Response:
+
+        def __init__(self):
+            self.written = list()
+            self.eof = False
+
+        async def write(self, data):
+            self.written.append(data)
+
+        async def write_eof(self):
+            self.eof = True
+
+    async def run_in_thread(func, *args):
+        return func(*args)
+
+    response = Response()
+
+    cache_path = str(tmpdir.join("reference.json.gz")) if cache else None
+
+    writer = virtool.downloads.utils.GzipStreamWriter(response, run_in_thread, cache_path)
+
+    for i in range(100):
+        await writer.write(f"line {i}\n")
+
+    assert not tmpdir.join("reference.json.gz").exists()
+
+    await writer.close()
+
+    expected = "".join(f"line {i}\n" for i in range(100))
+
+    assert response.eof
+    assert gzip.decompress(b"".join(response.written)).decode() == expected
+
+    if cache:
+        with gzip.open(cache_path, "rt") as f:
+            assert f.read() == expected
+
+    assert os.listdir(str(tmpdir)) == (["reference.json.gz"] if cache else [])
+
+
+def test_gzip_stream_writer_abort(tmpdir):
+    cache_path = str(tmpdir.join("reference.json.gz"))
+
+    writer = virtool.downloads.utils.GzipStreamWriter(None, None, cache_path)
+
+    writer.abort()
+
+    assert os.listdir(str(tmpdir)) == []
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from aiohttp import web
 
@@ -20,12 +22,21 @@ def create_test_connection(mocker):
 
         def __init__(self):
             self.messages = list()
+            self.frames = list()
             self.send_stub = mocker.stub()
             self.close_stub = mocker.stub()
 
         async def send(self, message):
             self.send_stub(message)
 
+        async def send_frame(self, frame):
+            self.frames.append(frame)
+
+            messages = json.loads(frame)
+
+            for message in messages if isinstance(messages, list) else [messages]:
+                self.send_stub(message)
+
         async def close(self):
             self.close_stub()
 
@@ -192,3 +192,145 @@ async def test_patch_to_version(remove, snapshot, dbi,  create_mock_history):
     snapshot.assert_match(current)
     snapshot.assert_match(patched)
     snapshot.assert_match(reverted_change_ids)
+
+
+@pytest.mark.parametrize("remove", [True, False])
+async def test_patch_to_version_checkpoint(remove, mocker, dbi, create_mock_history):
+    """
+    Test that patching from a checkpoint gives the same result as replaying every change and that the diffs of changes
+    after the checkpoint are never fetched.
+
+    """
+    await create_mock_history(remove=remove)
+
+    app = {
+        "db": dbi
+    }
+
+    _, expected, expected_reverted = await virtool.history.db.patch_to_version(app, "6116cba1", 0)
+    _, checkpoint, _ = await virtool.history.db.patch_to_version(app, "6116cba1", 1)
+
+    await dbi.history.update_one({"_id": "6116cba1.1"}, {"$set": {"checkpoint": checkpoint}})
+
+    m_find = mocker.spy(dbi.history, "find")
+
+    current, patched, reverted = await virtool.history.db.patch_to_version(app, "6116cba1", 0)
+
+    assert patched == expected
+    assert reverted == expected_reverted
+
+    for args, kwargs in list(m_find.call_args_list):
+        for change in await dbi.history.find(*args, **kwargs).to_list(None):
+            if change["otu"]["version"] == "removed" or change["otu"]["version"] > 1:
+                assert "diff" not in change
+
+
+@pytest.mark.parametrize("stored", [True, False])
+async def test_get_patched_otu(stored, mocker, static_time, dbi, create_mock_history):
+    """
+    Test that a stored snapshot is returned without patching and that a missing snapshot is patched and stored.
+
+    """
+    await create_mock_history(remove=False)
+
+    app = {
+        "db": dbi
+    }
+
+    _, expected, _ = await virtool.history.db.patch_to_version(app, "6116cba1", 1)
+
+    if stored:
+        await virtool.history.db.add_snapshot(dbi, "6116cba1", 1, expected)
+
+    m_patch_to_version = mocker.spy(virtool.history.db, "patch_to_version")
+
+    patched = await virtool.history.db.get_patched_otu(app, "6116cba1", 1)
+
+    assert patched == expected
+    assert m_patch_to_version.called is not stored
+
+    assert await dbi.snapshots.find_one("6116cba1.1") == {
+        "_id": "6116cba1.1",
+        "otu": {
+            "id": "6116cba1",
+            "version": 1
+        },
+        "reference": {
+            "id": "hxn167"
+        },
+        "accessed_at": static_time.datetime,
+        "patched": expected
+    }
+
+
+async def test_add_snapshot_evict(mocker, dbi):
+    """
+    Test that the least recently used snapshots are removed when the snapshot limit is exceeded.
+
+    """
+    mocker.patch("virtool.history.utils.SNAPSHOT_LIMIT", 3)
+    mocker.patch("virtool.history.utils.SNAPSHOT_EVICTION_BATCH", 1)
+
+    await dbi.snapshots.insert_many([
+        {"_id": f"foo.{i}", "otu": {"id": "foo", "version": i}, "accessed_at": i} for i in range(3)
+    ])
+
+    await virtool.history.db.add_snapshot(dbi, "bar", 0, {"_id": "bar", "reference": {"id": "baz"}})
+
+    assert await dbi.snapshots.distinct("_id") == ["bar.0", "foo.2"]
+
+
+async def test_remove_snapshots(dbi):
+    await dbi.snapshots.insert_many([
+        {"_id": f"{otu_id}.{i}", "otu": {"id": otu_id, "version": i}} for otu_id in ["foo", "bar"] for i in range(4)
+    ])
+
+    await virtool.history.db.remove_snapshots(dbi, "foo", 2)
+
+    assert await dbi.snapshots.distinct("_id") == ["bar.0", "bar.1", "bar.2", "bar.3", "foo.0", "foo.1"]
+
+
+@pytest.mark.parametrize("remove", [True, False])
+@pytest.mark.parametrize("parallel", [True, False])
+async def test_patch_manifest(remove, parallel, mocker, dbi, create_mock_history):
+    """
+    Test that patching a manifest gives the same results as patching each OTU separately, including when the patching
+    is done in worker processes, and that the patched OTUs are stored as snapshots.
+
+    """
+    await create_mock_history(remove=remove)
+
+    if parallel:
+        mocker.patch("virtool.history.utils.PARALLEL_PATCH_THRESHOLD", 1)
+
+    async def run_in_process(func, *args):
+        return func(*args)
+
+    app = {
+        "db": dbi,
+        "run_in_process": run_in_process,
+        "settings": {
+            "data_path": "foo"
+        }
+    }
+
+    manifest = {
+        "6116cba1": 1
+    }
+
+    _, expected, _ = await virtool.history.db.patch_to_version(app, "6116cba1", 1)
+
+    assert await virtool.history.db.patch_manifest(app, manifest) == {
+        "6116cba1": expected
+    }
+
+    assert await dbi.snapshots.distinct("_id") == ["6116cba1.1"]
+
+    # The second call should only read the stored snapshot.
+    m_compose_patch_inputs = mocker.spy(virtool.history.utils, "compose_patch_inputs")
+
+    assert await virtool.history.db.patch_manifest(app, manifest) == {
+        "6116cba1": expected
+    }
+
+    assert not m_compose_patch_inputs.called
@@ -0,0 +1,39 @@
+import virtool.history.migrate
+import virtool.history.utils
+
+
+async def test_add_otu_checkpoints(dbi):
+    """
+    Test that missing checkpoints are filled in by walking back from the current OTU and that existing checkpoints are
+    left alone.
+
+    """
+    app = {
+        "db": dbi,
+        "settings": {
+            "data_path": "/foo/bar"
+        }
+    }
+
+    versions = [{"_id": "foo", "name": f"Prunus virus {i}", "version": i, "isolates": []} for i in range(52)]
+
+    await dbi.otus.insert_one(versions[51])
+
+    await dbi.history.insert_many([
+        {
+            "_id": f"foo.{i}",
+            "otu": {"id": "foo", "version": i},
+            "method_name": "edit",
+            "diff": virtool.history.utils.calculate_diff(versions[i - 1], versions[i]),
+            **({"checkpoint": "existing"} if i == 50 else {})
+        } for i in range(1, 52)
+    ])
+
+    await virtool.history.migrate.add_otu_checkpoints(app, "foo")
+
+    checkpoints = await dbi.history.find({"checkpoint": {"$exists": True}}, ["checkpoint"]).to_list(None)
+
+    assert {c["_id"]: c["checkpoint"] for c in checkpoints} == {
+        "foo.25": versions[25],
+        "foo.50": "existing"
+    }
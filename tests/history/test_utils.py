@@ -270,3 +270,220 @@ async def test_write_diff_file(snapshot, tmpdir):
 
     with open(path, "r") as f:
         snapshot.assert_match(json.load(f))
+
+
+def test_compose_snapshot(static_time):
+    patched = {
+        "_id": "foo",
+        "version": 3,
+        "reference": {
+            "id": "bar"
+        }
+    }
+
+    assert virtool.history.utils.compose_snapshot("foo", 3, patched, static_time.datetime) == {
+        "_id": "foo.3",
+        "otu": {
+            "id": "foo",
+            "version": 3
+        },
+        "reference": {
+            "id": "bar"
+        },
+        "accessed_at": static_time.datetime,
+        "patched": patched
+    }
+
+
+def test_compose_manifest_history_query():
+    manifest = {
+        "foo": 2,
+        "bar": 5,
+        "baz": 2
+    }
+
+    assert virtool.history.utils.compose_manifest_history_query(manifest) == {
+        "$or": [
+            {"otu.id": {"$in": ["foo", "bar", "baz"]}, "otu.version": "removed"},
+            {"otu.id": {"$in": ["foo", "baz"]}, "otu.version": {"$gt": 2}},
+            {"otu.id": {"$in": ["bar"]}, "otu.version": {"$gt": 5}}
+        ]
+    }
+
+
+def test_compose_patch_inputs():
+    manifest = {
+        "foo": 1,
+        "bar": 0
+    }
+
+    otus = [
+        {"_id": "foo", "version": 3, "isolates": [{"id": "a"}, {"id": "b"}]}
+    ]
+
+    sequences = [
+        {"_id": "1", "otu_id": "foo", "isolate_id": "a"},
+        {"_id": "2", "otu_id": "foo", "isolate_id": "b"},
+        {"_id": "3", "otu_id": "foo", "isolate_id": "a"}
+    ]
+
+    changes = [
+        {"_id": "foo.2", "otu": {"id": "foo", "version": 2}},
+        {"_id": "bar.removed", "otu": {"id": "bar", "version": "removed"}},
+        {"_id": "foo.3", "otu": {"id": "foo", "version": 3}},
+        {"_id": "bar.1", "otu": {"id": "bar", "version": 1}}
+    ]
+
+    inputs = virtool.history.utils.compose_patch_inputs(manifest, otus, sequences, changes)
+
+    assert inputs == [
+        (
+            {
+                "_id": "foo",
+                "version": 3,
+                "isolates": [
+                    {"id": "a", "sequences": [sequences[0], sequences[2]]},
+                    {"id": "b", "sequences": [sequences[1]]}
+                ]
+            },
+            [changes[2], changes[0]],
+            1
+        ),
+        (
+            {},
+            [changes[1], changes[3]],
+            0
+        )
+    ]
+
+
+@pytest.mark.parametrize("version,expected", [
+    (3, "Prunus virus F"),
+    (2, "Prunus virus E"),
+    (1, "Prunus virus D"),
+    (0, None)
+])
+def test_patch_otu(version, expected):
+    """
+    Test that an OTU is patched back to each version from a chain of create and update changes.
+
+    """
+    versions = [{"_id": "foo", "name": f"Prunus virus {letter}", "version": i} for i, letter in enumerate("CDEF")]
+
+    changes = [
+        {
+            "_id": f"foo.{i}",
+            "otu": {"id": "foo", "version": i},
+            "method_name": "update",
+            "diff": virtool.history.utils.calculate_diff(versions[i - 1], versions[i])
+        } for i in range(3, 0, -1)
+    ]
+
+    changes.append({"_id": "foo.0", "otu": {"id": "foo", "version": 0}, "method_name": "create", "diff": versions[0]})
+
+    patched = virtool.history.utils.patch_otu(versions[3], changes, version)
+
+    if expected:
+        assert patched == {"_id": "foo", "name": expected, "version": version}
+    else:
+        assert patched == versions[0]
+
+    # The current version must not be modified.
+    assert versions[3]["name"] == "Prunus virus F"
+
+
+def test_patch_otu_removed():
+    removed = {"_id": "foo", "name": "Prunus virus F", "version": 1}
+
+    changes = [
+        {"_id": "foo.removed", "otu": {"id": "foo", "version": "removed"}, "method_name": "remove", "diff": removed}
+    ]
+
+    assert virtool.history.utils.patch_otu({}, changes, 1) == removed
+
+
+@pytest.mark.parametrize("version,expected", [
+    (0, False),
+    (24, False),
+    (25, True),
+    (50, True),
+    ("removed", False)
+])
+def test_is_checkpoint_version(version, expected):
+    assert virtool.history.utils.is_checkpoint_version(version) is expected
+
+
+def test_find_nearest_checkpoints():
+    manifest = {
+        "foo": 30,
+        "bar": 25,
+        "baz": 60
+    }
+
+    checkpoint_changes = [
+        {"otu": {"id": "foo", "version": 75}},
+        {"otu": {"id": "foo", "version": 25}},
+        {"otu": {"id": "foo", "version": 50}},
+        {"otu": {"id": "bar", "version": 25}},
+        {"otu": {"id": "baz", "version": 50}}
+    ]
+
+    assert virtool.history.utils.find_nearest_checkpoints(manifest, checkpoint_changes) == {
+        "foo": 50,
+        "bar": 25
+    }
+
+
+def test_compose_manifest_history_query_checkpoints():
+    """
+    Test that OTUs with checkpoints only match changes up to their checkpoints and that OTUs already at a checkpoint
+    match nothing.
+
+    """
+    manifest = {
+        "foo": 30,
+        "bar": 25,
+        "baz": 2
+    }
+
+    checkpoint_versions = {
+        "foo": 50,
+        "bar": 25
+    }
+
+    assert virtool.history.utils.compose_manifest_history_query(manifest, checkpoint_versions) == {
+        "$or": [
+            {"otu.id": {"$in": ["baz"]}, "otu.version": "removed"},
+            {"otu.id": {"$in": ["foo"]}, "otu.version": {"$gt": 30, "$lte": 50}},
+            {"otu.id": {"$in": ["baz"]}, "otu.version": {"$gt": 2}}
+        ]
+    }
+
+    assert virtool.history.utils.compose_manifest_history_query({"bar": 25}, {"bar": 25}) == {"_id": {"$in": []}}
+
+
+def test_compose_patch_inputs_checkpoints():
+    checkpoint = {"_id": "foo", "version": 50, "isolates": []}
+
+    changes = [
+        {"_id": "foo.49", "otu": {"id": "foo", "version": 49}},
+        {"_id": "foo.50", "otu": {"id": "foo", "version": 50}}
+    ]
+
+    inputs = virtool.history.utils.compose_patch_inputs({"foo": 48}, [], [], changes, {"foo": checkpoint})
+
+    assert inputs == [(checkpoint, [changes[1], changes[0]], 48)]
+
+
+@pytest.mark.parametrize("method_name,version,expected", [
+    ("edit", 25, True),
+    ("edit", 24, False),
+    ("remove", 25, False),
+    ("create", 0, False)
+])
+def test_compose_checkpoint(method_name, version, expected):
+    new = {"_id": "foo", "version": version}
+
+    checkpoint = virtool.history.utils.compose_checkpoint(method_name, new)
+
+    assert checkpoint == ({"checkpoint": new} if expected else {})
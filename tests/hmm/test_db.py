@@ -7,6 +7,7 @@ from aiohttp.test_utils import make_mocked_coro
 
 import pytest
 
+import virtool.errors
 import virtool.hmm.db
 
 JSON_RESULT_PATH = os.path.join(sys.path[0], "tests", "test_files", "nuvs", "results.json")
@@ -189,3 +190,48 @@ async def test_purge(mocker, dbi):
         {"_id": "baz", "hidden": True},
         {"_id": "foo", "hidden": True}
     ]
+
+
+@pytest.mark.parametrize("state", ["pressed", "unpressed", "missing", "failed"])
+async def test_press_installed_profiles(state, mocker, tmpdir):
+    """
+    Test that installed profiles are pressed only if there is no current pressed profile set and that a failure to
+    press them is logged rather than raised.
+
+    """
+    data_path = tmpdir.mkdir("data")
+    hmm_path = data_path.mkdir("hmm")
+
+    if state != "missing":
+        hmm_path.join("profiles.hmm").write("HMMER3/f")
+
+    if state == "pressed":
+        hmm_path.mkdir("pressed").mkdir("foo")
+        os.symlink("foo", str(hmm_path.join("pressed", "current")))
+
+    if state == "failed":
+        coro = make_mocked_coro(raise_exception=virtool.errors.SubprocessError("Could not press HMM profiles"))
+    else:
+        coro = make_mocked_coro(return_value="foo")
+
+    m_press_profiles = mocker.patch("virtool.hmm.db.press_profiles", coro)
+
+    m_warning = mocker.patch("virtool.hmm.db.logger.warning")
+
+    app = {
+        "settings": {
+            "data_path": str(data_path)
+        }
+    }
+
+    await virtool.hmm.db.press_installed_profiles(app)
+
+    if state in ("unpressed", "failed"):
+        m_press_profiles.assert_called_with(app, str(hmm_path.join("profiles.hmm")))
+    else:
+        assert not m_press_profiles.called
+
+    if state == "failed":
+        m_warning.assert_called_with("Could not press HMM profiles")
+    else:
+        assert not m_warning.called
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import virtool.hmm.utils
+
+
+@pytest.fixture
+def pressed(tmpdir):
+    """
+    Create two pressed profile sets, `foo` and `bar`, and make `foo` current.
+
+    """
+    pressed_path = tmpdir.mkdir("hmm").mkdir("pressed")
+
+    for version in ("foo", "bar"):
+        pressed_path.mkdir(version).join("profiles.hmm.h3m").write("HMM")
+
+    os.symlink("foo", str(pressed_path.join("current")))
+
+    return pressed_path
+
+
+def test_acquire(pressed, tmpdir):
+    profiles_path = virtool.hmm.utils.acquire_pressed_profiles(str(tmpdir), "job_1")
+
+    assert profiles_path == str(pressed.join("foo", "profiles.hmm"))
+    assert pressed.join("foo", "refs", "job_1").read() == str(os.getpid())
+
+
+def test_acquire_none(tmpdir):
+    """
+    Test that `None` is returned when no pressed profiles have been built.
+
+    """
+    assert virtool.hmm.utils.acquire_pressed_profiles(str(tmpdir), "job_1") is None
+
+
+@pytest.mark.parametrize("referenced", [True, False])
+def test_swap(referenced, pressed, tmpdir):
+    """
+    Test that a swap makes the new version current and that the old version is only removed if it has no references.
+
+    """
+    if referenced:
+        virtool.hmm.utils.acquire_pressed_profiles(str(tmpdir), "job_1")
+
+    pressed.mkdir("baz")
+
+    virtool.hmm.utils.swap_pressed_profiles(str(tmpdir), "baz")
+
+    assert os.readlink(str(pressed.join("current"))) == "baz"
+
+    # The unreferenced old version is always removed.
+    assert not pressed.join("bar").exists()
+
+    assert pressed.join("foo").exists() is referenced
+
+    if referenced:
+        virtool.hmm.utils.release_pressed_profiles(str(tmpdir), "job_1", str(pressed.join("foo", "profiles.hmm")))
+
+        assert not pressed.join("foo").exists()
+
+
+def test_swap_none(pressed, tmpdir):
+    virtool.hmm.utils.swap_pressed_profiles(str(tmpdir), None)
+
+    assert sorted(os.listdir(str(pressed))) == [".lock"]
+
+
+def test_remove_unused_dead_reference(pressed):
+    """
+    Test that references held by processes that are no longer running don't prevent removal.
+
+    """
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+
+    pressed.join("bar").mkdir("refs").join("job_1").write(str(process.pid))
+
+    # Staging directories are left for the process building them.
+    pressed.mkdir("baz.tmp")
+
+    virtool.hmm.utils.remove_unused_pressed_profiles(str(pressed))
+
+    assert sorted(os.listdir(str(pressed))) == ["baz.tmp", "current", "foo"]
+
+
+def test_hash_profiles(tmpdir):
+    path = tmpdir.join("profiles.hmm")
+    path.write("HMMER3/f")
+
+    version = virtool.hmm.utils.hash_profiles(str(path))
+
+    assert len(version) == 16
+
+    path.write("HMMER3/f changed")
+
+    assert virtool.hmm.utils.hash_profiles(str(path)) != version
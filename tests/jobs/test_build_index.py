@@ -1,6 +1,5 @@
 import os
 import pytest
-import types
 import virtool.jobs.build_index
 
 
@@ -141,7 +140,11 @@ def test_mk_index_dir(dbs, tmpdir, mock_job):
 
 
 def test_get_patched_otus(mocker, dbs):
-    m = mocker.patch("virtool.db.sync.patch_otu_to_version", return_value=(None, {"_id": "foo"}, None))
+    m = mocker.patch("virtool.db.sync.patch_manifest", return_value={
+        "foo": {"_id": "foo"},
+        "bar": {"_id": "bar"},
+        "baz": {"_id": "baz"}
+    })
 
     manifest = {
         "foo": 2,
@@ -156,38 +159,17 @@ def test_get_patched_otus(mocker, dbs):
     patched_otus = virtool.jobs.build_index.get_patched_otus(
         dbs,
         settings,
-        manifest
+        manifest,
+        4
     )
 
-    assert isinstance(patched_otus, types.GeneratorType)
-
     assert list(patched_otus) == [
         {"_id": "foo"},
-        {"_id": "foo"},
-        {"_id": "foo"}
+        {"_id": "bar"},
+        {"_id": "baz"}
     ]
 
-    m.assert_has_calls([
-        mocker.call(dbs, settings, "foo", 2),
-        mocker.call(dbs, settings, "bar", 10),
-        mocker.call(dbs, settings, "baz", 4)
-    ])
-
-
-@pytest.mark.parametrize("data_type", ["genome", "barcode"])
-def test_get_sequences_from_patched_otus(data_type, mocker, snapshot, dbs, fake_otus):
-    sequence_otu_dict = dict()
-
-    sequences = virtool.jobs.build_index.get_sequences_from_patched_otus(
-        fake_otus,
-        data_type,
-        sequence_otu_dict
-    )
-
-    assert isinstance(sequences, types.GeneratorType)
-
-    snapshot.assert_match(list(sequences))
-    snapshot.assert_match(sequence_otu_dict)
+    m.assert_called_with(dbs, settings, manifest, 4)
 
 
 def test_remove_unused_index_files(tmpdir):
@@ -224,25 +206,118 @@ def test_remove_unused_index_files(tmpdir):
         assert os.listdir(os.path.join(str(tmpdir), index_id)) == ["test.fa"]
 
 
-def test_write_sequences_to_file(snapshot, tmpdir):
-    sequences = [
-        {
-            "_id": "foo",
-            "sequence": "ATTGAGAGATAGAGACAC"
-        },
-        {
-            "_id": "bar",
-            "sequence": "GGGTACGAGTTTCTATCG"
-        },
-        {
-            "_id": "baz",
-            "sequence": "GGCTTCGGACTTTTTTCG"
-        }
-    ]
+def test_get_reusable_otu_ids():
+    manifest = {
+        "foo": 2,
+        "bar": 5,
+        "baz": 1
+    }
+
+    previous_fragments = {
+        "foo": {"version": 2},
+        "bar": {"version": 4}
+    }
+
+    assert virtool.jobs.build_index.get_reusable_otu_ids(manifest, previous_fragments) == {"foo"}
+
+
+@pytest.mark.parametrize("data_type", ["genome", "barcode"])
+def test_compose_fasta_fragment(data_type, fake_otus):
+    fragment = virtool.jobs.build_index.compose_fasta_fragment(fake_otus[0], data_type)
+
+    expected = ">1\nAGAGGATAGAGACACA\n>2\nGGGTAGTCGATCTGGC\n"
+
+    if data_type == "barcode":
+        expected += ">3\nTTTAGAGTTGGATTAC\n>4\nAAAGGAGAGAGAAACC\n"
+
+    assert fragment == expected
+
+
+def test_write_fasta_fragments(tmpdir, fake_otus):
+    """
+    Test that a rebuild copies unchanged OTUs from the previous index and produces the same file and hash as a full
+    write.
+
+    """
+    previous_path = str(tmpdir.mkdir("previous"))
+    full_path = str(tmpdir.mkdir("full"))
+    index_path = str(tmpdir.mkdir("index"))
+
+    manifest = {
+        "foo": 2,
+        "bar": 3
+    }
+
+    previous_fragments, previous_hash = virtool.jobs.build_index.write_fasta_fragments(
+        previous_path,
+        manifest,
+        fake_otus,
+        "genome",
+        dict()
+    )
+
+    assert previous_fragments == {
+        "bar": {"version": 3, "offset": 0, "length": 40, "sequence_ids": ["5", "6"]},
+        "foo": {"version": 2, "offset": 40, "length": 40, "sequence_ids": ["1", "2", "3", "4"]}
+    }
+
+    fake_otus[1]["isolates"][0]["sequences"][0]["sequence"] = "AAAAAAAAAAAAAAAA"
+
+    manifest["bar"] = 4
+
+    _, full_hash = virtool.jobs.build_index.write_fasta_fragments(full_path, manifest, fake_otus, "genome", dict())
+
+    sequence_otu_map = dict()
+
+    fragments, sequence_hash = virtool.jobs.build_index.write_fasta_fragments(
+        index_path,
+        manifest,
+        [fake_otus[1]],
+        "genome",
+        sequence_otu_map,
+        previous_path,
+        previous_fragments
+    )
+
+    with open(os.path.join(full_path, "ref.fa")) as f:
+        expected = f.read()
+
+    with open(os.path.join(index_path, "ref.fa")) as f:
+        assert f.read() == expected
+
+    assert sequence_hash == full_hash != previous_hash
+    assert fragments["bar"]["version"] == 4
+
+    assert sequence_otu_map == {
+        "1": "foo",
+        "2": "foo",
+        "3": "foo",
+        "4": "foo",
+        "5": "bar",
+        "6": "bar"
+    }
+
+
+@pytest.mark.parametrize("exists", [True, False])
+def test_link_bowtie_files(exists, tmpdir):
+    """
+    Test that only Bowtie2 files are linked and that cached exports in the index directory are not mistaken for them.
+
+    """
+    source = tmpdir.mkdir("source")
+    target = tmpdir.mkdir("target")
+
+    source.join("ref.fa").write(">foo\nATAGAG\n")
+    source.join("export.built.0123456789abcdef.json.gz").write("baz")
+    source.join("reference.built.0123456789abcdef.json.gz").write("baz")
+
+    if exists:
+        source.join("reference.1.bt2").write("foo")
+        source.join("reference.rev.1.bt2").write("bar")
+        source.join("reference.2.bt2l").write("qux")
 
-    path = os.path.join(str(tmpdir), "output.fa")
+    assert virtool.jobs.build_index.link_bowtie_files(str(source), str(target)) is exists
 
-    virtool.jobs.build_index.write_sequences_to_file(path, sequences)
+    expected = ["reference.1.bt2", "reference.2.bt2l", "reference.rev.1.bt2"] if exists else []
 
-    with open(path, "r") as f:
-        snapshot.assert_match(f.read())
+    assert sorted(os.listdir(str(target))) == expected
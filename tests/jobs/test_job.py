@@ -0,0 +1,72 @@
+import sys
+
+import pytest
+
+import virtool.jobs.job
+
+
+@pytest.fixture
+def job(tmpdir):
+    tmpdir.mkdir("logs").mkdir("jobs")
+
+    return virtool.jobs.job.Job("mongodb://localhost:27017", "test", {"data_path": str(tmpdir)}, "foobar", None)
+
+
+SCRIPT = """
+import sys
+
+for i in range(5000):
+    sys.stdout.write(f"out_{i}\\n")
+
+    if i % 1000 == 0:
+        sys.stderr.write(f"err_{i}\\n")
+
+sys.stdout.write("no_newline")
+"""
+
+
+@pytest.mark.parametrize("block_size", [None, 7, 1024])
+@pytest.mark.parametrize("buffer_limit", [5, 4096, 65536])
+def test_run_subprocess(block_size, buffer_limit, job):
+    stdout = list()
+    stderr = list()
+
+    job.run_subprocess(
+        [sys.executable, "-c", SCRIPT],
+        stdout_handler=stdout.append,
+        stderr_handler=stderr.append,
+        stdout_block_size=block_size,
+        buffer_limit=buffer_limit
+    )
+
+    expected = "".join(f"out_{i}\n" for i in range(5000)) + "no_newline"
+
+    assert b"".join(stdout).decode() == expected
+    assert b"".join(stderr) == b"".join(f"err_{i}\n".encode() for i in range(0, 5000, 1000))
+
+    if block_size is None and buffer_limit > 10:
+        assert stdout[:2] == [b"out_0\n", b"out_1\n"]
+        assert stdout[-1] == b"no_newline"
+
+    if block_size:
+        assert max(len(b) for b in stdout) <= min(block_size, buffer_limit)
+
+
+def test_run_subprocess_carriage_return(job):
+    """
+    Test that lines are only split on newlines so that carriage returns used by progress output stay in their lines.
+
+    """
+    stdout = list()
+
+    job.run_subprocess(
+        [sys.executable, "-c", "import sys; sys.stdout.write('10%\\r50%\\r100%\\ndone\\n')"],
+        stdout_handler=stdout.append
+    )
+
+    assert stdout == [b"10%\r50%\r100%\n", b"done\n"]
+
+
+def test_run_subprocess_error(job):
+    with pytest.raises(virtool.jobs.job.SubprocessError):
+        job.run_subprocess([sys.executable, "-c", "import sys; sys.exit(1)"])
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import virtool.jobs.classes
+import virtool.jobs.manager
+
+
+class FakeProcess:
+
+    def __init__(self, db_connection_string, db_name, settings, job_id, q):
+        self.job_id = job_id
+        self.alive = False
+        self.sentinel = None
+        self._write_fd = None
+
+    def start(self):
+        self.alive = True
+        self.sentinel, self._write_fd = os.pipe()
+
+    def exit(self):
+        """
+        Simulate the process exiting. The sentinel becomes readable like that of a real process.
+
+        """
+        self.alive = False
+        os.close(self._write_fd)
+
+    def is_alive(self):
+        return self.alive
+
+
+@pytest.fixture
+def manager(loop, mocker):
+    app = {
+        "db": None,
+        "dispatcher": mocker.Mock(),
+        "process_executor": None,
+        "settings": {
+            "db_connection_string": "mongodb://localhost:27017",
+            "db_name": "test",
+            "proc": 8,
+            "mem": 16
+        }
+    }
+
+    return virtool.jobs.manager.IntegratedManager(app, None)
+
+
+def add_job(manager, job_id, proc, mem, task_name="pathoscope_bowtie", user_id="bob", enqueued_at=None):
+    manager._jobs[job_id] = {
+        "process": None,
+        "class": FakeProcess,
+        "task_name": task_name,
+        "task_args": {},
+        "proc": proc,
+        "mem": mem,
+        "user_id": user_id,
+        "enqueued_at": time.monotonic() if enqueued_at is None else enqueued_at
+    }
+
+
+def test_start_waiting(manager):
+    """
+    Test that every waiting job that fits is started in a single pass, including small jobs backfilled behind one that
+    does not fit.
+
+    """
+    add_job(manager, "foo", 4, 8)
+    add_job(manager, "bar", 6, 8)
+    add_job(manager, "baz", 2, 4, task_name="build_index")
+    add_job(manager, "qux", 2, 8, task_name="build_index")
+
+    assert manager.start_waiting() == ["foo", "baz"]
+
+    assert manager._jobs["bar"]["process"] is None
+    assert manager._jobs["qux"]["process"] is None
+
+    metrics = manager.get_metrics()
+
+    assert metrics["waiting"] == 2
+    assert metrics["running"] == 2
+    assert metrics["started"] == 2
+    assert metrics["latency"]["max"] >= metrics["latency"]["mean"] >= 0
+
+    manager._jobs["foo"]["process"].exit()
+
+    manager.remove_finished()
+
+    assert list(manager._jobs) == ["bar", "baz", "qux"]
+
+    assert manager.start_waiting() == ["bar"]
+
+
+@pytest.mark.parametrize("backfill", [True, False])
+@pytest.mark.parametrize("timed_out", [True, False])
+def test_schedule_backfill(backfill, timed_out, manager):
+    """
+    Test that small jobs are only backfilled behind a blocked large job when backfill is enabled and the large job
+    has not waited longer than the backfill timeout. Large jobs are never backfilled.
+
+    """
+    manager.settings.update({
+        "job_backfill": backfill,
+        "job_backfill_timeout": 100
+    })
+
+    now = time.monotonic()
+
+    add_job(manager, "running", 6, 8)
+    manager._jobs["running"]["process"] = FakeProcess(None, None, None, "running", None)
+
+    add_job(manager, "large", 4, 4, enqueued_at=now - (200 if timed_out else 50))
+    add_job(manager, "large_small", 1, 1)
+    add_job(manager, "small", 2, 4, task_name="create_sample")
+
+    expected = ["small"] if backfill and not timed_out else []
+
+    assert virtool.jobs.manager.schedule(manager.settings, manager._jobs, now) == expected
+
+
+def test_schedule_priority(manager):
+    manager.settings["job_priorities"] = {
+        "build_index": 2,
+        "nuvs": 1
+    }
+
+    add_job(manager, "pathoscope", 4, 8)
+    add_job(manager, "nuvs", 4, 8, task_name="nuvs")
+    add_job(manager, "build_index", 2, 4, task_name="build_index")
+
+    assert virtool.jobs.manager.schedule(manager.settings, manager._jobs, time.monotonic()) == [
+        "build_index",
+        "nuvs"
+    ]
+
+
+@pytest.mark.parametrize("fair_share", [True, False])
+def test_schedule_fair_share(fair_share, manager):
+    """
+    Test that jobs from users using less of the server are started first when fair share is enabled, even if they
+    were enqueued later.
+
+    """
+    manager.settings["job_fair_share"] = fair_share
+
+    add_job(manager, "running", 4, 4, user_id="bob")
+    manager._jobs["running"]["process"] = FakeProcess(None, None, None, "running", None)
+
+    add_job(manager, "bob_1", 1, 2, task_name="build_index", user_id="bob")
+    add_job(manager, "bob_2", 1, 2, task_name="build_index", user_id="bob")
+    add_job(manager, "bob_3", 1, 2, task_name="build_index", user_id="bob")
+    add_job(manager, "alice_1", 1, 2, task_name="build_index", user_id="alice")
+    add_job(manager, "alice_2", 1, 2, task_name="build_index", user_id="alice")
+
+    if fair_share:
+        # Alice's first job has a share of 0.125, which is less than Bob's running job share of 0.5.
+        expected = ["alice_1", "alice_2", "bob_1", "bob_2"]
+    else:
+        expected = ["bob_1", "bob_2", "bob_3", "alice_1"]
+
+    assert virtool.jobs.manager.schedule(manager.settings, manager._jobs, time.monotonic()) == expected
+
+
+def test_get_scheduling_settings(manager):
+    manager.settings["job_backfill"] = False
+
+    assert virtool.jobs.manager.get_scheduling_settings(manager.settings) == {
+        "job_priorities": {},
+        "job_fair_share": True,
+        "job_backfill": False,
+        "job_backfill_timeout": 3600
+    }
+
+
+def test_get_metrics_empty(manager):
+    assert manager.get_metrics() == {
+        "waiting": 0,
+        "running": 0,
+        "wakeups": 0,
+        "started": 0,
+        "dispatched": 0,
+        "pending_messages": 0,
+        "latency": {
+            "last": None,
+            "mean": None,
+            "max": 0.0
+        }
+    }
+
+
+async def test_run(loop, mocker, manager):
+    """
+    Test that messages, enqueued jobs, and exited jobs are handled without waiting for the poll interval.
+
+    """
+    mocker.patch("virtool.jobs.manager.POLL_INTERVAL", 60)
+
+    dispatched = list()
+
+    async def dispatch(interface, operation, id_list):
+        dispatched.append((interface, operation, id_list))
+
+    mocker.patch.object(manager, "dispatch", dispatch)
+
+    task = asyncio.ensure_future(manager.run())
+
+    await asyncio.sleep(0.05)
+
+    for i in range(3):
+        manager.queue.put(("jobs", "update", [f"job_{i}"]))
+
+    add_job(manager, "foo", 4, 8)
+    manager.wake()
+
+    for _ in range(100):
+        if len(dispatched) == 3 and manager._jobs["foo"]["process"]:
+            break
+
+        await asyncio.sleep(0.01)
+
+    assert manager._jobs["foo"]["process"].alive
+
+    manager._jobs["foo"]["process"].exit()
+
+    for _ in range(100):
+        if "foo" not in manager._jobs:
+            break
+
+        await asyncio.sleep(0.01)
+
+    task.cancel()
+    await task
+
+    assert dispatched == [("jobs", "update", [f"job_{i}"]) for i in range(3)]
+    assert manager._jobs == {}
+    assert manager.get_metrics()["dispatched"] == 3
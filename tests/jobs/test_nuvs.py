@@ -216,6 +216,19 @@ def test_process_fasta(mock_job):
     )
 
 
+@pytest.mark.parametrize("proc", [1, 4])
+def test_find_all_orfs(proc, mocker):
+    """
+    Test that ORFs found using a process pool are the same as, and in the same order as, those found serially.
+
+    """
+    mocker.patch("virtool.jobs.nuvs.ORF_CHUNK_SIZE", 5)
+
+    sequences = [sequence for _, sequence in virtool.bio.read_fasta(os.path.join(NUVS_PATH, "scaffolds_u.fa"))]
+
+    assert virtool.jobs.nuvs.find_all_orfs(sequences, proc) == [virtool.bio.find_orfs(s) for s in sequences]
+
+
 def test_press_hmm(mock_job):
     os.mkdir(mock_job.params["analysis_path"])
 
@@ -236,6 +249,62 @@ def test_press_hmm(mock_job):
     assert all("profiles.hmm." + suffix in listing for suffix in ["h3p", "h3m", "h3f", "h3i"])
 
 
+def test_read_tblout(tmpdir):
+    tsv = tmpdir.join("hmm.tsv")
+
+    tsv.write(
+        "# target name        accession  query name           accession    E-value  score  bias   E-value  score  bias\n"
+        "vFam_2               -          sequence_0.0         -            1.2e-135  440.3   1.5  1.6e-135  440.0   1.5"
+        "   1.0   1   0   0   1   1   1   1 a description  with spaces\n"
+        "vFam_9               -          sequence_2.1         -             3.4e-20   70.1   0.1   4.1e-20   69.8   0.1"
+        "   1.1   1   0   0   1   1   1   1 -\n"
+    )
+
+    assert list(virtool.jobs.nuvs.read_tblout(str(tsv))) == [
+        (2, 0, 0, {
+            "full_e": 1.2e-135,
+            "full_score": 440.3,
+            "full_bias": 1.5,
+            "best_e": 1.6e-135,
+            "best_bias": 440.0,
+            "best_score": 1.5
+        }),
+        (9, 2, 1, {
+            "full_e": 3.4e-20,
+            "full_score": 70.1,
+            "full_bias": 0.1,
+            "best_e": 4.1e-20,
+            "best_bias": 69.8,
+            "best_score": 0.1
+        })
+    ]
+
+
+def test_prepare_hmm_shared(mock_job):
+    """
+    Test that pre-pressed profiles are used instead of pressing a copy when they are available, and that the reference
+    taken to them is released.
+
+    """
+    os.mkdir(mock_job.params["analysis_path"])
+
+    pressed_path = os.path.join(mock_job.settings["data_path"], "hmm", "pressed")
+
+    os.makedirs(os.path.join(pressed_path, "foo"))
+    os.symlink("foo", os.path.join(pressed_path, "current"))
+
+    mock_job.prepare_hmm()
+
+    assert mock_job.intermediate["pressed_profiles_path"] == os.path.join(pressed_path, "foo", "profiles.hmm")
+    assert os.listdir(os.path.join(pressed_path, "foo", "refs")) == [mock_job.id]
+    assert os.listdir(mock_job.params["analysis_path"]) == []
+
+    mock_job.release_hmm()
+
+    assert "pressed_profiles_path" not in mock_job.intermediate
+    assert os.listdir(os.path.join(pressed_path, "foo", "refs")) == []
+
+
 def test_vfam(mock_job, dbs):
     os.mkdir(mock_job.params["analysis_path"])
 
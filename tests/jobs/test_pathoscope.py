@@ -2,9 +2,12 @@ import os
 import sys
 import json
 import shutil
+import numpy
 import pytest
 
+import virtool.analyses.utils
 import virtool.jobs.pathoscope
+import virtool.pathoscope
 
 TEST_FILES_PATH = os.path.join(sys.path[0], "tests", "test_files")
 PATHOSCOPE_PATH = os.path.join(TEST_FILES_PATH, "pathoscope")
@@ -231,8 +234,13 @@ def test_map_isolates(snapshot, tmpdir, dbs, mock_job):
 
     mock_job.map_isolates()
 
+    vtb_path = os.path.join(mock_job.params["analysis_path"], "to_isolates.vtb")
     vta_path = os.path.join(mock_job.params["analysis_path"], "to_isolates.vta")
 
+    vta = virtool.pathoscope.read_vtb(vtb_path)
+
+    virtool.pathoscope.write_vta(vta, numpy.ones(len(vta.scores), dtype=bool), vta_path)
+
     with open(vta_path, "r") as f:
         data = sorted([line.rstrip() for line in f])
         snapshot.assert_match(data)
@@ -261,12 +269,15 @@ def test_subtract_mapping(dbs, mock_job):
     with open(TO_SUBTRACTION_PATH, "r") as handle:
         mock_job.intermediate["to_subtraction"] = json.load(handle)
 
-    shutil.copyfile(VTA_PATH, os.path.join(mock_job.params["analysis_path"], "to_isolates.vta"))
+    virtool.pathoscope.convert_vta(VTA_PATH, os.path.join(mock_job.params["analysis_path"], "to_isolates.vtb"))
 
     mock_job.subtract_mapping()
 
     assert mock_job.results["subtracted_count"] == 4
 
+    # The parsed and subtracted alignments should be handed to the pathoscope stage.
+    assert isinstance(mock_job.intermediate["vta"], virtool.pathoscope.VTA)
+
 
 def test_pathoscope(snapshot, dbs, mock_job):
     mock_job.check_db()
@@ -276,9 +287,9 @@ def test_pathoscope(snapshot, dbs, mock_job):
     with open(REF_LENGTHS_PATH, "r") as handle:
         mock_job.intermediate["ref_lengths"] = json.load(handle)
 
-    shutil.copyfile(
+    virtool.pathoscope.convert_vta(
         VTA_PATH,
-        os.path.join(mock_job.params["analysis_path"], "to_isolates.vta")
+        os.path.join(mock_job.params["analysis_path"], "to_isolates.vtb")
     )
 
     mock_job.params["sequence_otu_map"] = {
@@ -321,17 +332,38 @@ def test_pathoscope(snapshot, dbs, mock_job):
 
     snapshot.assert_match(mock_job.results)
 
+    coverage_path = os.path.join(mock_job.params["analysis_path"], "coverage.npz")
+
+    assert virtool.analyses.utils.read_coverage_file(coverage_path) == mock_job.intermediate["coverage"]
+    assert set(mock_job.intermediate["coverage"]) == {hit["id"] for hit in mock_job.results["results"]}
+    assert all("align" not in hit for hit in mock_job.results["results"])
+
 
 def test_import_results(snapshot, dbs, mock_job):
     mock_job.check_db()
 
     mock_job.results = {
-        "results": "results will be here",
+        "results": [{"id": "foo"}, {"id": "bar"}],
         "read_count": 1337,
         "ready": True
     }
 
+    mock_job.intermediate["coverage"] = {
+        "foo": [0, 0, 1, 1, 2, 2, 2, 0],
+        "bar": []
+    }
+
     mock_job.import_results()
 
     snapshot.assert_match(dbs.analyses.find_one())
     snapshot.assert_match(dbs.samples.find_one())
+
+    analysis_id = mock_job.params["analysis_id"]
+
+    assert dbs.coverage.find_one(analysis_id)["sequences"] == {
+        "foo": [[0, 0], [1, 0], [2, 1], [3, 1], [4, 2], [6, 2], [7, 0]]
+    }
+
+    assert dbs.coverage.find_one(f"{analysis_id}.foo")["levels"] == 3 * [
+        [[0, 0], [1, 0], [2, 1], [3, 1], [4, 2], [6, 2], [7, 0]]
+    ]
@@ -4,8 +4,10 @@ from aiohttp.test_utils import make_mocked_coro
 
 import pytest
 
+import virtool.otus.db
 import virtool.references.db
 import virtool.errors
+import virtool.http.utils
 
 RIGHTS = {
     "build": False,
@@ -338,3 +340,94 @@ async def test_delete_group_or_user(field, dbi):
         "groups": [subdocuments[1]] if field == "groups" else subdocuments,
         "users": [subdocuments[1]] if field == "users" else subdocuments
     }
+
+
+async def test_insert_joined_otus(mocker, dbi, static_time):
+    """
+    Test that OTUs and sequences are inserted in bulk and that the returned joined OTUs match what a join would read
+    back from the database.
+
+    """
+    mocker.patch("virtool.references.db.BULK_OTU_BATCH_SIZE", 1)
+
+    otus = [
+        {
+            "_id": f"remote_{i}",
+            "name": f"Prunus virus {i}",
+            "abbreviation": "",
+            "isolates": [
+                {
+                    "id": "bar",
+                    "default": True,
+                    "source_type": "isolate",
+                    "source_name": "A",
+                    "sequences": [
+                        {
+                            "_id": f"seq_{i}",
+                            "accession": f"KX{i}",
+                            "definition": "Prunus virus",
+                            "host": "",
+                            "sequence": "ATAGAGAT"
+                        }
+                    ]
+                }
+            ]
+        } for i in range(3)
+    ]
+
+    m_progress_handler = make_mocked_coro()
+
+    inserted = await virtool.references.db.insert_joined_otus(
+        dbi,
+        otus,
+        static_time.datetime,
+        "ref",
+        "bob",
+        remote=True,
+        progress_handler=m_progress_handler
+    )
+
+    assert len(inserted) == 3
+    assert m_progress_handler.call_count == 3
+
+    for otu in inserted:
+        assert otu == await virtool.otus.db.join(dbi, otu["_id"])
+        assert otu["remote"]["id"].startswith("remote_")
+
+
+async def test_update_remote_reference_process_cleanup(mocker):
+    """
+    Test that the downloaded release is removed if checking the reference file fails.
+
+    """
+    async def run_in_thread(func, *args):
+        return func(*args)
+
+    app = {
+        "db": None,
+        "run_in_thread": run_in_thread
+    }
+
+    process = virtool.references.db.UpdateRemoteReferenceProcess(app, "foo")
+
+    process.context = {
+        "release": {
+            "download_url": "https://www.virtool.ca/reference.tar.gz",
+            "size": 1024
+        }
+    }
+
+    process.get_tracker = mocker.Mock()
+
+    mocker.patch("virtool.http.utils.download_file", make_mocked_coro())
+
+    mocker.patch(
+        "virtool.references.utils.check_reference_file",
+        side_effect=virtool.errors.DatabaseError("Malformed reference file")
+    )
+
+    with pytest.raises(virtool.errors.DatabaseError):
+        await process.download_and_extract()
+
+    assert "temp_dir" not in process.intermediate
+    assert not os.path.exists(os.path.dirname(virtool.http.utils.download_file.call_args[0][2]))
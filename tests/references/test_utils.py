@@ -1,3 +1,6 @@
+import gzip
+import json
+
 import pytest
 
 import virtool.references.utils
@@ -270,3 +273,98 @@ def test_get_sequence_schema(require_id):
             "required": True
         }
     }
+
+
+@pytest.mark.parametrize("verb,abbreviation,description", [
+    ("import", "PVF", "Imported Prunus virus F (PVF)"),
+    ("clone", "", "Cloned Prunus virus F"),
+    ("remote", None, "Remoted Prunus virus F")
+])
+def test_compose_change_description(verb, abbreviation, description, test_otu):
+    test_otu["abbreviation"] = abbreviation
+
+    assert virtool.references.utils.compose_change_description(verb, test_otu) == description
+
+
+@pytest.fixture
+def reference_file(tmpdir):
+    data = {
+        "data_type": "genome",
+        "otus": [{"_id": str(i), "name": f"Virus {i}", "abbreviation": "", "isolates": []} for i in range(10)],
+        "organism": "virus",
+        "version": 12345
+    }
+
+    path = str(tmpdir.join("reference.json.gz"))
+
+    with gzip.open(path, "wt") as f:
+        json.dump(data, f, indent=2)
+
+    return path, data
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_reference_file_reader(chunk_size, reference_file):
+    """
+    Test that OTUs are yielded one at a time and that metadata before and after the OTU list is collected regardless of
+    where chunk boundaries fall.
+
+    """
+    path, data = reference_file
+
+    reader = virtool.references.utils.ReferenceFileReader(path, chunk_size=chunk_size)
+
+    assert list(reader) == data["otus"]
+    assert reader.has_otus is True
+
+    assert reader.metadata == {
+        "data_type": "genome",
+        "organism": "virus",
+        "version": 12345
+    }
+
+
+@pytest.mark.parametrize("content", ['{"otus": [{"_id": "foo"}', '{"otus": [{"_id": "foo"} {"_id": "bar"}]}'])
+def test_reference_file_reader_invalid(content, tmpdir):
+    path = str(tmpdir.join("reference.json.gz"))
+
+    with gzip.open(path, "wt") as f:
+        f.write(content)
+
+    with pytest.raises(json.JSONDecodeError):
+        list(virtool.references.utils.ReferenceFileReader(path, chunk_size=4))
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_check_reference_file(strict, tmpdir):
+    otus = [
+        {"_id": "foo", "name": "Foo virus", "abbreviation": "FV"},
+        {"_id": "bar", "name": "Foo virus", "abbreviation": "BV"}
+    ]
+
+    for i, otu in enumerate(otus):
+        otu["isolates"] = [{"id": str(i), "sequences": [{"_id": str(i)}]}]
+
+    data = {
+        "otus": otus
+    }
+
+    path = str(tmpdir.join("reference.json.gz"))
+
+    with gzip.open(path, "wt") as f:
+        json.dump(data, f)
+
+    metadata, otu_count, errors = virtool.references.utils.check_reference_file(path, strict=strict)
+
+    assert metadata == {}
+    assert otu_count == 2
+    assert [e["id"] for e in errors] == ["duplicate_names", "file"] if strict else ["duplicate_names"]
+
+
+def test_read_reference_batches(reference_file):
+    path, data = reference_file
+
+    batches = list(virtool.references.utils.read_reference_batches(path, 4))
+
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [otu for batch in batches for otu in batch] == data["otus"]
@@ -1,3 +1,4 @@
+import gzip
 import json
 import os
 import pickle
@@ -151,6 +152,119 @@ def test_fastq(headers_only, tmpdir):
         assert list(virtool.bio.read_fastq_from_path(str(tmpfile))) == expected
 
 
+@pytest.mark.parametrize("as_arrays", [False, True], ids=["lists", "arrays"])
+@pytest.mark.parametrize("line_ending", ["\n", "\r\n"], ids=["lf", "crlf"])
+def test_read_fastq_batches(as_arrays, line_ending, monkeypatch, tmpdir):
+    """
+    Test that records are parsed correctly when the chunks read from the file split records and line endings.
+
+    """
+    monkeypatch.setattr("virtool.bio.BUFFER_SIZE", 7)
+
+    records = [(b"@read_1 1:N:0", b"ACGTA", b"IIIII"), (b"@read_2 1:N:0", b"TTGCA", b"II#II")]
+
+    tmpfile = tmpdir.join("reads.fq")
+    tmpfile.write_binary(b"".join(line_ending.encode().join([h, s, b"+", q, b""]) for h, s, q in records))
+
+    batches = list(virtool.bio.read_fastq_batches(str(tmpfile), as_arrays=as_arrays))
+
+    assert [record for batch in batches for record in zip(*batch)] == records
+
+    if as_arrays:
+        assert all(batch.sequences.dtype == "S5" for batch in batches)
+
+
+@pytest.mark.parametrize("content,message", [
+    ("@read_1\nACGT\n+\nIIII\n@read_2\nACGT\n", "FASTQ file ends with an incomplete record"),
+    ("read_1\nACGT\n+\nIIII\n", "FASTQ record does not start with a header"),
+    ("@read_1\nACGT\nIIII\n@read_2\n", "FASTQ record has no separator line")
+], ids=["incomplete", "header", "separator"])
+def test_read_fastq_lines_malformed(content, message, tmpdir):
+    tmpfile = tmpdir.join("reads.fq")
+    tmpfile.write(content)
+
+    with pytest.raises(ValueError) as excinfo:
+        list(virtool.bio.read_fastq_lines(str(tmpfile)))
+
+    assert message in str(excinfo.value)
+
+
+@pytest.mark.parametrize("compressed", [False, True], ids=["uncompressed", "compressed"])
+def test_open_sequence_file(compressed, tmpdir):
+    path = str(tmpdir.join("reads.fq"))
+
+    with (gzip.open if compressed else open)(path, "wb") as f:
+        f.write(b"@read_1 1:N:0\nACGT\n+\nIIII\n")
+
+    with virtool.bio.open_sequence_file(path) as f:
+        assert f.read() == b"@read_1 1:N:0\nACGT\n+\nIIII\n"
+
+
+@pytest.mark.parametrize("returncode", [0, 1])
+def test_open_sequence_file_pigz(returncode, monkeypatch, tmpdir):
+    """
+    Test that a non-zero exit status from ``pigz`` is raised once the output has been read to the end.
+
+    """
+    path = str(tmpdir.join("reads.fq.gz"))
+
+    with gzip.open(path, "wb") as f:
+        f.write(b"@read_1\nACGT\n+\nIIII\n")
+
+    pigz = tmpdir.join("pigz")
+    pigz.write(f"#!/bin/sh\nprintf '@read_1\\n'\nexit {returncode}\n")
+    pigz.chmod(0o755)
+
+    monkeypatch.setattr("virtool.bio.shutil.which", lambda name: str(pigz))
+
+    if returncode:
+        with pytest.raises(IOError) as excinfo:
+            with virtool.bio.open_sequence_file(path, threads=2) as f:
+                f.read()
+
+        assert "pigz exited with code 1" in str(excinfo.value)
+    else:
+        with virtool.bio.open_sequence_file(path, threads=2) as f:
+            assert f.read() == b"@read_1\n"
+
+
+def test_hash_read_root():
+    left = virtool.bio.hash_read_root(b"@HWI-ST1410:82:C2VAGACXX:7:1101:1531:1859 1:N:0:AGTCAA /1\n")
+    right = virtool.bio.hash_read_root(b"@HWI-ST1410:82:C2VAGACXX:7:1101:1531:1859 2:N:0:AGTCAA /2\n")
+
+    assert left == right
+    assert left != virtool.bio.hash_read_root(b"@HWI-ST1410:82:C2VAGACXX:7:1101:1648:1927 1:N:0:AGTCAA\n")
+
+
+def test_write_paired_reads(tmpdir):
+    with open(os.path.join(TEST_FILES_PATH, "nuvs", "unite.json"), "r") as f:
+        unite = json.load(f)
+
+    left_path = str(tmpdir.join("reads_1.fq.gz"))
+    right_path = str(tmpdir.join("reads_2.fq"))
+    separate_path = str(tmpdir.join("unmapped_hosts.fq"))
+
+    with gzip.open(left_path, "wt") as f:
+        f.write("\n".join(unite["left"]) + "\n")
+
+    for path, key in [(right_path, "right"), (separate_path, "separate")]:
+        with open(path, "w") as f:
+            f.write("\n".join(unite[key]) + "\n")
+
+    root_hashes = virtool.bio.read_fastq_root_hashes(separate_path)
+
+    assert len(root_hashes) == 4
+    assert list(root_hashes) == sorted(root_hashes)
+
+    output_paths = [str(tmpdir.join("unmapped_{}.fq".format(i))) for i in (1, 2)]
+
+    assert virtool.bio.write_paired_reads([left_path, right_path], output_paths, root_hashes) == 4
+
+    for path, key in zip(output_paths, ["united_left", "united_right"]):
+        with open(path, "r") as f:
+            assert [line.rstrip() for line in f] == unite[key]
+
+
 def test_reverse_complement():
     sequence = "ATAGGGATTAGAGACACAGATA"
     expected = "TATCTGTGTCTCTAATCCCTAT"
@@ -171,6 +285,18 @@ def test_translate(sequence, expected):
     assert virtool.bio.translate(sequence) == expected
 
 
+def test_translate_frames():
+    """
+    Test that each frame is translated the same way as a slice of the sequence passed to :func:`.translate`.
+
+    """
+    sequence = "ATGGCNttaTAGNNRatgGCCCTAGGa"
+
+    assert virtool.bio.translate_frames(sequence) == [virtool.bio.translate(sequence[i:]) for i in range(3)]
+    assert virtool.bio.translate_frames(sequence) == ["MAL*XMALG", "WXYXXWP*", "GXIXXGPR"]
+    assert virtool.bio.translate_frames("AT") == ["", "", ""]
+
+
 def test_find_orfs(orf_containing):
     result = virtool.bio.find_orfs(orf_containing)
 
@@ -1,6 +1,10 @@
+import asyncio
+
 import pytest
+from aiohttp.test_utils import make_mocked_coro
 
 import virtool.api.json
+import virtool.dispatcher
 from virtool.dispatcher import Dispatcher
 
 
@@ -79,6 +83,7 @@ async def test_dispatch_authorized(create_test_connection):
     dispatcher.add_connection(m)
 
     await dispatcher.dispatch("otus", "update", {"test": True})
+    await dispatcher.flush()
 
     m.send_stub.assert_called_with({
         "interface": "otus",
@@ -103,6 +108,7 @@ async def test_dispatch_unauthorized(create_test_connection):
     dispatcher.add_connection(m)
 
     await dispatcher.dispatch("otus", "update", {"test": True})
+    await dispatcher.flush()
 
     m.send_stub.assert_not_called()
 
@@ -125,6 +131,7 @@ async def test_dispatch_either(create_test_connection):
     dispatcher.add_connection(m_unauthorized)
 
     await dispatcher.dispatch("otus", "update", {"test": True})
+    await dispatcher.flush()
 
     m_authorized.send_stub.assert_called_with({
         "interface": "otus",
@@ -158,6 +165,7 @@ async def test_dispatch_specific(create_test_connection):
         dispatcher.add_connection(m)
 
     await dispatcher.dispatch("otus", "update", {"test": True}, connections=[m_2])
+    await dispatcher.flush()
 
     m_1.send_stub.assert_not_called()
 
@@ -189,6 +197,7 @@ async def test_callable_filter(create_test_connection):
     dispatcher.add_connection(m_2)
 
     await dispatcher.dispatch("otus", "update", {"test": True}, conn_filter=lambda conn: conn.user_id == "bob")
+    await dispatcher.flush()
 
     m_1.send_stub.assert_called_with({
         "interface": "otus",
@@ -232,6 +241,7 @@ async def test_callable_modifier(create_test_connection):
         conn.groups = ["men"]
 
     await dispatcher.dispatch("otus", "update", {"test": True}, conn_modifier=apply_male)
+    await dispatcher.flush()
 
     assert m_1.groups == ["men"]
     assert m_2.groups == ["men"]
@@ -274,6 +284,7 @@ async def test_modifier_filter(create_test_connection):
         conn_filter=lambda conn: conn.user_id == "bob",
         conn_modifier=apply_male
     )
+    await dispatcher.flush()
 
     assert m_1.groups == ["men"]
     assert m_2.groups is None
@@ -302,6 +313,7 @@ async def test_writer(create_test_connection):
     dispatcher.add_connection(m_2)
 
     await dispatcher.dispatch("otus", "update", {"test": True}, writer=writer)
+    await dispatcher.flush()
 
     m_1.send_stub.assert_called_with({
         "interface": "otus",
@@ -329,3 +341,143 @@ async def test_writer_not_callable():
         await Dispatcher().dispatch("otus", "update", {"test": True}, writer="writer")
 
     assert "writer must be callable" in str(excinfo.value)
+
+
+async def test_send_frame(mocker, test_ws_connection):
+    test_ws_connection._ws.send_str = make_mocked_coro()
+
+    await test_ws_connection.send_frame('{"interface": "users"}')
+
+    test_ws_connection._ws.send_str.assert_called_with('{"interface": "users"}')
+
+
+async def test_coalesce(create_test_connection):
+    """
+    Test that repeated updates to the same document are coalesced and that all waiting messages are sent in a single
+    frame.
+
+    """
+    dispatcher = Dispatcher()
+
+    m = create_test_connection()
+    m.user_id = "test"
+
+    dispatcher.add_connection(m)
+
+    await dispatcher.dispatch("otus", "update", {"id": "foo", "version": 1})
+    await dispatcher.dispatch("otus", "update", {"id": "bar", "version": 1})
+    await dispatcher.dispatch("otus", "update", {"id": "foo", "version": 2})
+    await dispatcher.dispatch("otus", "insert", {"id": "baz", "version": 0})
+
+    await dispatcher.flush()
+
+    assert len(m.frames) == 1
+
+    assert [c[0][0] for c in m.send_stub.call_args_list] == [
+        {"interface": "otus", "operation": "update", "data": {"id": "foo", "version": 2}},
+        {"interface": "otus", "operation": "update", "data": {"id": "bar", "version": 1}},
+        {"interface": "otus", "operation": "insert", "data": {"id": "baz", "version": 0}}
+    ]
+
+
+async def test_delete_removes_waiting(create_test_connection):
+    """
+    Test that a delete message removes waiting insert and update messages for the deleted documents.
+
+    """
+    dispatcher = Dispatcher()
+
+    m = create_test_connection()
+    m.user_id = "test"
+
+    dispatcher.add_connection(m)
+
+    await dispatcher.dispatch("samples", "insert", {"id": "foo"})
+    await dispatcher.dispatch("samples", "update", {"id": "foo"})
+    await dispatcher.dispatch("samples", "update", {"id": "bar"})
+    await dispatcher.dispatch("samples", "delete", ["foo"])
+
+    await dispatcher.flush()
+
+    assert [c[0][0] for c in m.send_stub.call_args_list] == [
+        {"interface": "samples", "operation": "update", "data": {"id": "bar"}},
+        {"interface": "samples", "operation": "delete", "data": ["foo"]}
+    ]
+
+
+async def test_serialize_once(mocker, create_test_connection):
+    dispatcher = Dispatcher()
+
+    connections = [create_test_connection() for _ in range(5)]
+
+    for m in connections:
+        m.user_id = "test"
+        dispatcher.add_connection(m)
+
+    m_dumps = mocker.spy(virtool.api.json, "dumps")
+
+    await dispatcher.dispatch("otus", "update", {"id": "foo"})
+    await dispatcher.flush()
+
+    assert m_dumps.call_count == 1
+
+    for m in connections:
+        assert m.frames == ['{"operation": "update", "interface": "otus", "data": {"id": "foo"}}']
+
+
+async def test_flush_after_window(create_test_connection):
+    dispatcher = Dispatcher()
+
+    m = create_test_connection()
+    m.user_id = "test"
+
+    dispatcher.add_connection(m)
+
+    await dispatcher.dispatch("otus", "update", {"id": "foo"})
+
+    m.send_stub.assert_not_called()
+
+    await asyncio.sleep(virtool.dispatcher.DISPATCH_WINDOW * 2)
+
+    m.send_stub.assert_called_once_with({"interface": "otus", "operation": "update", "data": {"id": "foo"}})
+
+
+async def test_slow_connection(mocker, create_test_connection):
+    """
+    Test that a connection is closed and removed when its buffer exceeds the limit, while other connections are not
+    affected.
+
+    """
+    mocker.patch("virtool.dispatcher.CONNECTION_BUFFER_LIMIT", 3)
+
+    dispatcher = Dispatcher()
+
+    m_slow = create_test_connection()
+    m_slow.user_id = "slow"
+
+    m_fast = create_test_connection()
+    m_fast.user_id = "fast"
+
+    dispatcher.add_connection(m_slow)
+    dispatcher.add_connection(m_fast)
+
+    for i in range(3):
+        await dispatcher.dispatch("jobs", "update", {"id": f"job_{i}"})
+
+    # Simulate the slow connection still being sent a previous frame.
+    dispatcher._sending.add(m_slow)
+
+    await dispatcher.flush()
+
+    await dispatcher.dispatch("jobs", "update", {"id": "job_3"})
+
+    await asyncio.sleep(0)
+
+    assert dispatcher.connections == [m_fast]
+    m_slow.close_stub.assert_called_once()
+
+    await dispatcher.flush()
+
+    assert m_fast.send_stub.call_count == 4
+    assert len(m_fast.frames) == 2
+    m_slow.send_stub.assert_not_called()
@@ -1,9 +1,13 @@
+import copy
 import os
 import sys
 import pytest
 import shutil
+import statistics
 import pickle
 import filecmp
+import json
+import numpy
 
 import virtool.pathoscope
 
@@ -13,11 +17,15 @@ EM_PATH = os.path.join(BASE_PATH, "em")
 MATRIX_PATH = os.path.join(BASE_PATH, "ps_matrix")
 SAM_PATH = os.path.join(BASE_PATH, "test_al.sam")
 SCORES = os.path.join(BASE_PATH, "scores")
+TO_SUBTRACTION_PATH = os.path.join(BASE_PATH, "to_subtraction.json")
 TSV_PATH = os.path.join(BASE_PATH, "report.tsv")
 UNU_PATH = os.path.join(BASE_PATH, "unu")
 UPDATED_VTA_PATH = os.path.join(BASE_PATH, "updated.vta")
 VTA_PATH = os.path.join(BASE_PATH, "test.vta")
 
+with open(os.path.join(BASE_PATH, "ref_lengths.json"), "r") as f:
+    REF_LENGTHS = json.load(f)
+
 
 @pytest.fixture(scope="session")
 def expected_em():
@@ -54,6 +62,45 @@ def test_build_matrix(tmpdir):
     assert sorted(expected[2]) == sorted(actual[2])
     assert sorted(expected[3]) == sorted(actual[3])
 
+@pytest.mark.parametrize("chunk_size", [1024, virtool.pathoscope.VTA_CHUNK_SIZE])
+def test_build_compact_matrix(chunk_size, tmpdir):
+    """
+    Test that the compact matrix is equivalent to the output of :func:`build_matrix` regardless of chunk size.
+
+    """
+    shutil.copy(VTA_PATH, str(tmpdir))
+    vta_path = os.path.join(str(tmpdir), "test.vta")
+
+    u, nu, refs, reads = virtool.pathoscope.build_matrix(vta_path, 0.01)
+
+    vta = virtool.pathoscope.read_vta(vta_path, 0.01, chunk_size=chunk_size)
+
+    matrix = virtool.pathoscope.build_compact_matrix(vta)
+
+    assert matrix.memory["alignments"] == len(matrix.indices)
+    assert matrix.memory["reads"] == len(reads)
+    assert matrix.memory["refs"] == len(refs)
+    assert matrix.memory["peak_rss"] > matrix.memory["matrix"] > 0
+
+    compact_u, compact_nu, compact_refs, compact_reads = virtool.pathoscope.expand_compact_matrix(matrix)
+
+    assert compact_refs == refs
+    assert compact_reads == reads
+
+    assert compact_u.keys() == u.keys()
+    assert compact_nu.keys() == nu.keys()
+
+    for read_index, (ref_index, score) in u.items():
+        assert compact_u[read_index][0] == ref_index
+        assert compact_u[read_index][1] == pytest.approx(score)
+
+    for read_index, (ref_indexes, scores, x_norm, max_score) in nu.items():
+        assert compact_nu[read_index][0] == ref_indexes
+        assert compact_nu[read_index][1] == pytest.approx(scores)
+        assert compact_nu[read_index][2] == pytest.approx(x_norm)
+        assert compact_nu[read_index][3] == pytest.approx(max_score)
+
+
 @pytest.mark.parametrize("theta_prior", [0, 1e-5])
 @pytest.mark.parametrize("pi_prior", [0, 1e-5])
 @pytest.mark.parametrize("epsilon", [1e-6, 1e-7, 1e-8])
@@ -74,6 +121,33 @@ def test_em(tmpdir, theta_prior, pi_prior, epsilon, max_iter, expected_em):
     assert result[3] == expected_em[file_string][3]
 
 
+@pytest.mark.parametrize("theta_prior", [0, 1e-5])
+@pytest.mark.parametrize("pi_prior", [0, 1e-5])
+@pytest.mark.parametrize("epsilon", [1e-6, 1e-8])
+@pytest.mark.parametrize("max_iter", [0, 5, 30])
+def test_em_numpy(tmpdir, theta_prior, pi_prior, epsilon, max_iter):
+    """
+    Test that the NumPy EM engine gives results equivalent to those of the original :func:`em` implementation.
+
+    """
+    shutil.copy(VTA_PATH, str(tmpdir))
+    vta_path = os.path.join(str(tmpdir), "test.vta")
+
+    u, nu, refs, _ = virtool.pathoscope.build_matrix(vta_path, 0.01)
+
+    expected = virtool.pathoscope.em(u, copy.deepcopy(nu), refs, max_iter, epsilon, pi_prior, theta_prior)
+    result = virtool.pathoscope.em_numpy(u, copy.deepcopy(nu), refs, max_iter, epsilon, pi_prior, theta_prior)
+
+    for i in [0, 1, 2]:
+        assert result[i] == pytest.approx(expected[i], rel=1e-9, abs=1e-300)
+
+    assert result[3].keys() == expected[3].keys()
+
+    for read_index, profile in expected[3].items():
+        assert result[3][read_index][0] == profile[0]
+        assert result[3][read_index][2] == pytest.approx(profile[2], rel=1e-9, abs=1e-12)
+
+
 def test_compute_best_hit():
     """
     Test that :meth:`compute_best_hit` gives the expected result given some input data.
@@ -101,6 +175,60 @@ def test_rewrite_align(tmpdir):
     assert not filecmp.cmp(vta_path, rewrite_path)
 
 
+def test_run_patho_compact(tmpdir):
+    """
+    Test that reassignment using a compact matrix gives the same best hits, reassigned VTA file and coverage as the
+    dict-based functions.
+
+    """
+    shutil.copy(VTA_PATH, str(tmpdir))
+    vta_path = os.path.join(str(tmpdir), "test.vta")
+
+    u, nu, refs, reads = virtool.pathoscope.build_matrix(vta_path, 0.01)
+    vta = virtool.pathoscope.read_vta(vta_path, 0.01)
+    matrix = virtool.pathoscope.build_compact_matrix(vta)
+
+    initial_x_norm = virtool.pathoscope.normalize_compact_scores(matrix)
+
+    for expected, actual in zip(
+            virtool.pathoscope.compute_best_hit(u, nu, refs, reads),
+            virtool.pathoscope.compute_best_hit_compact(matrix, initial_x_norm)
+    ):
+        assert actual == pytest.approx(expected)
+
+    _, pi, _, nu = virtool.pathoscope.em(u, nu, refs, 30, 1e-7, 0, 0)
+    _, compact_pi, _, x_norm = virtool.pathoscope.em_compact(matrix, 30, 1e-7, 0, 0)
+
+    assert compact_pi == pytest.approx(pi, rel=1e-9, abs=1e-300)
+
+    for expected, actual in zip(
+            virtool.pathoscope.compute_best_hit(u, nu, refs, reads),
+            virtool.pathoscope.compute_best_hit_compact(matrix, x_norm)
+    ):
+        assert actual == pytest.approx(expected)
+
+    expected_path = os.path.join(str(tmpdir), "expected.vta")
+    rewrite_path = os.path.join(str(tmpdir), "rewrite.vta")
+
+    virtool.pathoscope.rewrite_align(u, nu, vta_path, 0.01, expected_path)
+
+    reassigned = virtool.pathoscope.reassign_vta(matrix, x_norm, vta, 0.01)
+    virtool.pathoscope.write_vta(vta, reassigned, rewrite_path)
+
+    assert filecmp.cmp(expected_path, rewrite_path, shallow=False)
+
+    coverage, stats = virtool.pathoscope.calculate_vta_coverage(vta, reassigned, REF_LENGTHS)
+
+    assert coverage == virtool.pathoscope.calculate_coverage(expected_path, REF_LENGTHS)
+
+    for ref_id, depths in coverage.items():
+        assert stats[ref_id] == {
+            "coverage": round(1 - depths.count(0) / len(depths), 3),
+            "depth": round(sum(depths) / len(depths)),
+            "median": statistics.median(depths)
+        }
+
+
 def test_calculate_coverage(tmpdir, test_sam_path):
     ref_lengths = dict()
 
@@ -166,4 +294,107 @@ def test_write_report(tmpdir):
     assert filecmp.cmp(report_path, TSV_PATH)
 
 
+def test_subtract_vta(tmpdir):
+    """
+    Test that subtracting from a :class:`VTA` gives the same alignments and subtracted read count as :func:`subtract`.
+
+    """
+    shutil.copy(VTA_PATH, os.path.join(str(tmpdir), "to_isolates.vta"))
+    vta_path = os.path.join(str(tmpdir), "to_isolates.vta")
+
+    with open(TO_SUBTRACTION_PATH, "r") as f:
+        host_scores = json.load(f)
+
+    vta = virtool.pathoscope.read_vta(vta_path)
+
+    subtracted, subtracted_count = virtool.pathoscope.subtract_vta(vta, host_scores)
+
+    assert subtracted_count == virtool.pathoscope.subtract(str(tmpdir), host_scores) == 4
+
+    expected = virtool.pathoscope.read_vta(vta_path)
+
+    assert subtracted.read_ids == expected.read_ids
+    assert subtracted.refs == expected.refs
+
+    for field in ["read_indexes", "ref_indexes", "positions", "lengths", "scores"]:
+        assert getattr(subtracted, field).tolist() == getattr(expected, field).tolist()
+
+    written_path = os.path.join(str(tmpdir), "written.vta")
+
+    virtool.pathoscope.write_vta(subtracted, numpy.ones(len(subtracted.scores), dtype=bool), written_path)
+
+    assert filecmp.cmp(written_path, vta_path, shallow=False)
+
+
+@pytest.mark.parametrize("values", [[0], [3, 1, 2], [4, 0, 0, 1], [2, 2, 5, 5], list(range(100))])
+def test_calculate_median(values):
+    result = virtool.pathoscope.calculate_median(numpy.array(values))
+
+    assert result == statistics.median(values)
+    assert type(result) == type(statistics.median(values))
+
+
+def test_vtb(tmpdir):
+    """
+    Test that converting a VTA file to a binary VTA file and memory-mapping it gives the same alignment columns as
+    reading the original file.
+
+    """
+    vtb_path = os.path.join(str(tmpdir), "test.vtb")
+
+    virtool.pathoscope.convert_vta(VTA_PATH, vtb_path)
+
+    assert virtool.pathoscope.is_vtb(vtb_path)
+    assert not virtool.pathoscope.is_vtb(VTA_PATH)
+
+    assert os.path.getsize(vtb_path) < os.path.getsize(VTA_PATH)
+
+    expected = virtool.pathoscope.read_vta(VTA_PATH)
+    vta = virtool.pathoscope.load_vta(vtb_path)
+
+    assert vta.read_ids == expected.read_ids
+    assert vta.refs == expected.refs
+
+    for field in ["read_indexes", "ref_indexes", "positions", "lengths", "scores"]:
+        assert getattr(vta, field).tolist() == getattr(expected, field).tolist()
+
+    written_path = os.path.join(str(tmpdir), "written.vta")
+
+    virtool.pathoscope.write_vta(vta, numpy.ones(len(vta.scores), dtype=bool), written_path)
+
+    assert filecmp.cmp(written_path, VTA_PATH, shallow=False)
+
+
+def test_vtb_cutoff(tmpdir):
+    """
+    Test that alignments below the score cutoff are removed and ids are renumbered when loading a binary VTA file.
+
+    """
+    vtb_path = os.path.join(str(tmpdir), "test.vtb")
+
+    with virtool.pathoscope.VTBWriter(vtb_path, buffer_size=2) as writer:
+        writer.add("foo", "ref_a", 1, 10, 0.001)
+        writer.add("bar", "ref_b", 5, 10, 12.5)
+        writer.add("foo", "ref_b", 3, 10, 0.5)
+        writer.add("baz", "ref_a", 2, 10, 0.005)
+
+    vta = virtool.pathoscope.read_vtb(vtb_path)
+
+    assert vta.read_ids == {"bar": 0, "foo": 1}
+    assert vta.refs == ["ref_b"]
+    assert vta.read_indexes.tolist() == [0, 1]
+    assert vta.ref_indexes.tolist() == [0, 0]
+    assert vta.positions.tolist() == [5, 3]
+    assert vta.scores.tolist() == [12.5, 0.5]
+
+
+def test_vtb_empty(tmpdir):
+    vtb_path = os.path.join(str(tmpdir), "test.vtb")
+
+    virtool.pathoscope.VTBWriter(vtb_path).close()
+
+    vta = virtool.pathoscope.read_vtb(vtb_path)
 
+    assert vta.read_ids == {}
+    assert vta.refs == []
+    assert len(vta.scores) == 0
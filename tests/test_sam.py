@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+
+import virtool.pathoscope
+import virtool.sam
+
+SAM_50_PATH = os.path.join(sys.path[0], "tests", "test_files", "sam_50.sam")
+
+
+@pytest.fixture(scope="session")
+def sam_lines():
+    with open(SAM_50_PATH, "r") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+@pytest.fixture(scope="session")
+def expected_batch(sam_lines):
+    """
+    The batch expected from parsing `sam_50.sam`, calculated the way the Pathoscope job handlers used to.
+
+    """
+    batch = virtool.sam.SAMBatch([], [], [], [], [], [])
+
+    for line in sam_lines:
+        fields = line.split("\t")
+
+        if int(fields[1]) & 0x4 == 4 or fields[2] == "*":
+            continue
+
+        batch.read_ids.append(fields[0])
+        batch.flags.append(int(fields[1]))
+        batch.ref_ids.append(fields[2])
+        batch.positions.append(int(fields[3]))
+        batch.lengths.append(len(fields[9]))
+        batch.scores.append(virtool.pathoscope.find_sam_align_score(fields))
+
+    return batch
+
+
+def test_parse_sam_lines(sam_lines, expected_batch):
+    lines = ["@HD\tVN:1.0\tSO:unsorted", "@SQ\tSN:NC_016509\tLN:5500", *sam_lines, ""]
+
+    assert virtool.sam.parse_sam_lines(lines) == expected_batch
+
+
+def test_parse_sam_lines_unmapped():
+    line = "read_1\t4\t*\t0\t0\t*\t*\t0\t0\tACGT\tIIII\tYT:Z:UU"
+
+    assert virtool.sam.parse_sam_lines([line]) == virtool.sam.SAMBatch([], [], [], [], [], [])
+
+
+@pytest.mark.parametrize("tags,expected", [
+    ("AS:i:200\tXN:i:0", 200),
+    ("XS:i:12\tAS:i:-8\tXN:i:0", -8),
+    ("XN:i:0\tAS:i:32", 32)
+])
+def test_find_align_score(tags, expected):
+    assert virtool.sam.find_align_score(tags) == expected
+
+
+def test_find_align_score_missing():
+    with pytest.raises(ValueError):
+        virtool.sam.find_align_score("XN:i:0\tXAS:i:3")
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 100, 4096, 1024 * 1024])
+def test_sam_block_reader(block_size, expected_batch):
+    """
+    Test that the same alignments are produced regardless of where block boundaries fall.
+
+    """
+    with open(SAM_50_PATH, "rb") as f:
+        data = f.read()
+
+    batches = list()
+
+    reader = virtool.sam.SAMBlockReader(batches.append)
+
+    for i in range(0, len(data), block_size):
+        reader(data[i:i + block_size])
+
+    reader.close()
+
+    combined = virtool.sam.SAMBatch([], [], [], [], [], [])
+
+    for batch in batches:
+        for field, values in zip(combined, batch):
+            field.extend(values)
+
+    assert combined == expected_batch
+
+
+def test_sam_block_reader_close():
+    """
+    Test that a final line without a trailing newline is handled when the reader is closed.
+
+    """
+    batches = list()
+
+    reader = virtool.sam.SAMBlockReader(batches.append)
+
+    reader(b"read_1\t0\tref_1\t5\t255\t4M\t*\t0\t0\tACGT\tIIII\tAS:i:8")
+
+    assert batches == []
+
+    reader.close()
+
+    assert batches == [virtool.sam.SAMBatch(["read_1"], [0], ["ref_1"], [5], [4], [12.0])]
@@ -53,6 +53,60 @@ async def get(req):
     return json_response(virtool.utils.base_processor(document))
 
 
+@routes.get("/api/analyses/{analysis_id}/coverage/{sequence_id}")
+async def get_coverage(req):
+    """
+    Get the coverage coordinates for a single sequence in a Pathoscope analysis. The `level` query parameter selects a
+    zoom level from :data:`virtool.analyses.utils.COVERAGE_LEVELS`. Higher levels have more coordinates.
+
+    """
+    db = req.app["db"]
+
+    analysis_id = req.match_info["analysis_id"]
+    sequence_id = req.match_info["sequence_id"]
+
+    try:
+        level = int(req.query.get("level", 0))
+    except ValueError:
+        return bad_request("Invalid level")
+
+    if level < 0 or level >= len(virtool.analyses.utils.COVERAGE_LEVELS):
+        return bad_request("Invalid level")
+
+    document = await db.analyses.find_one(analysis_id, ["ready", "sample", "workflow"])
+
+    if document is None:
+        return not_found()
+
+    if "pathoscope" not in document["workflow"]:
+        return conflict("Not a Pathoscope analysis")
+
+    if not document["ready"]:
+        return conflict("Analysis is still running")
+
+    sample = await db.samples.find_one({"_id": document["sample"]["id"]}, virtool.samples.db.PROJECTION)
+
+    if not sample:
+        return bad_request("Parent sample does not exist")
+
+    read, _ = virtool.samples.utils.get_sample_rights(sample, req["client"])
+
+    if not read:
+        return insufficient_rights()
+
+    coordinates = await virtool.analyses.format.get_coverage_level(req.app, document, sequence_id, level)
+
+    if coordinates is None:
+        return not_found("Sequence not found")
+
+    return json_response({
+        "id": sequence_id,
+        "level": level,
+        "levels": len(virtool.analyses.utils.COVERAGE_LEVELS),
+        "coordinates": coordinates
+    })
+
+
 @routes.delete("/api/analyses/{analysis_id}")
 async def remove(req):
     """
@@ -85,6 +139,13 @@ async def remove(req):
 
     await db.analyses.delete_one({"_id": analysis_id})
 
+    await db.coverage.delete_many({"analysis.id": analysis_id})
+
+    cache = virtool.analyses.utils.get_formatted_cache(req.app)
+
+    if cache is not None:
+        cache.remove(analysis_id)
+
     path = os.path.join(req.app["settings"]["data_path"], "samples", sample_id, "analysis", analysis_id)
 
     await req.app["run_in_thread"](virtool.utils.rm, path, True)
@@ -9,9 +9,11 @@ import io
 import json
 import statistics
 from collections import defaultdict
+from typing import Callable, Dict, Union
 
 import aiofiles
 import openpyxl.styles
+import pymongo.errors
 
 import virtool.analyses.db
 import virtool.analyses.utils
@@ -31,11 +33,16 @@ CSV_HEADERS = (
     "Coverage"
 )
 
+#: The maximum number of OTUs that are patched concurrently when formatting an analysis.
+PATCH_CONCURRENCY = 10
+
 
 def calculate_median_depths(document: dict) -> dict:
     """
     Calculate the median depth for all hits (sequences) in a Pathoscope result document.
 
+    Median depths calculated by the Pathoscope job are used if present. Older analyses do not include them.
+
     :param document: the pathoscope analysis document to calculate depths for
     :return: a dict of median depths keyed by hit (sequence) ids
 
@@ -43,51 +50,131 @@ def calculate_median_depths(document: dict) -> dict:
     depths = dict()
 
     for hit in document["results"]:
-        depths[hit["id"]] = statistics.median(hit["align"])
+        try:
+            depths[hit["id"]] = hit["median"]
+        except KeyError:
+            depths[hit["id"]] = statistics.median(hit["align"])
 
     return depths
 
 
-async def create_pathoscope_coverage_cache(db, document):
-    cache = defaultdict(lambda: defaultdict(lambda: dict()))
+async def create_pathoscope_coverage_cache(app, analysis_id: str, depths: Dict[str, list]) -> dict:
+    """
+    Compute and store coverage coordinates for a Pathoscope analysis that was imported before coverage was
+    precomputed by the job.
 
-    for hit in document["results"]:
-        for isolate in hit["isolates"]:
-            for sequence in isolate["sequences"]:
-                otu_id = hit["id"]
-                isolate_id = isolate["id"]
-                sequence_id = sequence["id"]
-
-                if sequence.get("align"):
-                    cache[otu_id][isolate_id][sequence_id] = virtool.analyses.utils.transform_coverage_to_coordinates(sequence["align"])
-
-    document = {
-        "analysis": {
-            "id": document["_id"]
-        },
-        "cache": cache
-    }
+    :param app: the application object
+    :param analysis_id: the ID of the analysis
+    :param depths: lists of position-indexed depth values keyed by sequence ID
+    :return: the summary coverage document
 
-    await db.coverage.insert_one(document)
+    """
+    db = app["db"]
+
+    documents = await app["run_in_thread"](
+        virtool.analyses.utils.compose_coverage_documents,
+        analysis_id,
+        depths
+    )
+
+    # Remove old coverage documents that were keyed by OTU and isolate.
+    await db.coverage.delete_many({"analysis.id": analysis_id})
+
+    try:
+        await db.coverage.insert_many(documents, ordered=False)
+    except pymongo.errors.BulkWriteError:
+        # A concurrent request already stored the coverage documents.
+        pass
+
+    return documents[0]
 
-    return document
 
+async def ensure_pathoscope_coverage_cache(app, document: dict, hits: list):
+    """
+    Attach coverage coordinates at the lowest zoom level to the sequences in a formatted Pathoscope analysis.
+
+    Coordinates are normally stored by the job. They are created from the analysis depths for older analyses.
+
+    :param app: the application object
+    :param document: the formatted analysis document
+    :param hits: the unformatted analysis results
 
-async def ensure_pathoscope_coverage_cache(db, document):
-    cache = await db.coverage.find_one({"analysis.id": document["_id"]})
+    """
+    cache = await app["db"].coverage.find_one({"_id": document["_id"]}, ["sequences"])
 
     if cache is None:
-        cache = await create_pathoscope_coverage_cache(db, document)
+        depths = await load_depths(app, document, hits)
+        cache = await create_pathoscope_coverage_cache(app, document["_id"], depths)
 
-    for hit in document["results"]:
-        for isolate in hit["isolates"]:
+    for otu in document["results"]:
+        for isolate in otu["isolates"]:
             for sequence in isolate["sequences"]:
-                otu_id = hit["id"]
-                isolate_id = isolate["id"]
-                sequence_id = sequence["id"]
+                coordinates = cache["sequences"].get(sequence["id"])
+
+                if coordinates is not None:
+                    sequence["align"] = coordinates
+
+
+async def get_coverage_level(app, document: dict, sequence_id: str, level: int) -> Union[list, None]:
+    """
+    Get the coverage coordinates for a single sequence in a Pathoscope analysis at a zoom level from
+    :data:`virtool.analyses.utils.COVERAGE_LEVELS`.
+
+    Returns `None` if the sequence has no coverage in the analysis. The analysis results are only loaded if the
+    coverage documents for the analysis have not been created yet.
+
+    :param app: the application object
+    :param document: the analysis document with at least its `sample` field
+    :param sequence_id: the ID of the sequence
+    :param level: the index of the zoom level
+    :return: a list of (x, y) coordinates
+
+    """
+    coverage_id = f"{document['_id']}.{sequence_id}"
+
+    cache = await app["db"].coverage.find_one(coverage_id, ["levels"])
+
+    if cache is None:
+        document = await app["db"].analyses.find_one(document["_id"], ["results", "sample"])
+        document = await load_results(app["settings"], document)
+
+        depths = await load_depths(app, document, document["results"])
+
+        if sequence_id not in depths:
+            return None
 
-                if sequence.get("align"):
-                    sequence["align"] = cache["cache"][otu_id][isolate_id][sequence_id]
+        await create_pathoscope_coverage_cache(app, document["_id"], depths)
+
+        cache = await app["db"].coverage.find_one(coverage_id, ["levels"])
+
+    return cache["levels"][level]
+
+
+async def load_depths(app, document: dict, hits: list) -> Dict[str, list]:
+    """
+    Load the per-base depth lists for a Pathoscope analysis. Sequences with no depths are left out.
+
+    Depths are read from the compressed coverage file written by the job. Analyses that predate the coverage file store
+    depth lists in the `align` field of each hit.
+
+    :param app: the application object
+    :param document: the analysis document
+    :param hits: the unformatted analysis results
+    :return: lists of position-indexed depth values keyed by sequence ID
+
+    """
+    path = virtool.analyses.utils.join_analysis_coverage_path(
+        app["settings"]["data_path"],
+        document["_id"],
+        document["sample"]["id"]
+    )
+
+    try:
+        depths = await app["run_in_thread"](virtool.analyses.utils.read_coverage_file, path)
+    except FileNotFoundError:
+        depths = {hit["id"]: hit.get("align") for hit in hits}
+
+    return {sequence_id: d for sequence_id, d in depths.items() if d}
 
 
 async def load_results(settings: dict, document: dict) -> dict:
@@ -149,6 +236,8 @@ async def format_pathoscope(app, document):
 
     patched_otus = await gather_patched_otus(app, document["results"])
 
+    hits = document["results"]
+
     formatted = dict()
 
     for hit in document["results"]:
@@ -207,7 +296,7 @@ async def format_pathoscope(app, document):
                 sequence["id"] = sequence.pop("_id")
                 del sequence["sequence"]
 
-    await ensure_pathoscope_coverage_cache(app["db"], document)
+    await ensure_pathoscope_coverage_cache(app, document, hits)
 
     return document
 
@@ -325,24 +414,62 @@ async def format_analysis(app, document: dict) -> dict:
             return await format_nuvs(app, document)
 
         if "pathoscope" in workflow:
-            return await format_pathoscope(app, document)
+            return await format_cached(app, document, format_pathoscope)
 
         if workflow == "aodp":
-            return await format_aodp(app, document)
+            return await format_cached(app, document, format_aodp)
 
     raise ValueError("Could not determine analysis workflow")
 
 
+async def format_cached(app, document: dict, func: Callable) -> dict:
+    """
+    Format an analysis document using `func`, reusing formatted results from the application's
+    :class:`~virtool.analyses.utils.FormattedCache` where possible.
+
+    Only the formatted results are cached. The rest of the returned document is always taken from `document`. Analyses
+    that are not ready are never cached.
+
+    :param app: the application object
+    :param document: the analysis document to format
+    :param func: the workflow-specific format function
+    :return: a formatted document
+
+    """
+    cache = virtool.analyses.utils.get_formatted_cache(app)
+
+    if cache is None or not document.get("ready"):
+        return await func(app, document)
+
+    analysis_id = document["_id"]
+    key = virtool.analyses.utils.compose_formatted_cache_key(document)
+
+    results = cache.get(analysis_id, key)
+
+    if results is None:
+        formatted = await func(app, document)
+
+        results = formatted["results"]
+
+        cache.set(analysis_id, key, results, {otu["id"]: otu["version"] for otu in results})
+
+    return {
+        **document,
+        "results": results
+    }
+
+
 async def gather_patched_otus(app, results):
     # Use set to only id-version combinations once.
     otu_specifiers = {(hit["otu"]["id"], hit["otu"]["version"]) for hit in results}
 
-    patched_otus = await asyncio.gather(*[
-        virtool.history.db.patch_to_version(
-            app,
-            otu_id,
-            version
-        ) for otu_id, version in otu_specifiers
-    ])
+    # Limit the number of OTUs being patched at once so large analyses don't flood the database with queries.
+    semaphore = asyncio.Semaphore(PATCH_CONCURRENCY)
+
+    async def patch(otu_id, version):
+        async with semaphore:
+            return await virtool.history.db.get_patched_otu(app, otu_id, version)
+
+    patched_otus = await asyncio.gather(*[patch(otu_id, version) for otu_id, version in otu_specifiers])
 
-    return {patched["_id"]: patched for _, patched, _ in patched_otus}
+    return {patched["_id"]: patched for patched in patched_otus}
@@ -3,13 +3,17 @@ import json
 import os
 import pathlib
 import re
+import statistics
 
 import aiofiles
+import pymongo.errors
 
+import virtool.analyses.format
 import virtool.analyses.utils
 import virtool.api.utils
 import virtool.db.core
 import virtool.db.migrate
+import virtool.utils
 
 RE_JSON_FILENAME = re.compile("(pathoscope.json|nuvs.json)$")
 
@@ -31,6 +35,7 @@ async def migrate_analyses(app):
     await rename_results_field(db)
     await convert_pathoscope_files(db, settings)
     await rename_analysis_json_files(settings)
+    await move_coverage_to_files(app)
     await add_subtractions_to_analyses(db)
     await virtool.db.migrate.delete_unready(db.analyses)
 
@@ -123,6 +128,95 @@ async def convert_pathoscope_files(db, settings):
         )
 
 
+async def move_coverage_to_file(app, document: dict):
+    """
+    Move the depth lists out of a Pathoscope analysis's results and into a compressed coverage file.
+
+    Median depths are stored on each hit first, because they can no longer be calculated from the results. Results that
+    were only stored in a `results.json` file because of the depth lists are moved back into the analysis document.
+
+    :param app: the application object
+    :param document: the analysis document
+
+    """
+    db = app["db"]
+    data_path = app["settings"]["data_path"]
+
+    analysis_id = document["_id"]
+    sample_id = document["sample"]["id"]
+
+    results = (await virtool.analyses.format.load_results(app["settings"], document))["results"]
+
+    depths = dict()
+
+    for hit in results:
+        align = hit.pop("align", None)
+
+        if align:
+            depths[hit["id"]] = align
+
+            if "median" not in hit:
+                hit["median"] = statistics.median(align)
+
+    # Write the coverage file first. The depth lists are still in the results if the migration is interrupted.
+    await app["run_in_thread"](
+        virtool.analyses.utils.write_coverage_file,
+        virtool.analyses.utils.join_analysis_coverage_path(data_path, analysis_id, sample_id),
+        depths
+    )
+
+    json_path = virtool.analyses.utils.join_analysis_json_path(data_path, analysis_id, sample_id)
+
+    try:
+        await db.analyses.update_one({"_id": analysis_id}, {
+            "$set": {
+                "results": results
+            }
+        })
+    except pymongo.errors.DocumentTooLarge:
+        async with aiofiles.open(json_path, "w") as f:
+            await f.write(json.dumps(results))
+
+        return
+
+    if document["results"] == "file":
+        await app["run_in_thread"](virtool.utils.rm, json_path)
+
+
+async def move_coverage_to_files(app):
+    """
+    Move the depth lists of all Pathoscope analyses into compressed coverage files. Analyses with results stored in a
+    `results.json` file are skipped if they already have a coverage file.
+
+    :param app: the application object
+
+    """
+    db = app["db"]
+    data_path = app["settings"]["data_path"]
+
+    query = {
+        "workflow": "pathoscope_bowtie",
+        "ready": True,
+        "$or": [
+            {"results": "file"},
+            {"results.align": {"$exists": True}}
+        ]
+    }
+
+    async for document in db.analyses.find(query, ["_id", "results", "sample"]):
+        if document["results"] == "file":
+            path = virtool.analyses.utils.join_analysis_coverage_path(
+                data_path,
+                document["_id"],
+                document["sample"]["id"]
+            )
+
+            if os.path.isfile(path):
+                continue
+
+        await move_coverage_to_file(app, document)
+
+
 async def rename_algorithm_field(db):
     query = virtool.api.utils.compose_exists_query("algorithm")
 
@@ -1,7 +1,17 @@
+import collections
 import os
-from typing import Union
+from typing import Dict, Hashable, Iterable, List, Tuple, Union
 
-import visvalingamwyatt as vw
+import numpy
+
+#: The name of the file per-base depths for Pathoscope analyses are stored in.
+COVERAGE_FILENAME = "coverage.npz"
+
+#: The maximum number of coordinates at each coverage zoom level. `None` means the coordinates are not simplified.
+COVERAGE_LEVELS = (500, 5000, None)
+
+#: The maximum number of formatted analyses held in a :class:`FormattedCache`.
+FORMATTED_CACHE_SIZE = 50
 
 WORKFLOW_NAMES = (
     "aodp",
@@ -10,35 +20,336 @@ WORKFLOW_NAMES = (
 )
 
 
-def transform_coverage_to_coordinates(coverage_list: list) -> list:
+class FormattedCache:
+    """
+    A least-recently-used cache of formatted analysis results.
+
+    Each entry is stored under its analysis ID along with a key describing the reference versions the results were
+    formatted against and a manifest of the OTU versions they contain. An entry is only returned if the key passed to
+    :meth:`.get` matches the one it was stored with.
+
+    :param size: the maximum number of entries to hold
+
+    """
+
+    def __init__(self, size: int = FORMATTED_CACHE_SIZE):
+        self.size = size
+        self._entries = collections.OrderedDict()
+
+    def __contains__(self, analysis_id: str) -> bool:
+        return analysis_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, analysis_id: str, key: Hashable) -> Union[list, None]:
+        """
+        Get the cached results for the analysis identified by `analysis_id`. Returns `None` if there is no entry for the
+        analysis or the entry was stored with a different `key`.
+
+        :param analysis_id: the ID of the analysis
+        :param key: the reference versions the results must have been formatted against
+        :return: the formatted results
+
+        """
+        try:
+            entry_key, results, _ = self._entries[analysis_id]
+        except KeyError:
+            return None
+
+        if entry_key != key:
+            return None
+
+        self._entries.move_to_end(analysis_id)
+
+        return results
+
+    def set(self, analysis_id: str, key: Hashable, results: list, manifest: Dict[str, int]):
+        """
+        Store formatted results for the analysis identified by `analysis_id`. The least recently used entries are
+        dropped if the cache is full.
+
+        :param analysis_id: the ID of the analysis
+        :param key: the reference versions the results were formatted against
+        :param results: the formatted results
+        :param manifest: the IDs and versions of the OTUs in the results
+
+        """
+        self._entries[analysis_id] = (key, results, manifest)
+        self._entries.move_to_end(analysis_id)
+
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def remove(self, analysis_id: str):
+        """
+        Remove the entry for the analysis identified by `analysis_id` if there is one.
+
+        :param analysis_id: the ID of the analysis
+
+        """
+        self._entries.pop(analysis_id, None)
+
+    def remove_otu(self, otu_id: str, version: int):
+        """
+        Remove all entries containing the OTU identified by `otu_id` at `version` or later. Called when OTU changes are
+        reverted and patched versions of the OTU no longer reflect its history.
+
+        :param otu_id: the ID of the OTU
+        :param version: the first invalidated OTU version
+
+        """
+        for analysis_id, (_, _, manifest) in list(self._entries.items()):
+            if manifest.get(otu_id, -1) >= version:
+                del self._entries[analysis_id]
+
+
+def transform_coverage_to_coordinates(coverage_list: list, max_points: Union[int, None] = 100) -> list:
     """
     Takes a list of read depths where the list index is equal to the read position + 1 and returns a list of (x, y)
     coordinates.
 
-    The coordinates will be simplified using Visvalingham-Wyatt algorithm if the list exceeds 100 pairs.
+    The coordinates will be simplified using :func:`simplify_coordinates` if there are more than `max_points` pairs.
 
     :param coverage_list: a list of position-indexed depth values
+    :param max_points: the maximum number of coordinates to return or `None` to skip simplification
     :return: a list of (x, y) coordinates
 
     """
-    previous_depth = coverage_list[0]
-    coordinates = {(0, previous_depth)}
+    x, y = simplify_coordinates(*encode_coverage(coverage_list), max_points)
+
+    return list(zip(x.tolist(), y.tolist()))
+
+
+def encode_coverage(depths: Union[list, numpy.ndarray]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Run-length encode a list of position-indexed read depths as the x and y values of coordinates.
+
+    Each run of equal depths is described by a coordinate at its first and last position. Runs of length one are
+    described by a single coordinate.
+
+    :param depths: position-indexed depth values
+    :return: arrays of x and y values
+
+    """
+    depths = numpy.asarray(depths)
+
+    if depths.size == 0:
+        return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=depths.dtype)
+
+    starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(depths)) + 1))
+    ends = numpy.append(starts[1:] - 1, depths.size - 1)
+
+    x = numpy.column_stack((starts, ends)).ravel()
+    y = numpy.repeat(depths[starts], 2)
+
+    # Drop the end coordinate of runs that are only one position long.
+    mask = numpy.ones(x.size, dtype=bool)
+    mask[1::2] = ends != starts
+
+    return x[mask], y[mask]
+
+
+def simplify_coordinates(
+        x: numpy.ndarray,
+        y: numpy.ndarray,
+        max_points: Union[int, None]
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Reduce a set of coverage coordinates to at most `max_points` coordinates.
 
-    last = len(coverage_list) - 1
+    The x range is divided into equal buckets and only the coordinates with the lowest and highest depths in each bucket
+    are kept, along with the first and last coordinates. This preserves the peaks and troughs of the coverage plot.
 
-    for i, depth in enumerate(coverage_list):
-        if depth != previous_depth or i == last:
-            coordinates.add((i - 1, previous_depth))
-            coordinates.add((i, depth))
+    :param x: the x values of the coordinates in ascending order
+    :param y: the y values of the coordinates
+    :param max_points: the maximum number of coordinates to keep or `None` to keep all of them
+    :return: arrays of the kept x and y values
+
+    """
+    if max_points is None or x.size <= max_points:
+        return x, y
 
-            previous_depth = depth
+    bucket_count = max(1, (max_points - 2) // 2)
 
-    coordinates = sorted(list(coordinates), key=lambda x: x[0])
+    buckets = (x - x[0]) * bucket_count // (x[-1] - x[0] + 1)
 
-    if len(coordinates) > 100:
-        return vw.simplify(coordinates, ratio=0.4)
+    # Sort by bucket, then depth. The first and last coordinates of each bucket are its minimum and maximum.
+    order = numpy.lexsort((y, buckets))
 
-    return coordinates
+    boundaries = numpy.flatnonzero(numpy.diff(buckets[order])) + 1
+
+    firsts = numpy.concatenate(([0], boundaries))
+    lasts = numpy.append(boundaries - 1, order.size - 1)
+
+    keep = numpy.unique(numpy.concatenate((order[firsts], order[lasts], [0, x.size - 1])))
+
+    return x[keep], y[keep]
+
+
+def compose_coverage_levels(depths: Union[list, numpy.ndarray]) -> List[list]:
+    """
+    Compose coverage coordinates for a single sequence at each zoom level in :data:`COVERAGE_LEVELS`.
+
+    :param depths: position-indexed depth values
+    :return: a list of (x, y) coordinate lists, one for each zoom level
+
+    """
+    x, y = encode_coverage(depths)
+
+    levels = list()
+
+    for max_points in COVERAGE_LEVELS:
+        simplified_x, simplified_y = simplify_coordinates(x, y, max_points)
+        levels.append(numpy.column_stack((simplified_x, simplified_y)).tolist())
+
+    return levels
+
+
+def compose_coverage_documents(analysis_id: str, depths: Dict[str, list]) -> List[dict]:
+    """
+    Compose the `coverage` collection documents for a Pathoscope analysis.
+
+    A summary document with an ``_id`` equal to `analysis_id` holds the lowest zoom level for every sequence and is used
+    when formatting the analysis. One document per sequence holds every zoom level so clients can request higher
+    resolution coverage for a single sequence.
+
+    :param analysis_id: the ID of the analysis
+    :param depths: lists of position-indexed depth values keyed by sequence ID
+    :return: the coverage documents
+
+    """
+    summary = {
+        "_id": analysis_id,
+        "analysis": {
+            "id": analysis_id
+        },
+        "sequences": dict()
+    }
+
+    documents = [summary]
+
+    for sequence_id, sequence_depths in depths.items():
+        levels = compose_coverage_levels(sequence_depths)
+
+        summary["sequences"][sequence_id] = levels[0]
+
+        documents.append({
+            "_id": f"{analysis_id}.{sequence_id}",
+            "analysis": {
+                "id": analysis_id
+            },
+            "sequence": {
+                "id": sequence_id
+            },
+            "levels": levels
+        })
+
+    return documents
+
+
+def decode_depths(encoded: numpy.ndarray) -> numpy.ndarray:
+    """
+    Decode depths encoded with :func:`encode_depths`.
+
+    :param encoded: the run lengths and depth deltas
+    :return: position-indexed depth values
+
+    """
+    lengths, deltas = encoded
+
+    return numpy.repeat(numpy.cumsum(deltas, dtype=numpy.int64), lengths)
+
+
+def encode_depths(depths: Union[list, numpy.ndarray]) -> numpy.ndarray:
+    """
+    Run-length encode a list of position-indexed read depths for storage. The first row of the returned array holds the
+    run lengths. The second holds the difference between the depth of each run and the one before it. Neighbouring
+    depths are usually similar, so the small differences compress much better than the depths themselves.
+
+    :param depths: position-indexed depth values
+    :return: the run lengths and depth deltas
+
+    """
+    depths = numpy.asarray(depths, dtype=numpy.int64)
+
+    if depths.size == 0:
+        return numpy.empty((2, 0), dtype=numpy.int32)
+
+    starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(depths)) + 1))
+    lengths = numpy.diff(numpy.append(starts, depths.size))
+
+    return numpy.stack((lengths, numpy.diff(depths[starts], prepend=0))).astype(numpy.int32)
+
+
+def read_coverage_file(path: str, sequence_ids: Union[Iterable[str], None] = None) -> Dict[str, list]:
+    """
+    Read depth lists from a coverage file written by :func:`write_coverage_file`.
+
+    Only the sequences in `sequence_ids` are decompressed and decoded if it is provided.
+
+    :param path: the path to the coverage file
+    :param sequence_ids: the IDs of the sequences to read
+    :return: lists of position-indexed depth values keyed by sequence ID
+
+    """
+    with numpy.load(path) as data:
+        if sequence_ids is None:
+            sequence_ids = data.files
+        else:
+            sequence_ids = [sequence_id for sequence_id in sequence_ids if sequence_id in data.files]
+
+        return {sequence_id: decode_depths(data[sequence_id]).tolist() for sequence_id in sequence_ids}
+
+
+def write_coverage_file(path: str, depths: Dict[str, Union[list, numpy.ndarray]]):
+    """
+    Write depth lists to a compressed coverage file at `path`. Each list is run-length encoded with
+    :func:`encode_depths` and stored as a separate zlib-compressed array so it can be read without decoding the others.
+
+    The file is written to a temporary path first so readers never see a partially written file.
+
+    :param path: the path to write the coverage file to
+    :param depths: lists of position-indexed depth values keyed by sequence ID
+
+    """
+    temp_path = f"{path}.tmp"
+
+    with open(temp_path, "wb") as f:
+        numpy.savez_compressed(f, **{sequence_id: encode_depths(d) for sequence_id, d in depths.items()})
+
+    os.replace(temp_path, path)
+
+
+def compose_formatted_cache_key(document: dict) -> tuple:
+    """
+    Compose a :class:`FormattedCache` key for an analysis document. The key changes if the analysis is associated with a
+    different workflow, reference, or index version.
+
+    :param document: the analysis document
+    :return: the cache key
+
+    """
+    reference = document.get("reference") or dict()
+    index = document.get("index") or dict()
+
+    return (
+        document.get("workflow"),
+        reference.get("id"),
+        index.get("id"),
+        index.get("version")
+    )
+
+
+def get_formatted_cache(app) -> Union[FormattedCache, None]:
+    """
+    Get the formatted analysis cache for the application. Returns `None` if the application does not have one.
+
+    :param app: the application object
+    :return: the formatted analysis cache
+
+    """
+    return app.get("formatted_analyses")
 
 
 def find_nuvs_sequence_by_index(document: dict, sequence_index: int) -> Union[None, dict]:
@@ -87,3 +398,10 @@ def join_analysis_json_path(data_path, analysis_id, sample_id):
         join_analysis_path(data_path, analysis_id, sample_id),
         "results.json"
     )
+
+
+def join_analysis_coverage_path(data_path, analysis_id, sample_id):
+    return os.path.join(
+        join_analysis_path(data_path, analysis_id, sample_id),
+        COVERAGE_FILENAME
+    )
@@ -11,6 +11,7 @@ import pymongo.errors
 from aiohttp import client, web
 from motor import motor_asyncio
 
+import virtool.analyses.utils
 import virtool.app_routes
 import virtool.config
 import virtool.db.core
@@ -41,6 +42,32 @@ import virtool.version
 logger = logging.getLogger(__name__)
 
 
+async def init_formatted_cache(app: web.Application):
+    """
+    Create a cache for formatted analysis results and attach it to the application.
+
+    :param app: the application object
+
+    """
+    app["formatted_analyses"] = virtool.analyses.utils.FormattedCache()
+
+
+async def init_pressed_profiles(app: web.Application):
+    """
+    Press installed HMM profiles that do not have a pressed profile set yet. Pressing runs in the background so startup
+    is not delayed.
+
+    :param app: the application object
+
+    """
+    if app["setup"] is not None:
+        return
+
+    scheduler = aiojobs.aiohttp.get_scheduler_from_app(app)
+
+    await scheduler.spawn(virtool.hmm.db.press_installed_profiles(app))
+
+
 async def init_http_client(app: web.Application):
     """
     Create an async HTTP client session for the server.
@@ -233,6 +260,9 @@ async def init_check_db(app):
     await db.history.create_index("created_at")
     await db.history.create_index([("otu.name", 1)])
     await db.history.create_index([("otu.version", -1)])
+    await db.snapshots.create_index([("otu.id", 1), ("otu.version", 1)])
+    await db.snapshots.create_index("reference.id")
+    await db.snapshots.create_index("accessed_at")
     await db.indexes.drop_indexes()
     await db.indexes.create_index([("version", 1), ("reference.id", 1)], unique=True)
     await db.keys.create_index("id", unique=True)
@@ -437,6 +467,7 @@ def create_app(config):
         init_http_client,
         init_routes,
         init_executors,
+        init_formatted_cache,
         init_dispatcher,
         init_db,
         init_settings,
@@ -445,6 +476,7 @@ def create_app(config):
         init_resources,
         init_job_manager,
         init_file_manager,
+        init_pressed_profiles,
         init_refresh
     ])
 
@@ -1,13 +1,20 @@
 import asyncio
+import codecs
+import collections
+import contextlib
 import gzip
 import io
+import itertools
 import json
 import logging
 import re
+import shutil
+import subprocess
 import zipfile
-from typing import Generator, List
+from typing import BinaryIO, Generator, Iterable, List, Tuple
 
 import aiohttp
+import numpy
 
 import virtool.analyses.db
 import virtool.errors
@@ -18,13 +25,21 @@ logger = logging.getLogger(__name__)
 
 BLAST_URL = "https://blast.ncbi.nlm.nih.gov/Blast.cgi"
 
-COMPLEMENT_TABLE = {
-    "A": "T",
-    "T": "A",
-    "G": "C",
-    "C": "G",
-    "N": "N"
-}
+#: A batch of FASTQ records. Each field contains one item per record. Headers include the leading ``@``.
+FASTQBatch = collections.namedtuple("FASTQBatch", [
+    "headers",
+    "sequences",
+    "qualities"
+])
+
+#: The number of bytes read from FASTA and FASTQ files at a time.
+BUFFER_SIZE = 4 * 1024 * 1024
+
+#: The first two bytes of every GZIP file.
+GZIP_MAGIC = b"\x1f\x8b"
+
+#: Complements for :meth:`str.translate`. Lowercase bases are complemented to uppercase.
+COMPLEMENT_TABLE = str.maketrans("ATGCNatgcn", "TACGNTACGN")
 
 #: A standard translation table, including ambiguity.
 TRANSLATION_TABLE = {
@@ -122,40 +137,156 @@ TRANSLATION_TABLE = {
     "GGN": "G"
 }
 
+#: Maps byte values to the indexes of the nucleotides that can be part of a codon in :data:`TRANSLATION_TABLE`.
+#: Lowercase bases get the same index as uppercase ones. All other characters get index 5.
+BASE_INDEXES = numpy.full(256, 5, dtype=numpy.uint8)
+BASE_INDEXES[list(b"ACGTNacgtn")] = list(range(5)) * 2
 
-def read_fasta(path: str) -> List[tuple]:
+#: The shape of :data:`CODON_AMINO_ACIDS` before it is flattened. There is one dimension for each codon position.
+CODON_SHAPE = (6, 6, 6)
+
+#: Amino acid byte values for every combination of three base indexes from :data:`BASE_INDEXES`. Codons that are not
+#: in :data:`TRANSLATION_TABLE` translate to _X_.
+CODON_AMINO_ACIDS = numpy.full(216, ord("X"), dtype=numpy.uint8)
+CODON_AMINO_ACIDS[numpy.ravel_multi_index(
+    BASE_INDEXES[list("".join(TRANSLATION_TABLE).encode())].reshape(-1, 3).T,
+    CODON_SHAPE
+)] = list("".join(TRANSLATION_TABLE.values()).encode())
+
+
+@contextlib.contextmanager
+def open_sequence_file(path: str, threads: int = 1) -> BinaryIO:
     """
-    Parse the FASTA file at `path` and return its content as a `list` of tuples containing the header and sequence.
+    Open the FASTA or FASTQ file at `path` for reading as bytes. GZIP-compressed files are detected by their magic
+    number.
 
-    :param path: the path to the FASTA file
-    :return: the FASTA content
+    Compressed files are decompressed by ``pigz`` in a subprocess if it is installed and `threads` is greater than one.
+    Otherwise they are decompressed in-process through a large read buffer. An :class:`IOError` is raised if ``pigz``
+    fails after the file has been read to the end, so corrupt or truncated files are not mistaken for complete ones.
+
+    :param path: the path to the file
+    :param threads: the number of threads to allow for decompression
+    :return: a binary file object
 
     """
-    data = list()
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
 
-    with open(path, "r") as f:
-        header = None
-        seq = []
+    if not compressed:
+        with open(path, "rb", buffering=BUFFER_SIZE) as f:
+            yield f
 
-        for line in f:
-            if line[0] == ">":
-                if header:
-                    data.append((header, "".join(seq)))
+        return
 
-                header = line.rstrip().replace(">", "")
-                seq = []
-                continue
+    pigz = shutil.which("pigz") if threads > 1 else None
 
-            if header:
-                seq.append(line.rstrip())
-                continue
+    if pigz is None:
+        with gzip.open(path, "rb") as gz, io.BufferedReader(gz, buffer_size=BUFFER_SIZE) as f:
+            yield f
+
+        return
+
+    command = [pigz, "-dc", "-p", str(threads), path]
+
+    with subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=BUFFER_SIZE) as process:
+        try:
+            yield process.stdout
+
+            # The exit status is only meaningful if the consumer read all of the output.
+            finished = not process.stdout.read(1)
+
+            if not finished:
+                process.kill()
+
+            if process.wait() != 0 and finished:
+                raise IOError(f"Could not decompress {path}: pigz exited with code {process.returncode}")
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+
+
+def read_chunks(path: str, threads: int = 1) -> Generator[bytes, None, None]:
+    """
+    Read the uncompressed content of the FASTA or FASTQ file at `path` in chunks of up to :data:`BUFFER_SIZE` bytes.
+
+    :param path: the path to the file
+    :param threads: the number of threads to allow for decompression
+    :return: chunks of bytes
+
+    """
+    with open_sequence_file(path, threads) as f:
+        while True:
+            chunk = f.read(BUFFER_SIZE)
+
+            if not chunk:
+                return
+
+            yield chunk
+
+
+def read_fasta_records(path: str) -> Generator[Tuple[str, str], None, None]:
+    """
+    Read the FASTA file at `path` and yield its records as tuples containing the header and sequence. Accepts both
+    uncompressed and GZIP-compressed files.
+
+    The file is read in large chunks that are split on record boundaries rather than one line at a time.
+
+    :param path: the path to the FASTA file
+    :return: tuples containing the header and sequence
+
+    """
+    pieces = list()
 
+    for chunk in read_chunks(path):
+        if not pieces and not chunk.startswith(b">"):
+            line = chunk.split(b"\n", 1)[0].decode()
             raise IOError(f"Illegal FASTA line: {line}")
 
-        if header:
-            data.append((header, "".join(seq)))
+        end = chunk.rfind(b"\n>")
+
+        if end == -1:
+            pieces.append(chunk)
+            continue
+
+        pieces.append(chunk[:end])
+
+        yield from parse_fasta_records(b"".join(pieces))
+
+        pieces = [chunk[end + 1:]]
+
+    if pieces:
+        yield from parse_fasta_records(b"".join(pieces))
+
+
+def parse_fasta_records(data: bytes) -> Generator[Tuple[str, str], None, None]:
+    """
+    Parse one or more complete FASTA records in `data`. The data must start with a header line.
+
+    :param data: FASTA records
+    :return: tuples containing the header and sequence
+
+    """
+    text = data.decode()
+
+    if "\r" in text:
+        text = text.replace("\r", "")
+
+    for record in text.split("\n>"):
+        header, _, sequence = record.partition("\n")
+        yield header.rstrip().replace(">", ""), sequence.replace("\n", "")
+
+
+def read_fasta(path: str) -> List[tuple]:
+    """
+    Parse the FASTA file at `path` and return its content as a `list` of tuples containing the header and sequence.
+
+    :param path: the path to the FASTA file
+    :return: the FASTA content
 
-    return data
+    """
+    return list(read_fasta_records(path))
 
 
 def read_fastq(f) -> Generator[tuple, None, list]:
@@ -194,6 +325,100 @@ def read_fastq(f) -> Generator[tuple, None, list]:
     return list()
 
 
+def read_fastq_lines(path: str, threads: int = 1, text: bool = False) -> Generator[list, None, None]:
+    """
+    Read the FASTQ file at `path` in chunks and yield lists of its lines without line endings. Each list contains only
+    complete four-line records. Accepts both uncompressed and GZIP-compressed files.
+
+    Lines are :class:`bytes` unless `text` is ``True``. Text mode decodes each chunk once before it is split, which is
+    much faster than decoding each line.
+
+    :param path: the path to the FASTQ file
+    :param threads: the number of threads to allow for decompression
+    :param text: yield lines as strings
+    :return: lists of lines
+
+    """
+    if text:
+        decode = codecs.getincrementaldecoder("utf-8")().decode
+        remainder, newline, carriage_return = "", "\n", "\r"
+    else:
+        decode = None
+        remainder, newline, carriage_return = b"", b"\n", b"\r"
+
+    for chunk in read_chunks(path, threads):
+        data = remainder + (decode(chunk) if decode else chunk)
+
+        if carriage_return in data:
+            data = data.replace(carriage_return + newline, newline)
+
+        lines = data.split(newline)
+
+        end = (len(lines) - 1) // 4 * 4
+
+        remainder = newline.join(lines[end:])
+
+        if end:
+            del lines[end:]
+            yield check_fastq_lines(lines)
+
+    lines = remainder.split(newline)
+
+    while lines and not lines[-1]:
+        lines.pop()
+
+    if len(lines) % 4:
+        raise ValueError("FASTQ file ends with an incomplete record")
+
+    if lines:
+        yield check_fastq_lines(lines)
+
+
+def check_fastq_lines(lines: list) -> list:
+    """
+    Check that every four-line record in `lines` starts with a header and has a separator as its third line.
+
+    :param lines: the lines to check as :class:`bytes` or :class:`str`
+    :return: the checked lines
+
+    """
+    if isinstance(lines[0], str):
+        startswith, header, separator = str.startswith, "@", "+"
+    else:
+        startswith, header, separator = bytes.startswith, b"@", b"+"
+
+    if not all(map(startswith, lines[::4], itertools.repeat(header))):
+        raise ValueError("FASTQ record does not start with a header")
+
+    if not all(map(startswith, lines[2::4], itertools.repeat(separator))):
+        raise ValueError("FASTQ record has no separator line")
+
+    return lines
+
+
+def read_fastq_batches(path: str, threads: int = 1, as_arrays: bool = False) -> Generator[FASTQBatch, None, None]:
+    """
+    Read the FASTQ file at `path` and yield its records in batches. Each batch contains the records parsed from one
+    chunk of the file.
+
+    The fields of each batch are lists of :class:`bytes` by default. They are NumPy arrays of fixed-width byte strings
+    if `as_arrays` is ``True``.
+
+    :param path: the path to the FASTQ file
+    :param threads: the number of threads to allow for decompression
+    :param as_arrays: yield the fields of each batch as NumPy arrays
+    :return: batches of records
+
+    """
+    for lines in read_fastq_lines(path, threads):
+        batch = FASTQBatch(lines[::4], lines[1::4], lines[3::4])
+
+        if as_arrays:
+            batch = FASTQBatch(*[numpy.array(field) for field in batch])
+
+        yield batch
+
+
 def read_fastq_from_path(path: str) -> Generator[tuple, None, None]:
     """
     Read the FASTQ file at `path` and yields its content as tuples. Accepts both uncompressed and GZIP-compressed FASTQ
@@ -203,42 +428,126 @@ def read_fastq_from_path(path: str) -> Generator[tuple, None, None]:
     :return: tuples containing the header, sequence, and quality
 
     """
-    try:
-        with open(path, "r") as f:
-            for record in read_fastq(f):
-                yield record
-    except UnicodeDecodeError:
-        with gzip.open(path, "rt") as f:
-            for record in read_fastq(f):
-                yield record
+    for lines in read_fastq_lines(path, text=True):
+        yield from zip(lines[::4], lines[1::4], lines[3::4])
 
 
-def read_fastq_headers(path: str) -> list:
+def read_fastq_headers(path: str) -> List[str]:
     """
-    Return a list of FASTQ headers for the FASTQ file located at `path`. Only accepts uncompressed FASTQ files.
+    Return a list of FASTQ headers for the FASTQ file located at `path`. Accepts both uncompressed and GZIP-compressed
+    FASTQ files with four-line records.
+
+    Only every fourth line is taken from the file, which is faster than parsing every record.
 
     :param path: the path to the FASTQ file
     :return: a list of FASTQ headers
 
     """
-    headers = list()
+    with open_sequence_file(path) as f, io.TextIOWrapper(f) as text:
+        return [line.rstrip() for line in itertools.islice(text, 0, None, 4)]
 
-    had_plus = False
 
-    with open(path, "r") as f:
-        for line in f:
-            if line == "+\n":
-                had_plus = True
-                continue
+def hash_read_root(header: bytes) -> int:
+    """
+    Return a 64-bit hash of the root of a FASTQ header. The root is the header up to the first whitespace and is shared
+    by both reads in a pair.
 
-            if not had_plus and line[0] == "@":
-                headers.append(line.rstrip())
-                continue
+    The builtin :func:`hash` is used because it is much faster than :mod:`hashlib`. It is salted per process, so hashes
+    must not be stored or compared between processes.
+
+    :param header: a FASTQ header line
+    :return: the hash as a signed integer
+
+    """
+    return hash(header.split(None, 1)[0])
+
+
+def read_fastq_root_hashes(path: str) -> numpy.ndarray:
+    """
+    Return the sorted, unique hashes of the read roots in the FASTQ file at `path`.
+
+    A hash takes eight bytes regardless of the length of the header, so the roots of tens of millions of reads can be
+    held in memory at once.
+
+    :param path: the path to the FASTQ file
+    :return: a sorted array of hashes
+
+    """
+    with open_sequence_file(path) as f:
+        hashes = numpy.fromiter(map(hash_read_root, itertools.islice(f, 0, None, 4)), dtype=numpy.int64)
+
+    return numpy.unique(hashes)
+
+
+def write_paired_reads(
+        read_paths: Iterable[str],
+        output_paths: Iterable[str],
+        root_hashes: numpy.ndarray,
+        threads: int = 1
+) -> int:
+    """
+    Write the read pairs whose roots are in `root_hashes` from the two FASTQ files in `read_paths` to the two files in
+    `output_paths`.
+
+    Both files are read in a single pass and must have their mates in the same order. Pairs are matched on the root of
+    the left read and are checked against the sorted `root_hashes` a chunk at a time.
+
+    :param read_paths: the paths to the left and right FASTQ files
+    :param output_paths: the paths to write the left and right matching reads to
+    :param root_hashes: a sorted array of hashes from :func:`.read_fastq_root_hashes`
+    :param threads: the number of threads to allow for decompression of each file
+    :return: the number of pairs written
+
+    """
+    left_chunks, right_chunks = [read_fastq_lines(path, threads) for path in read_paths]
+    left_output_path, right_output_path = output_paths
+
+    left_lines = list()
+    right_lines = list()
+
+    count = 0
+
+    with open(left_output_path, "wb", buffering=BUFFER_SIZE) as left_output, \
+            open(right_output_path, "wb", buffering=BUFFER_SIZE) as right_output:
+        while True:
+            if not left_lines:
+                left_lines = next(left_chunks, [])
+
+            if not right_lines:
+                right_lines = next(right_chunks, [])
 
-            if had_plus:
-                had_plus = False
+            if not left_lines and not right_lines:
+                break
 
-    return headers
+            if not left_lines or not right_lines:
+                raise ValueError("Paired FASTQ files contain different numbers of reads")
+
+            # The chunks from each file can contain different numbers of records. Only the records available from both
+            # files are matched and the rest are carried over.
+            size = min(len(left_lines), len(right_lines))
+
+            hashes = numpy.fromiter(map(hash_read_root, left_lines[:size:4]), dtype=numpy.int64)
+
+            if len(root_hashes):
+                indexes = numpy.searchsorted(root_hashes, hashes)
+                indexes[indexes == len(root_hashes)] = 0
+                found = numpy.flatnonzero(root_hashes[indexes] == hashes) * 4
+            else:
+                found = numpy.zeros(0, dtype=numpy.int64)
+
+            for lines, output in [(left_lines, left_output), (right_lines, right_output)]:
+                selected = [line for i in found.tolist() for line in lines[i:i + 4]]
+
+                if selected:
+                    selected.append(b"")
+                    output.write(b"\n".join(selected))
+
+            count += len(found)
+
+            del left_lines[:size]
+            del right_lines[:size]
+
+    return count
 
 
 def reverse_complement(sequence: str) -> str:
@@ -248,10 +557,7 @@ def reverse_complement(sequence: str) -> str:
     :param sequence: the sequence to transform
     :return: the reverse complement
     """
-    complement = [COMPLEMENT_TABLE[s] for s in sequence.upper()]
-    complement.reverse()
-
-    return "".join(complement)
+    return sequence.translate(COMPLEMENT_TABLE)[::-1]
 
 
 def translate(sequence: str) -> str:
@@ -262,17 +568,34 @@ def translate(sequence: str) -> str:
     :return: a translated protein sequence
 
     """
-    sequence = sequence.upper()
+    return translate_frames(sequence, 1)[0]
+
+
+def translate_frames(sequence: str, frame_count: int = 3) -> List[str]:
+    """
+    Translate the passed nucleotide sequence to protein in the first `frame_count` reading frames. Substitutes _X_ for
+    invalid codons.
+
+    Bases are converted to indexes once and each codon is translated by looking up its combined index in
+    :data:`CODON_AMINO_ACIDS`, so the whole sequence is translated with a few array operations per frame.
+
+    :param sequence: the nucleotide sequence
+    :param frame_count: the number of frames to translate
+    :return: a translated protein sequence for each frame
+
+    """
+    indexes = BASE_INDEXES[numpy.frombuffer(sequence.encode(), dtype=numpy.uint8)]
+
+    translations = list()
 
-    protein = list()
+    for frame in range(frame_count):
+        codon_count = max(0, (len(indexes) - frame) // 3)
 
-    for i in range(0, len(sequence) // 3):
-        codon = sequence[i * 3:(i + 1) * 3]
+        codons = indexes[frame:frame + codon_count * 3].reshape(codon_count, 3)
 
-        # Translate to X if the codon matches no amino acid (taking into account ambiguous codons where possible)
-        protein.append(TRANSLATION_TABLE.get(codon, "X"))
+        translations.append(CODON_AMINO_ACIDS[numpy.ravel_multi_index(codons.T, CODON_SHAPE)].tobytes().decode())
 
-    return "".join(protein)
+    return translations
 
 
 def find_orfs(sequence: str) -> List[dict]:
@@ -292,8 +615,7 @@ def find_orfs(sequence: str) -> List[dict]:
         # Looks at both forward (+) and reverse (-) strands.
         for strand, nuc in [(+1, sequence), (-1, reverse_complement(sequence))]:
             # Look in all three translation frames.
-            for frame in range(3):
-                translation = translate(nuc[frame:])
+            for frame, translation in enumerate(translate_frames(nuc)):
                 translation_length = len(translation)
 
                 aa_start = 0
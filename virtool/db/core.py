@@ -50,10 +50,12 @@ class Collection:
         # No dispatches are necessary for these collection methods and they can be directly referenced instead of
         # wrapped.
         self.aggregate = self._collection.aggregate
+        self.bulk_write = self._collection.bulk_write
         self.count_documents = self._collection.count_documents
         self.create_index = self._collection.create_index
         self.create_indexes = self._collection.create_indexes
         self.distinct = self._collection.distinct
+        self.estimated_document_count = self._collection.estimated_document_count
         self.drop_index = self._collection.drop_index
         self.drop_indexes = self._collection.drop_indexes
         self.find_one = self._collection.find_one
@@ -338,6 +340,11 @@ class DB:
             silent=True
         )
 
+        self.snapshots = self.bind_collection(
+            "snapshots",
+            silent=True
+        )
+
         self.status = self.bind_collection("status")
 
         self.subtraction = self.bind_collection(
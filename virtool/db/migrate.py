@@ -5,6 +5,7 @@ import pymongo.errors
 import virtool.analyses.migrate
 import virtool.caches.migrate
 import virtool.db.utils
+import virtool.history.migrate
 import virtool.jobs.db
 import virtool.otus.utils
 import virtool.references.migrate
@@ -29,6 +30,7 @@ async def migrate(app):
     await virtool.caches.migrate.migrate_caches(app)
     await migrate_files(db)
     await migrate_groups(db)
+    await virtool.history.migrate.migrate_history(app)
     await migrate_jobs(db)
     await migrate_sessions(db)
     await migrate_status(db, app["version"])
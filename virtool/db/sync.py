@@ -4,15 +4,19 @@ not used.
 
 """
 import json
+import math
+import multiprocessing
 from copy import deepcopy
-from typing import Union
+from typing import Dict, List, Union
 
 import dictdiffer
 import pymongo
+import pymongo.errors
 
 import virtool.history.utils
 import virtool.otus.utils
 import virtool.samples.utils
+import virtool.utils
 
 
 def get_active_index_ids(db, ref_id):
@@ -123,6 +127,9 @@ def patch_otu_to_version(db, settings: dict, otu_id: str, version: Union[str, in
     Take a joined otu back in time to the passed ``version``. Uses the diffs in the change documents associated with
     the otu.
 
+    Reverting starts from the nearest checkpoint at or after ``version`` if one exists. Changes after the checkpoint are
+    only recorded as reverted.
+
     :param db: the application database object
     :param settings: the application settings
     :param otu_id: the id of the otu to patch
@@ -140,8 +147,44 @@ def patch_otu_to_version(db, settings: dict, otu_id: str, version: Union[str, in
 
     patched = deepcopy(current)
 
+    checkpoint = get_nearest_checkpoint(db, otu_id, version)
+
+    query = {"otu.id": otu_id}
+    limit = 0
+
+    if checkpoint:
+        checkpoint_version = checkpoint["otu"]["version"]
+
+        # Changes after the checkpoint are only recorded as reverted, so their diffs are not fetched.
+        newer = db.history.find({
+            "otu.id": otu_id,
+            "$or": [
+                {"otu.version": {"$gt": checkpoint_version}},
+                {"otu.version": "removed"}
+            ]
+        }, ["otu.version"], sort=[("otu.version", -1)])
+
+        for change in newer:
+            reverted_history_ids.append(change["_id"])
+
+        patched = deepcopy(checkpoint["checkpoint"])
+
+        if checkpoint_version == version:
+            return current or None, patched, reverted_history_ids
+
+        # Only the changes from the checkpoint back to ``version`` are replayed.
+        query["otu.version"] = {"$lte": checkpoint_version}
+        limit = checkpoint_version - version
+
     # Sort the changes by descending timestamp.
-    for change in db.history.find({"otu.id": otu_id}, sort=[("otu.version", -1)]):
+    changes = db.history.find(
+        query,
+        virtool.history.utils.NO_CHECKPOINT_PROJECTION,
+        sort=[("otu.version", -1)],
+        limit=limit
+    )
+
+    for change in changes:
         if change["otu"]["version"] == "removed" or change["otu"]["version"] > version:
             reverted_history_ids.append(change["_id"])
 
@@ -170,6 +213,272 @@ def patch_otu_to_version(db, settings: dict, otu_id: str, version: Union[str, in
     return current, patched, reverted_history_ids
 
 
+def get_nearest_checkpoint(db, otu_id: str, version: Union[str, int]) -> Union[dict, None]:
+    """
+    Get the change with the earliest checkpoint at or after `version` for the otu identified by `otu_id`.
+
+    :param db: the application database object
+    :param otu_id: the id of the otu
+    :param version: the otu version being patched to
+    :return: the change with the nearest checkpoint or `None` if there isn't one
+
+    """
+    if not isinstance(version, int):
+        return None
+
+    return db.history.find_one({
+        "otu.id": otu_id,
+        "otu.version": {"$gte": version},
+        "checkpoint": {"$exists": True}
+    }, ["otu", "checkpoint"], sort=[("otu.version", 1)])
+
+
+def get_checkpoints(db, manifest: Dict[str, int]) -> Dict[str, dict]:
+    """
+    Get the nearest checkpoint at or after the manifest version of each otu in `manifest`. Otus without such a
+    checkpoint are not included in the result.
+
+    :param db: the application database object
+    :param manifest: a manifest of otu ids and versions
+    :return: the checkpointed otus keyed by otu id
+
+    """
+    checkpoint_changes = db.history.find({
+        "otu.id": {"$in": list(manifest)},
+        "checkpoint": {"$exists": True}
+    }, ["otu"])
+
+    nearest = virtool.history.utils.find_nearest_checkpoints(manifest, checkpoint_changes)
+
+    if not nearest:
+        return dict()
+
+    change_ids = [f"{otu_id}.{version}" for otu_id, version in nearest.items()]
+
+    checkpoints = db.history.find({"_id": {"$in": change_ids}}, ["otu", "checkpoint"])
+
+    return {c["otu"]["id"]: c["checkpoint"] for c in checkpoints}
+
+
+def add_checkpoints(db, otus: List[dict]):
+    """
+    Store each of the joined `otus` as a checkpoint on the change that produced it if its version is a checkpoint
+    version and the change doesn't have a checkpoint yet.
+
+    This is called during index builds so that checkpoints are filled in for changes that were made before checkpoints
+    were introduced or that were too large to store one.
+
+    :param db: the application database object
+    :param otus: joined otus patched to any version
+
+    """
+    otus = {
+        f"{otu['_id']}.{otu['version']}": otu for otu in otus
+        if virtool.history.utils.is_checkpoint_version(otu["version"])
+    }
+
+    if not otus:
+        return
+
+    change_ids = [c["_id"] for c in db.history.find({
+        "_id": {"$in": list(otus)},
+        "checkpoint": {"$exists": False},
+        "diff": {"$ne": "file"}
+    }, ["_id"])]
+
+    if not change_ids:
+        return
+
+    try:
+        db.history.bulk_write([
+            pymongo.UpdateOne({"_id": change_id}, {"$set": {"checkpoint": otus[change_id]}}) for change_id in change_ids
+        ], ordered=False)
+    except pymongo.errors.BulkWriteError:
+        # Some checkpoints are too large to store. Patching will fall back to the next checkpoint or current otu.
+        pass
+
+
+def get_patched_otu(db, settings: dict, otu_id: str, version: Union[str, int]) -> Union[dict, None]:
+    """
+    Get the joined OTU identified by `otu_id` as it was at `version`.
+
+    The patched OTU is read from the `snapshots` collection if possible. Otherwise, it is patched using
+    :func:`.patch_otu_to_version` and stored as a snapshot for later calls. Returns `None` if the OTU did not exist at
+    `version`.
+
+    :param db: the application database object
+    :param settings: the application settings
+    :param otu_id: the id of the otu
+    :param version: the otu version
+    :return: the patched otu
+
+    """
+    snapshot = db.snapshots.find_one_and_update(
+        {"_id": virtool.history.utils.compose_snapshot_id(otu_id, version)},
+        {"$set": {"accessed_at": virtool.utils.timestamp()}},
+        projection=["patched"]
+    )
+
+    if snapshot:
+        return snapshot["patched"]
+
+    _, patched, _ = patch_otu_to_version(db, settings, otu_id, version)
+
+    if patched is not None:
+        add_snapshot(db, otu_id, version, patched)
+
+    return patched
+
+
+def patch_manifest(db, settings: dict, manifest: Dict[str, int], processes: int = 1) -> Dict[str, Union[dict, None]]:
+    """
+    Get the joined otus in `manifest` patched to their manifest versions.
+
+    Stored snapshots are used where possible. The remaining otus are patched from their nearest checkpoints or their
+    current versions. Starting documents and the changes that must be reverted are fetched in a few bulk queries instead
+    of several queries per otu. Large manifests are patched in parallel using
+    up to `processes` worker processes. The newly patched otus are stored as snapshots.
+
+    :param db: the application database object
+    :param settings: the application settings
+    :param manifest: a manifest of otu ids and versions
+    :param processes: the maximum number of worker processes to patch with
+    :return: the patched otus keyed by otu id in manifest order
+
+    """
+    patched = get_snapshots(db, manifest)
+
+    missing = {otu_id: version for otu_id, version in manifest.items() if otu_id not in patched}
+
+    if missing:
+        otu_ids = list(missing)
+
+        checkpoints = get_checkpoints(db, missing)
+
+        checkpoint_versions = {otu_id: checkpoint["version"] for otu_id, checkpoint in checkpoints.items()}
+
+        uncheckpointed = [otu_id for otu_id in otu_ids if otu_id not in checkpoints]
+
+        changes = list(db.history.find(
+            virtool.history.utils.compose_manifest_history_query(missing, checkpoint_versions),
+            virtool.history.utils.NO_CHECKPOINT_PROJECTION
+        ))
+
+        for change in changes:
+            if change["diff"] == "file":
+                change["diff"] = read_diff_file(settings["data_path"], change["otu"]["id"], change["otu"]["version"])
+
+        inputs = virtool.history.utils.compose_patch_inputs(
+            missing,
+            db.otus.find({"_id": {"$in": uncheckpointed}}),
+            db.sequences.find({"otu_id": {"$in": uncheckpointed}}),
+            changes,
+            checkpoints
+        )
+
+        if processes > 1 and len(inputs) >= virtool.history.utils.PARALLEL_PATCH_THRESHOLD:
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.starmap(
+                    virtool.history.utils.patch_otu,
+                    inputs,
+                    chunksize=math.ceil(len(inputs) / processes)
+                )
+        else:
+            results = virtool.history.utils.patch_otus(inputs)
+
+        timestamp = virtool.utils.timestamp()
+
+        add_snapshots(db, [
+            virtool.history.utils.compose_snapshot(otu_id, missing[otu_id], otu, timestamp)
+            for otu_id, otu in zip(otu_ids, results) if otu is not None
+        ])
+
+        patched.update(zip(otu_ids, results))
+
+    return {otu_id: patched[otu_id] for otu_id in manifest}
+
+
+def get_snapshots(db, manifest: Dict[str, int]) -> Dict[str, dict]:
+    """
+    Get the stored snapshots for the otu versions in `manifest` and mark them as accessed.
+
+    :param db: the application database object
+    :param manifest: a manifest of otu ids and versions
+    :return: the snapshotted otus keyed by otu id
+
+    """
+    snapshot_ids = [virtool.history.utils.compose_snapshot_id(*item) for item in manifest.items()]
+
+    snapshots = list(db.snapshots.find({"_id": {"$in": snapshot_ids}}, ["otu", "patched"]))
+
+    if snapshots:
+        db.snapshots.update_many({"_id": {"$in": [s["_id"] for s in snapshots]}}, {
+            "$set": {
+                "accessed_at": virtool.utils.timestamp()
+            }
+        })
+
+    return {s["otu"]["id"]: s["patched"] for s in snapshots}
+
+
+def add_snapshot(db, otu_id: str, version: int, patched: dict):
+    """
+    Store a snapshot of an otu patched to `version`. If there are more than
+    :data:`virtool.history.utils.SNAPSHOT_LIMIT` snapshots, the least recently used snapshots are removed.
+
+    :param db: the application database object
+    :param otu_id: the id of the otu
+    :param version: the version the otu was patched to
+    :param patched: the patched otu
+
+    """
+    document = virtool.history.utils.compose_snapshot(otu_id, version, patched, virtool.utils.timestamp())
+
+    db.snapshots.replace_one({"_id": document["_id"]}, document, upsert=True)
+
+    evict_snapshots(db)
+
+
+def add_snapshots(db, documents: List[dict]):
+    """
+    Store multiple snapshot documents at once. Snapshots that have already been stored by a concurrent caller are
+    ignored.
+
+    :param db: the application database object
+    :param documents: the snapshot documents
+
+    """
+    if not documents:
+        return
+
+    try:
+        db.snapshots.insert_many(documents, ordered=False)
+    except pymongo.errors.BulkWriteError:
+        pass
+
+    evict_snapshots(db)
+
+
+def evict_snapshots(db):
+    """
+    Remove the least recently used snapshots if there are more than :data:`virtool.history.utils.SNAPSHOT_LIMIT`.
+
+    :param db: the application database object
+
+    """
+    excess = db.snapshots.estimated_document_count() - virtool.history.utils.SNAPSHOT_LIMIT
+
+    if excess > 0:
+        cursor = db.snapshots.find(
+            {},
+            ["_id"],
+            sort=[("accessed_at", 1)],
+            limit=excess + virtool.history.utils.SNAPSHOT_EVICTION_BATCH
+        )
+
+        db.snapshots.delete_many({"_id": {"$in": [d["_id"] for d in cursor]}})
+
+
 def read_diff_file(data_path: str, otu_id: str, otu_version: Union[int, str]) -> dict:
     """
     Read a history diff file from disk.
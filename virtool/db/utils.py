@@ -1,4 +1,5 @@
 import virtool.utils
+import pymongo.errors
 import semver
 import sys
 
@@ -40,6 +41,42 @@ def apply_projection(document, projection):
     return {key: document[key] for key in document if projection.get(key, False)}
 
 
+async def insert_many_with_new_ids(collection, documents: list):
+    """
+    Insert `documents` using an unordered bulk insert. Random ids are assigned to documents without an ``_id`` field
+    like :meth:`virtool.db.core.Collection.insert_one`. Documents whose generated ids collide with existing documents
+    are given new ids and inserted again. No messages are dispatched.
+
+    The documents are modified in place so the final ids are available to the caller.
+
+    :param collection: the collection to insert into
+    :param documents: the documents to insert
+
+    """
+    generated = set()
+
+    for index, document in enumerate(documents):
+        if "_id" not in document:
+            document["_id"] = virtool.utils.random_alphanumeric(8)
+            generated.add(index)
+
+    while documents:
+        try:
+            await collection.insert_many(documents, ordered=False)
+            return
+        except pymongo.errors.BulkWriteError as err:
+            errors = err.details["writeErrors"]
+
+            if any(e["code"] != 11000 or e["index"] not in generated for e in errors):
+                raise
+
+            documents = [documents[e["index"]] for e in errors]
+            generated = set(range(len(documents)))
+
+            for document in documents:
+                document["_id"] = virtool.utils.random_alphanumeric(8)
+
+
 async def check_mongo_version(db, logger):
     """
     Check the MongoDB version. Log a critical error and exit if it is too old.
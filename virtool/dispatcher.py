@@ -1,3 +1,6 @@
+import asyncio
+import collections
+import itertools
 import logging
 from copy import deepcopy
 from typing import Union
@@ -49,6 +52,14 @@ OPERATIONS = (
     "delete"
 )
 
+#: The time in seconds dispatched messages are held before being sent. Repeated updates to the same document within
+#: this window are coalesced into a single message.
+DISPATCH_WINDOW = 0.05
+
+#: The maximum number of messages that can be waiting to be sent to a single connection. Connections that fall further
+#: behind than this are closed so they don't hold up the dispatcher or consume unbounded memory.
+CONNECTION_BUFFER_LIMIT = 5000
+
 
 class Connection:
 
@@ -62,6 +73,15 @@ class Connection:
     async def send(self, message):
         await self._ws.send_json(message, dumps=virtool.api.json.dumps)
 
+    async def send_frame(self, frame: str):
+        """
+        Send a frame containing one or more messages that have already been serialized to JSON.
+
+        :param frame: the JSON frame
+
+        """
+        await self._ws.send_str(frame)
+
     async def close(self):
         await self._ws.close()
 
@@ -80,10 +100,35 @@ async def default_writer(connection: Connection, message: dict):
 
 
 class Dispatcher:
+    """
+    Sends messages to websocket connections to keep clients in sync with the database.
+
+    Messages sent with the default writer are serialized once and placed in a bounded buffer for each receiving
+    connection. Buffers are flushed after :data:`DISPATCH_WINDOW` seconds. Each flush sends all of a connection's
+    waiting messages in one frame, as a JSON array if there is more than one. Connections are flushed concurrently.
+
+    While waiting in a buffer, an ``insert`` or ``update`` message replaces any earlier message with the same interface,
+    operation, and document id. A ``delete`` message removes any waiting ``insert`` or ``update`` messages for the
+    deleted ids.
+
+    """
 
     def __init__(self):
         #: A dict of all active connections.
         self.connections = list()
+
+        #: Serialized messages waiting to be sent to each connection. Keyed by connection.
+        self._buffers = dict()
+
+        #: Connections that are currently being sent a frame.
+        self._sending = set()
+
+        #: The task that will flush the buffers at the end of the current dispatch window.
+        self._flush_task = None
+
+        #: Used to generate unique buffer keys for messages that should not be coalesced.
+        self._counter = itertools.count()
+
         logging.debug("Initialized dispatcher")
 
     def add_connection(self, connection: Connection):
@@ -118,6 +163,8 @@ class Dispatcher:
         :param connection: the connection to remove
 
         """
+        self._buffers.pop(connection, None)
+
         try:
             self.connections.remove(connection)
             logging.debug(f'Removed connection from dispatcher: {connection.user_id}')
@@ -191,23 +238,105 @@ class Dispatcher:
         if writer and not callable(writer):
             raise TypeError("writer must be callable")
 
-        connections_to_remove = list()
+        if writer is default_writer:
+            self._enqueue(connections, message)
+        else:
+            # Custom writers can modify the message for each connection, so messages can't be shared or buffered.
+            await asyncio.gather(*[self._write(writer, connection, deepcopy(message)) for connection in connections])
+
+        logging.debug(f"Dispatched {interface}.{operation}")
+
+    def _enqueue(self, connections: list, message: dict):
+        """
+        Serialize the ``message`` and add it to the buffers for ``connections``. Schedule a flush if one is not already
+        scheduled.
+
+        :param connections: the connections to send the message to
+        :param message: the message to send
+
+        """
+        interface = message["interface"]
+        operation = message["operation"]
+        data = message["data"]
+
+        serialized = virtool.api.json.dumps(message)
+
+        if operation != "delete" and isinstance(data, dict) and "id" in data:
+            key = (interface, operation, data["id"])
+        else:
+            key = next(self._counter)
 
         for connection in connections:
-            try:
-                await writer(connection, deepcopy(message))
-            except RuntimeError as err:
-                if "RuntimeError: unable to perform operation on <TCPTransport" in str(err):
-                    connections_to_remove.append(connection)
+            buffer = self._buffers.get(connection)
 
-        for connection in connections_to_remove:
-            self.remove_connection(connection)
+            if buffer is None:
+                buffer = self._buffers[connection] = collections.OrderedDict()
 
-        logging.debug(f"Dispatched {interface}.{operation}")
+            if operation == "delete" and isinstance(data, list):
+                for document_id in data:
+                    buffer.pop((interface, "insert", document_id), None)
+                    buffer.pop((interface, "update", document_id), None)
+
+            buffer[key] = serialized
+
+            if len(buffer) > CONNECTION_BUFFER_LIMIT:
+                logging.warning(f"Closing slow connection: {connection.user_id}")
+                self.remove_connection(connection)
+                asyncio.ensure_future(connection.close())
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_after(DISPATCH_WINDOW))
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """
+        Send all waiting messages. Connections are sent to concurrently.
+
+        Connections that are still being sent a previous frame are skipped. Their waiting messages are sent as soon as
+        the previous frame has been sent.
+
+        """
+        await asyncio.gather(*[self._send_buffered(c) for c in list(self._buffers) if c not in self._sending])
+
+    async def _send_buffered(self, connection: Connection):
+        self._sending.add(connection)
+
+        try:
+            while self._buffers.get(connection):
+                messages = list(self._buffers.pop(connection).values())
+
+                if len(messages) == 1:
+                    frame = messages[0]
+                else:
+                    frame = "[" + ",".join(messages) + "]"
+
+                try:
+                    await connection.send_frame(frame)
+                except (ConnectionResetError, RuntimeError):
+                    self.remove_connection(connection)
+        finally:
+            self._sending.discard(connection)
+
+    async def _write(self, writer, connection: Connection, message: dict):
+        try:
+            await writer(connection, message)
+        except RuntimeError as err:
+            if "RuntimeError: unable to perform operation on <TCPTransport" in str(err):
+                self.remove_connection(connection)
 
     async def close(self):
         logging.debug("Closing dispatcher")
 
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        await self.flush()
+
         for connection in self.connections:
             await connection.close()
 
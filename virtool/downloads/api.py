@@ -3,7 +3,6 @@ Provides request handlers for file downloads.
 
 """
 import os
-import gzip
 import json
 
 from aiohttp import web
@@ -15,6 +14,7 @@ import virtool.bio
 import virtool.analyses.db
 import virtool.db.utils
 import virtool.downloads.db
+import virtool.downloads.utils
 import virtool.history.db
 import virtool.otus.db
 import virtool.references.db
@@ -151,6 +151,9 @@ async def download_reference(req):
     Export all otus and sequences for a given reference as a gzipped JSON string. Made available as a downloadable file
     named ``reference.json.gz``.
 
+    The JSON is compressed and streamed to the client as otus are patched. Exports of built otus are cached with the
+    latest index.
+
     """
     db = req.app["db"]
 
@@ -166,34 +169,57 @@ async def download_reference(req):
     if scope not in ["built", "remote", "unbuilt", "unverified"]:
         scope = "built"
 
-    otu_list = await virtool.references.db.export(
-        req.app,
-        ref_id,
-        scope
-    )
-
-    data = {
-        "otus": otu_list,
+    metadata = {
         "data_type": document["data_type"],
         "organism": document["organism"]
     }
 
     try:
-        data["targets"] = document["targets"]
+        metadata["targets"] = document["targets"]
     except KeyError:
         pass
 
-    # Convert the list of OTUs to a JSON-formatted string.
-    json_string = json.dumps(data, cls=virtool.api.json.CustomEncoder)
+    headers = {
+        "Content-Disposition": f"attachment; filename=reference.{scope}.json.gz",
+        "Content-Type": "application/gzip"
+    }
+
+    manifest = None
+    cache_path = None
+
+    # Built exports are cached with the index they were built from and served from disk while the data is unchanged.
+    if scope == "built" or scope == "remote":
+        manifest = await virtool.references.db.get_export_manifest(db, ref_id)
+
+        cache_path = await virtool.references.db.get_export_cache_path(req.app, ref_id, scope, metadata, manifest)
+
+        if cache_path and os.path.isfile(cache_path):
+            return web.FileResponse(cache_path, headers=headers)
 
-    # Compress the JSON string with gzip.
-    body = await req.app["run_in_process"](gzip.compress, bytes(json_string, "utf-8"))
+    response = web.StreamResponse(headers=headers)
+
+    await response.prepare(req)
+
+    writer = virtool.downloads.utils.GzipStreamWriter(response, req.app["run_in_thread"], cache_path)
+
+    try:
+        # Write the metadata and open the OTU list. The OTUs are written as they are patched.
+        await writer.write(json.dumps(metadata, cls=virtool.api.json.CustomEncoder)[:-1] + ', "otus": [')
+
+        separator = ""
+
+        async for otu in virtool.references.db.iter_export(req.app, ref_id, scope, manifest):
+            await writer.write(separator + json.dumps(otu, cls=virtool.api.json.CustomEncoder))
+            separator = ", "
+
+        await writer.write("]}")
+
+        await writer.close()
+    except BaseException:
+        writer.abort()
+        raise
 
-    return web.Response(
-        headers={"Content-Disposition": f"attachment; filename=reference.{scope}.json.gz"},
-        content_type="application/gzip",
-        body=body
-    )
+    return response
 
 
 @routes.get("/download/sequences/{sequence_id}")
@@ -1,3 +1,98 @@
+import os
+import zlib
+from typing import Callable, Union
+
+#: The number of characters of uncompressed text buffered by :class:`.GzipStreamWriter` before they are compressed.
+STREAM_BUFFER_SIZE = 256 * 1024
+
+
+class GzipStreamWriter:
+    """
+    Gzip-compresses text and writes it to a prepared :class:`aiohttp.web.StreamResponse` as it is produced.
+
+    Text is buffered and compressed in a thread in blocks of :data:`.STREAM_BUFFER_SIZE` characters. If `cache_path` is
+    given, the compressed data is also written to a temporary file that is moved to `cache_path` when :meth:`.close` is
+    called. Call :meth:`.abort` instead if the download does not finish.
+
+    :param response: the prepared stream response to write to
+    :param run_in_thread: the application ``run_in_thread`` function
+    :param cache_path: a path to cache the compressed data at
+
+    """
+
+    def __init__(self, response, run_in_thread: Callable, cache_path: Union[str, None] = None):
+        self._response = response
+        self._run_in_thread = run_in_thread
+        self._cache_path = cache_path
+        self._compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+        self._buffer = list()
+        self._buffered = 0
+        self._handle = None
+
+        if cache_path:
+            self._temp_path = f"{cache_path}.{os.getpid()}.{id(self)}.tmp"
+            self._handle = open(self._temp_path, "wb")
+
+    async def write(self, text: str):
+        """
+        Buffer `text` and compress and send the buffer if it is full.
+
+        :param text: the text to write
+
+        """
+        self._buffer.append(text)
+        self._buffered += len(text)
+
+        if self._buffered >= STREAM_BUFFER_SIZE:
+            await self._flush(False)
+
+    async def close(self):
+        """
+        Compress and send any buffered text and the end of the gzip stream, then move the cache file into place.
+
+        """
+        await self._flush(True)
+
+        if self._handle:
+            self._handle.close()
+            os.replace(self._temp_path, self._cache_path)
+            self._handle = None
+
+        await self._response.write_eof()
+
+    def abort(self):
+        """
+        Remove the incomplete cache file.
+
+        """
+        if self._handle:
+            self._handle.close()
+            os.remove(self._temp_path)
+            self._handle = None
+
+    async def _flush(self, finish: bool):
+        data = "".join(self._buffer).encode()
+
+        self._buffer = list()
+        self._buffered = 0
+
+        compressed = await self._run_in_thread(self._compress, data, finish)
+
+        if compressed:
+            await self._response.write(compressed)
+
+    def _compress(self, data: bytes, finish: bool) -> bytes:
+        compressed = self._compressor.compress(data)
+
+        if finish:
+            compressed += self._compressor.flush()
+
+        if self._handle and compressed:
+            self._handle.write(compressed)
+
+        return compressed
+
+
 def format_fasta_entry(otu_name, isolate_name, sequence_id, sequence):
     """
     Create a FASTA header for a sequence in a otu DNA FASTA file downloadable from Virtool.
@@ -1,9 +1,13 @@
+import asyncio
+import math
+import os
 from copy import deepcopy
-from typing import Union, List
+from typing import Dict, List, Tuple, Union
 
 import dictdiffer
 import pymongo.errors
 
+import virtool.analyses.utils
 import virtool.otus.db
 import virtool.errors
 import virtool.history.utils
@@ -35,6 +39,9 @@ PROJECTION = LIST_PROJECTION + [
     "diff"
 ]
 
+#: The maximum number of change documents inserted by each bulk insert in :func:`.add_many`.
+BULK_INSERT_SIZE = 500
+
 
 async def add(
         app,
@@ -60,54 +67,65 @@ async def add(
     """
     db = app["db"]
 
-    otu_id, otu_name, otu_version, ref_id = virtool.history.utils.derive_otu_information(old, new)
-
-    document = {
-        "_id": ".".join([str(otu_id), str(otu_version)]),
-        "method_name": method_name,
-        "description": description,
-        "created_at": virtool.utils.timestamp(),
-        "otu": {
-            "id": otu_id,
-            "name": otu_name,
-            "version": otu_version
-        },
-        "reference": {
-            "id": ref_id
-        },
-        "index": {
-            "id": "unbuilt",
-            "version": "unbuilt"
-        },
-        "user": {
-            "id": user_id
-        }
-    }
-
-    if method_name == "create":
-        document["diff"] = new
+    document = virtool.history.utils.compose_change(method_name, old, new, description, user_id)
 
-    elif method_name == "remove":
-        document["diff"] = old
-
-    else:
-        document["diff"] = virtool.history.utils.calculate_diff(old, new)
+    checkpoint = virtool.history.utils.compose_checkpoint(method_name, new)
 
     try:
-        await db.history.insert_one(document, silent=silent)
+        await db.history.insert_one(dict(document, **checkpoint), silent=silent)
     except pymongo.errors.DocumentTooLarge:
         await virtool.history.utils.write_diff_file(
             app["settings"]["data_path"],
-            otu_id,
-            otu_version,
+            document["otu"]["id"],
+            document["otu"]["version"],
             document["diff"]
         )
 
+        # The checkpoint is dropped. Patching will revert the change from the next checkpoint or current OTU instead.
         await db.history.insert_one(dict(document, diff="file"), silent=silent)
 
     return document
 
 
+async def add_many(
+        app,
+        changes: List[Tuple[str, Union[None, dict], Union[None, dict], str]],
+        user_id: str
+) -> List[dict]:
+    """
+    Add many change documents to the history collection using unordered bulk inserts. No messages are dispatched.
+
+    Changes that can't be inserted in bulk because they are too large are added one at a time using :func:`.add`.
+
+    :param app: the application object
+    :param changes: method name, old otu, new otu, and description tuples for each change
+    :param user_id: the id of the requesting user
+    :return: the change documents
+
+    """
+    db = app["db"]
+
+    documents = [virtool.history.utils.compose_change(*change, user_id) for change in changes]
+
+    for offset in range(0, len(documents), BULK_INSERT_SIZE):
+        batch = documents[offset:offset + BULK_INSERT_SIZE]
+        batch_changes = changes[offset:offset + BULK_INSERT_SIZE]
+
+        try:
+            await db.history.insert_many([
+                dict(document, **virtool.history.utils.compose_checkpoint(method_name, new))
+                for document, (method_name, _, new, _) in zip(batch, batch_changes)
+            ], ordered=False)
+        except (pymongo.errors.BulkWriteError, pymongo.errors.DocumentTooLarge):
+            inserted = set(await db.history.distinct("_id", {"_id": {"$in": [d["_id"] for d in batch]}}))
+
+            for document, change in zip(batch, batch_changes):
+                if document["_id"] not in inserted:
+                    await add(app, *change, user_id, silent=True)
+
+    return documents
+
+
 async def find(db, req_query, base_query=None):
     data = await paginate(
         db.history,
@@ -200,7 +218,13 @@ async def patch_to_verified(app, otu_id: str) -> Union[dict, None]:
 
     patched = deepcopy(current)
 
-    async for change in db.history.find({"otu.id": otu_id}, sort=[("otu.version", -1)]):
+    changes = db.history.find(
+        {"otu.id": otu_id},
+        virtool.history.utils.NO_CHECKPOINT_PROJECTION,
+        sort=[("otu.version", -1)]
+    )
+
+    async for change in changes:
         if change["diff"] == "file":
             change["diff"] = await virtool.history.utils.read_diff_file(
                 app["settings"]["data_path"],
@@ -227,6 +251,9 @@ async def patch_to_version(app, otu_id: str, version: Union[str, int]) -> tuple:
     Take a joined otu back in time to the passed ``version``. Uses the diffs in the change documents associated with
     the otu.
 
+    Reverting starts from the nearest checkpoint at or after ``version`` if one exists. Changes after the checkpoint are
+    only recorded as reverted.
+
     :param app: the application object
     :param otu_id: the id of the otu to patch
     :param version: the version to patch to
@@ -245,8 +272,44 @@ async def patch_to_version(app, otu_id: str, version: Union[str, int]) -> tuple:
 
     patched = deepcopy(current)
 
+    checkpoint = await get_nearest_checkpoint(db, otu_id, version)
+
+    query = {"otu.id": otu_id}
+    limit = 0
+
+    if checkpoint:
+        checkpoint_version = checkpoint["otu"]["version"]
+
+        # Changes after the checkpoint are only recorded as reverted, so their diffs are not fetched.
+        newer = db.history.find({
+            "otu.id": otu_id,
+            "$or": [
+                {"otu.version": {"$gt": checkpoint_version}},
+                {"otu.version": "removed"}
+            ]
+        }, ["otu.version"], sort=[("otu.version", -1)])
+
+        async for change in newer:
+            reverted_history_ids.append(change["_id"])
+
+        patched = deepcopy(checkpoint["checkpoint"])
+
+        if checkpoint_version == version:
+            return current or None, patched, reverted_history_ids
+
+        # Only the changes from the checkpoint back to ``version`` are replayed.
+        query["otu.version"] = {"$lte": checkpoint_version}
+        limit = checkpoint_version - version
+
     # Sort the changes by descending timestamp.
-    async for change in db.history.find({"otu.id": otu_id}, sort=[("otu.version", -1)]):
+    changes = db.history.find(
+        query,
+        virtool.history.utils.NO_CHECKPOINT_PROJECTION,
+        sort=[("otu.version", -1)],
+        limit=limit
+    )
+
+    async for change in changes:
         if change["otu"]["version"] == "removed" or change["otu"]["version"] > version:
             reverted_history_ids.append(change["_id"])
 
@@ -275,6 +338,256 @@ async def patch_to_version(app, otu_id: str, version: Union[str, int]) -> tuple:
     return current, patched, reverted_history_ids
 
 
+async def get_nearest_checkpoint(db, otu_id: str, version: Union[str, int]) -> Union[dict, None]:
+    """
+    Get the change with the earliest checkpoint at or after `version` for the OTU identified by `otu_id`.
+
+    :param db: the application database client
+    :param otu_id: the ID of the OTU
+    :param version: the OTU version being patched to
+    :return: the change with the nearest checkpoint or `None` if there isn't one
+
+    """
+    if not isinstance(version, int):
+        return None
+
+    return await db.history.find_one({
+        "otu.id": otu_id,
+        "otu.version": {"$gte": version},
+        "checkpoint": {"$exists": True}
+    }, ["otu", "checkpoint"], sort=[("otu.version", 1)])
+
+
+async def get_checkpoints(db, manifest: Dict[str, int]) -> Dict[str, dict]:
+    """
+    Get the nearest checkpoint at or after the manifest version of each OTU in `manifest`. OTUs without such a
+    checkpoint are not included in the result.
+
+    :param db: the application database client
+    :param manifest: a manifest of OTU IDs and versions
+    :return: the checkpointed OTUs keyed by OTU ID
+
+    """
+    checkpoint_changes = await db.history.find({
+        "otu.id": {"$in": list(manifest)},
+        "checkpoint": {"$exists": True}
+    }, ["otu"]).to_list(None)
+
+    nearest = virtool.history.utils.find_nearest_checkpoints(manifest, checkpoint_changes)
+
+    if not nearest:
+        return dict()
+
+    change_ids = [f"{otu_id}.{version}" for otu_id, version in nearest.items()]
+
+    checkpoints = await db.history.find({"_id": {"$in": change_ids}}, ["otu", "checkpoint"]).to_list(None)
+
+    return {c["otu"]["id"]: c["checkpoint"] for c in checkpoints}
+
+
+async def get_patched_otu(app, otu_id: str, version: Union[str, int]) -> Union[dict, None]:
+    """
+    Get the joined OTU identified by `otu_id` as it was at `version`.
+
+    The patched OTU is read from the `snapshots` collection if possible. Otherwise, it is patched using
+    :func:`.patch_to_version` and stored as a snapshot for later calls. Returns `None` if the OTU did not exist at
+    `version`.
+
+    :param app: the application object
+    :param otu_id: the ID of the OTU
+    :param version: the OTU version
+    :return: the patched OTU
+
+    """
+    db = app["db"]
+
+    snapshot = await db.snapshots.find_one_and_update(
+        {"_id": virtool.history.utils.compose_snapshot_id(otu_id, version)},
+        {"$set": {"accessed_at": virtool.utils.timestamp()}},
+        projection=["patched"]
+    )
+
+    if snapshot:
+        return snapshot["patched"]
+
+    _, patched, _ = await patch_to_version(app, otu_id, version)
+
+    if patched is not None:
+        await add_snapshot(db, otu_id, version, patched)
+
+    return patched
+
+
+async def patch_manifest(app, manifest: Dict[str, int]) -> Dict[str, Union[dict, None]]:
+    """
+    Get the joined OTUs in `manifest` patched to their manifest versions.
+
+    Stored snapshots are used where possible. The remaining OTUs are patched from their nearest checkpoints or their
+    current versions. Starting documents and the changes that must be reverted are fetched in a few bulk queries instead
+    of several queries per OTU. Large manifests are patched in parallel using the application process executor. The
+    newly patched OTUs are stored as snapshots.
+
+    :param app: the application object
+    :param manifest: a manifest of OTU IDs and versions
+    :return: the patched OTUs keyed by OTU ID in manifest order
+
+    """
+    db = app["db"]
+
+    patched = await get_snapshots(db, manifest)
+
+    missing = {otu_id: version for otu_id, version in manifest.items() if otu_id not in patched}
+
+    if missing:
+        otu_ids = list(missing)
+
+        checkpoints = await get_checkpoints(db, missing)
+
+        checkpoint_versions = {otu_id: checkpoint["version"] for otu_id, checkpoint in checkpoints.items()}
+
+        uncheckpointed = [otu_id for otu_id in otu_ids if otu_id not in checkpoints]
+
+        history_query = virtool.history.utils.compose_manifest_history_query(missing, checkpoint_versions)
+
+        otus, sequences, changes = await asyncio.gather(
+            db.otus.find({"_id": {"$in": uncheckpointed}}).to_list(None),
+            db.sequences.find({"otu_id": {"$in": uncheckpointed}}).to_list(None),
+            db.history.find(history_query, virtool.history.utils.NO_CHECKPOINT_PROJECTION).to_list(None)
+        )
+
+        for change in changes:
+            if change["diff"] == "file":
+                change["diff"] = await virtool.history.utils.read_diff_file(
+                    app["settings"]["data_path"],
+                    change["otu"]["id"],
+                    change["otu"]["version"]
+                )
+
+        inputs = virtool.history.utils.compose_patch_inputs(missing, otus, sequences, changes, checkpoints)
+
+        if len(inputs) < virtool.history.utils.PARALLEL_PATCH_THRESHOLD:
+            results = virtool.history.utils.patch_otus(inputs)
+        else:
+            chunk_size = math.ceil(len(inputs) / (os.cpu_count() or 1))
+
+            chunks = await asyncio.gather(*[
+                app["run_in_process"](virtool.history.utils.patch_otus, inputs[i:i + chunk_size])
+                for i in range(0, len(inputs), chunk_size)
+            ])
+
+            results = [otu for chunk in chunks for otu in chunk]
+
+        timestamp = virtool.utils.timestamp()
+
+        await add_snapshots(db, [
+            virtool.history.utils.compose_snapshot(otu_id, missing[otu_id], otu, timestamp)
+            for otu_id, otu in zip(otu_ids, results) if otu is not None
+        ])
+
+        patched.update(zip(otu_ids, results))
+
+    return {otu_id: patched[otu_id] for otu_id in manifest}
+
+
+async def get_snapshots(db, manifest: Dict[str, int]) -> Dict[str, dict]:
+    """
+    Get the stored snapshots for the OTU versions in `manifest` and mark them as accessed.
+
+    :param db: the application database client
+    :param manifest: a manifest of OTU IDs and versions
+    :return: the snapshotted OTUs keyed by OTU ID
+
+    """
+    snapshot_ids = [virtool.history.utils.compose_snapshot_id(*item) for item in manifest.items()]
+
+    snapshots = await db.snapshots.find({"_id": {"$in": snapshot_ids}}, ["otu", "patched"]).to_list(None)
+
+    if snapshots:
+        await db.snapshots.update_many({"_id": {"$in": [s["_id"] for s in snapshots]}}, {
+            "$set": {
+                "accessed_at": virtool.utils.timestamp()
+            }
+        })
+
+    return {s["otu"]["id"]: s["patched"] for s in snapshots}
+
+
+async def add_snapshot(db, otu_id: str, version: int, patched: dict):
+    """
+    Store a snapshot of an OTU patched to `version`. If there are more than
+    :data:`virtool.history.utils.SNAPSHOT_LIMIT` snapshots, the least recently used snapshots are removed.
+
+    :param db: the application database client
+    :param otu_id: the ID of the OTU
+    :param version: the version the OTU was patched to
+    :param patched: the patched OTU
+
+    """
+    document = virtool.history.utils.compose_snapshot(otu_id, version, patched, virtool.utils.timestamp())
+
+    await db.snapshots.replace_one({"_id": document["_id"]}, document, upsert=True)
+
+    await evict_snapshots(db)
+
+
+async def add_snapshots(db, documents: List[dict]):
+    """
+    Store multiple snapshot documents at once. Snapshots that have already been stored by a concurrent caller are
+    ignored.
+
+    :param db: the application database client
+    :param documents: the snapshot documents
+
+    """
+    if not documents:
+        return
+
+    try:
+        await db.snapshots.insert_many(documents, ordered=False)
+    except pymongo.errors.BulkWriteError:
+        pass
+
+    await evict_snapshots(db)
+
+
+async def evict_snapshots(db):
+    """
+    Remove the least recently used snapshots if there are more than :data:`virtool.history.utils.SNAPSHOT_LIMIT`.
+
+    :param db: the application database client
+
+    """
+    excess = await db.snapshots.estimated_document_count() - virtool.history.utils.SNAPSHOT_LIMIT
+
+    if excess > 0:
+        cursor = db.snapshots.find(
+            {},
+            ["_id"],
+            sort=[("accessed_at", 1)],
+            limit=excess + virtool.history.utils.SNAPSHOT_EVICTION_BATCH
+        )
+
+        await db.snapshots.delete_many({"_id": {"$in": [d["_id"] async for d in cursor]}})
+
+
+async def remove_snapshots(db, otu_id: str, version: int):
+    """
+    Remove snapshots of the OTU identified by `otu_id` at `version` and later. Called when changes are reverted and the
+    snapshots no longer reflect the OTU's history.
+
+    :param db: the application database client
+    :param otu_id: the ID of the OTU
+    :param version: the first version to remove snapshots for
+
+    """
+    await db.snapshots.delete_many({
+        "otu.id": otu_id,
+        "otu.version": {
+            "$gte": version
+        }
+    })
+
+
 async def revert(app, change_id: str) -> dict:
     """
     Revert a history change given by the passed ``change_id``.
@@ -320,4 +633,11 @@ async def revert(app, change_id: str) -> dict:
 
     await db.history.delete_many({"_id": {"$in": history_to_delete}})
 
+    await remove_snapshots(db, otu_id, otu_version)
+
+    cache = virtool.analyses.utils.get_formatted_cache(app)
+
+    if cache is not None:
+        cache.remove_otu(otu_id, otu_version)
+
     return patched
@@ -0,0 +1,83 @@
+import logging
+
+import dictdiffer
+import pymongo.errors
+
+import virtool.history.utils
+import virtool.otus.db
+
+logger = logging.getLogger("migrate")
+
+
+async def migrate_history(app):
+    logger.info(" • history")
+
+    await add_checkpoints(app)
+
+
+async def add_checkpoints(app):
+    """
+    Store checkpoints on changes that produced checkpoint versions before checkpoints were introduced.
+
+    OTUs that already have a checkpoint for every checkpoint version are skipped. The rest are walked back from their
+    current versions and the missing checkpoints are filled in.
+
+    :param app: the application object
+
+    """
+    db = app["db"]
+
+    interval = virtool.history.utils.CHECKPOINT_INTERVAL
+
+    async for otu in db.otus.find({"version": {"$gte": interval}}, ["version"]):
+        otu_id = otu["_id"]
+
+        checkpoint_count = await db.history.count_documents({
+            "otu.id": otu_id,
+            "checkpoint": {"$exists": True}
+        })
+
+        if checkpoint_count < otu["version"] // interval:
+            await add_otu_checkpoints(app, otu_id)
+
+
+async def add_otu_checkpoints(app, otu_id: str):
+    """
+    Walk the OTU identified by `otu_id` back from its current version and store a checkpoint on each change that
+    produced a checkpoint version and doesn't have one yet.
+
+    :param app: the application object
+    :param otu_id: the ID of the OTU
+
+    """
+    db = app["db"]
+
+    patched = await virtool.otus.db.join(db, otu_id)
+
+    changes = db.history.find(
+        {"otu.id": otu_id, "otu.version": {"$gt": 0}},
+        virtool.history.utils.NO_CHECKPOINT_PROJECTION,
+        sort=[("otu.version", -1)]
+    )
+
+    async for change in changes:
+        version = change["otu"]["version"]
+
+        if virtool.history.utils.is_checkpoint_version(version):
+            try:
+                await db.history.update_one({"_id": change["_id"], "checkpoint": {"$exists": False}}, {
+                    "$set": {
+                        "checkpoint": patched
+                    }
+                }, silent=True)
+            except (pymongo.errors.DocumentTooLarge, pymongo.errors.WriteError):
+                pass
+
+        if change["diff"] == "file":
+            change["diff"] = await virtool.history.utils.read_diff_file(
+                app["settings"]["data_path"],
+                otu_id,
+                version
+            )
+
+        patched = dictdiffer.patch(dictdiffer.swap(change["diff"]), patched)
@@ -1,11 +1,35 @@
 import arrow
-from typing import Tuple, Union, List
+import collections
+from copy import deepcopy
+from typing import Dict, Iterable, Tuple, Union, List
 import datetime
 import os
 import json
 import dictdiffer
 import aiofiles
 
+import virtool.otus.utils
+import virtool.utils
+
+#: The maximum number of OTU snapshots kept in the `snapshots` collection. The least recently used snapshots are removed
+#: when the limit is exceeded.
+SNAPSHOT_LIMIT = 20000
+
+#: The number of least recently used snapshots removed at once when :data:`SNAPSHOT_LIMIT` is exceeded.
+SNAPSHOT_EVICTION_BATCH = 500
+
+#: A full copy of the OTU is stored in the `checkpoint` field of every change that produces a version divisible by this
+#: number. Patching starts from the nearest checkpoint, so no more than this many changes are ever reverted.
+CHECKPOINT_INTERVAL = 25
+
+#: A projection that excludes checkpoints. Used when reading changes only to revert their diffs.
+NO_CHECKPOINT_PROJECTION = {
+    "checkpoint": False
+}
+
+#: The minimum number of OTUs that must need patching before a manifest is patched using multiple worker processes.
+PARALLEL_PATCH_THRESHOLD = 200
+
 
 def calculate_diff(old: dict, new: dict) -> list:
     """
@@ -19,6 +43,222 @@ def calculate_diff(old: dict, new: dict) -> list:
     return list(dictdiffer.diff(old, new))
 
 
+def is_checkpoint_version(version: Union[int, str]) -> bool:
+    """
+    Check if the change producing OTU `version` should store a checkpoint.
+
+    :param version: the OTU version
+    :return: whether a checkpoint should be stored
+
+    """
+    return isinstance(version, int) and version > 0 and version % CHECKPOINT_INTERVAL == 0
+
+
+def find_nearest_checkpoints(manifest: Dict[str, int], checkpoint_changes: Iterable[dict]) -> Dict[str, int]:
+    """
+    Find the version of the earliest checkpoint at or after the manifest version of each OTU in `manifest`. OTUs without
+    such a checkpoint are not included in the result.
+
+    :param manifest: a manifest of OTU IDs and versions
+    :param checkpoint_changes: changes with checkpoints for the OTUs in the manifest
+    :return: the nearest checkpoint versions keyed by OTU ID
+
+    """
+    nearest = dict()
+
+    for change in checkpoint_changes:
+        otu_id = change["otu"]["id"]
+        version = change["otu"]["version"]
+
+        if version >= manifest[otu_id] and version < nearest.get(otu_id, version + 1):
+            nearest[otu_id] = version
+
+    return nearest
+
+
+def compose_manifest_history_query(manifest: Dict[str, int], checkpoint_versions: Dict[str, int] = None) -> dict:
+    """
+    Compose a query that matches every change that must be reverted to patch the OTUs in `manifest` to their
+    manifest versions.
+
+    For OTUs in `checkpoint_versions`, only the changes between the manifest version and the checkpoint are matched.
+    One clause is used for each distinct pair of versions, so the query stays small for large manifests.
+
+    :param manifest: a manifest of OTU IDs and versions
+    :param checkpoint_versions: the versions of checkpoints patching will start from keyed by OTU ID
+    :return: a MongoDB query for the history collection
+
+    """
+    checkpoint_versions = checkpoint_versions or dict()
+
+    otu_ids_by_versions = collections.defaultdict(list)
+
+    for otu_id, version in manifest.items():
+        otu_ids_by_versions[(version, checkpoint_versions.get(otu_id))].append(otu_id)
+
+    clauses = list()
+
+    uncheckpointed = [otu_id for otu_id in manifest if otu_id not in checkpoint_versions]
+
+    if uncheckpointed:
+        clauses.append({"otu.id": {"$in": uncheckpointed}, "otu.version": "removed"})
+
+    for (version, checkpoint_version), otu_ids in otu_ids_by_versions.items():
+        if checkpoint_version is None:
+            clauses.append({"otu.id": {"$in": otu_ids}, "otu.version": {"$gt": version}})
+
+        elif checkpoint_version > version:
+            clauses.append({"otu.id": {"$in": otu_ids}, "otu.version": {"$gt": version, "$lte": checkpoint_version}})
+
+    # Match nothing if every OTU is already at a checkpoint.
+    return {"$or": clauses} if clauses else {"_id": {"$in": []}}
+
+
+def compose_patch_inputs(
+        manifest: Dict[str, int],
+        otus: Iterable[dict],
+        sequences: Iterable[dict],
+        changes: Iterable[dict],
+        checkpoints: Dict[str, dict] = None
+) -> List[Tuple[dict, List[dict], int]]:
+    """
+    Group the documents fetched for a manifest into the arguments needed to call :func:`.patch_otu` for each OTU.
+
+    Patching starts from the checkpoint for OTUs in `checkpoints` and from the current joined OTU for the rest.
+
+    :param manifest: a manifest of OTU IDs and versions
+    :param otus: the current OTU documents in the manifest
+    :param sequences: the sequence documents belonging to `otus`
+    :param changes: the changes matched by :func:`.compose_manifest_history_query` for the manifest
+    :param checkpoints: the OTU checkpoints to start patching from keyed by OTU ID
+    :return: a list of starting OTU, changes to revert, and version tuples in manifest order
+
+    """
+    checkpoints = checkpoints or dict()
+
+    otus = {otu["_id"]: otu for otu in otus}
+
+    sequences_by_otu = collections.defaultdict(list)
+
+    for sequence in sequences:
+        sequences_by_otu[sequence["otu_id"]].append(sequence)
+
+    changes_by_otu = collections.defaultdict(list)
+
+    for change in changes:
+        changes_by_otu[change["otu"]["id"]].append(change)
+
+    inputs = list()
+
+    for otu_id, version in manifest.items():
+        otu = otus.get(otu_id)
+
+        if otu_id in checkpoints:
+            current = checkpoints[otu_id]
+        else:
+            current = virtool.otus.utils.merge_otu(otu, sequences_by_otu[otu_id]) if otu else dict()
+
+        otu_changes = sorted(changes_by_otu[otu_id], key=sort_changes_descending)
+
+        inputs.append((current, otu_changes, version))
+
+    return inputs
+
+
+def sort_changes_descending(change: dict) -> Tuple[bool, int]:
+    """
+    A sort key that orders changes for the same OTU by descending version, with the `removed` change first.
+
+    :param change: a change document
+    :return: the sort key
+
+    """
+    version = change["otu"]["version"]
+
+    if version == "removed":
+        return False, 0
+
+    return True, -version
+
+
+def patch_otu(current: dict, changes: List[dict], version: Union[str, int]) -> Union[dict, None]:
+    """
+    Take a joined OTU back in time to `version` by reverting `changes`.
+
+    The changes must be sorted by descending version and have their diffs loaded. This is the same patching done by
+    :func:`virtool.history.db.patch_to_version`.
+
+    :param current: the current joined OTU or an empty `dict` if the OTU no longer exists
+    :param changes: the changes for the OTU sorted by descending version
+    :param version: the version to patch to
+    :return: the patched OTU or `None` if it did not exist at `version`
+
+    """
+    if "version" in current and current["version"] == version:
+        return deepcopy(current)
+
+    patched = deepcopy(current)
+
+    for change in changes:
+        if change["otu"]["version"] != "removed" and change["otu"]["version"] <= version:
+            break
+
+        if change["method_name"] == "remove":
+            patched = change["diff"]
+
+        elif change["method_name"] == "create":
+            patched = None
+
+        else:
+            diff = dictdiffer.swap(change["diff"])
+            patched = dictdiffer.patch(diff, patched)
+
+    return patched
+
+
+def patch_otus(inputs: List[Tuple[dict, List[dict], int]]) -> List[Union[dict, None]]:
+    """
+    Call :func:`.patch_otu` for each item in `inputs`. Used to patch chunks of a manifest in worker processes.
+
+    :param inputs: tuples of arguments for :func:`.patch_otu`
+    :return: the patched OTUs
+
+    """
+    return [patch_otu(*args) for args in inputs]
+
+
+def compose_snapshot(otu_id: str, version: int, patched: dict, timestamp: datetime.datetime) -> dict:
+    """
+    Compose a snapshot document for storing the joined OTU identified by `otu_id` as it was at `version`.
+
+    Snapshots are addressed by the same id as the change that produced the OTU version. A snapshot is never updated
+    because the history leading up to a version does not change unless the version is reverted.
+
+    :param otu_id: the OTU ID
+    :param version: the OTU version
+    :param patched: the joined OTU patched to `version`
+    :param timestamp: the time the snapshot was created
+    :return: the snapshot document
+
+    """
+    return {
+        "_id": compose_snapshot_id(otu_id, version),
+        "otu": {
+            "id": otu_id,
+            "version": version
+        },
+        "reference": {
+            "id": patched["reference"]["id"]
+        },
+        "accessed_at": timestamp,
+        "patched": patched
+    }
+
+
+def compose_snapshot_id(otu_id: str, version: int) -> str:
+    return f"{otu_id}.{version}"
+
+
 def compose_create_description(document: dict) -> str:
     """
     Compose a change description for the creation of a new OTU given its document.
@@ -107,6 +347,78 @@ def compose_remove_description(document: dict) -> str:
     return description
 
 
+def compose_change(
+        method_name: str,
+        old: Union[None, dict],
+        new: Union[None, dict],
+        description: str,
+        user_id: str
+) -> dict:
+    """
+    Compose a change document for the history collection. The change is not assigned to an index.
+
+    :param method_name: the name of the handler method that executed the change
+    :param old: the otu document prior to the change
+    :param new: the otu document after the change
+    :param description: a human readable description of the change
+    :param user_id: the id of the requesting user
+    :return: the change document
+
+    """
+    otu_id, otu_name, otu_version, ref_id = derive_otu_information(old, new)
+
+    document = {
+        "_id": ".".join([str(otu_id), str(otu_version)]),
+        "method_name": method_name,
+        "description": description,
+        "created_at": virtool.utils.timestamp(),
+        "otu": {
+            "id": otu_id,
+            "name": otu_name,
+            "version": otu_version
+        },
+        "reference": {
+            "id": ref_id
+        },
+        "index": {
+            "id": "unbuilt",
+            "version": "unbuilt"
+        },
+        "user": {
+            "id": user_id
+        }
+    }
+
+    if method_name == "create":
+        document["diff"] = new
+
+    elif method_name == "remove":
+        document["diff"] = old
+
+    else:
+        document["diff"] = calculate_diff(old, new)
+
+    return document
+
+
+def compose_checkpoint(method_name: str, new: Union[None, dict]) -> dict:
+    """
+    Compose the fields that store a checkpoint on a change document. Returns an empty `dict` if the change should not
+    store a checkpoint.
+
+    :param method_name: the name of the handler method that executed the change
+    :param new: the otu document after the change
+    :return: the checkpoint fields to add to the change document
+
+    """
+    if method_name in ("create", "remove") or not new or not is_checkpoint_version(new.get("version")):
+        return dict()
+
+    return {
+        "checkpoint": new
+    }
+
+
 def derive_otu_information(old: Union[dict, None], new: Union[dict, None]) -> Tuple[str, str, Union[int, str], str]:
     """
     Derive OTU information for a new change document from the old and new joined OTU documents.
@@ -222,6 +222,7 @@ async def install(app, process_id, release, user_id):
         - downloads the official profiles.hmm.gz file
         - decompresses the vthmm.tar.gz file
         - moves the file to the correct data path
+        - presses a shared copy of the profiles for NuVs jobs
         - downloads the official annotations.json.gz file
         - imports the annotations into the database
 
@@ -230,7 +231,8 @@ async def install(app, process_id, release, user_id):
         1. download
         3. decompress
         4. install_profiles
-        5. import_annotations
+        5. press_profiles
+        6. import_annotations
 
     :param app: the app object
     :type app: :class:`aiohttp.web.Application`
@@ -304,6 +306,19 @@ async def install(app, process_id, release, user_id):
 
         await app["run_in_thread"](shutil.move, os.path.join(decompressed_path, "profiles.hmm"), install_path)
 
+        await virtool.processes.db.update(
+            db,
+            process_id,
+            progress=0.7,
+            step="press_profiles"
+        )
+
+        try:
+            await press_profiles(app, install_path)
+        except virtool.errors.SubprocessError as err:
+            # NuVs jobs press their own copy of the profiles when no pressed profile set is available.
+            logger.warning(str(err))
+
         await virtool.processes.db.update(
             db,
             process_id,
@@ -353,6 +368,89 @@ async def install(app, process_id, release, user_id):
         logger.debug("Finished HMM install process")
 
 
+async def press_profiles(app, profiles_path: str) -> str:
+    """
+    Build a pressed copy of the HMM profiles at `profiles_path` for NuVs jobs to use and make it the current profile
+    set. Profile sets are versioned by the hash of the profiles file, so pressing is skipped if the same profiles have
+    already been pressed.
+
+    Profiles are copied and pressed in a staging directory and moved into place once ``hmmpress`` has finished. Older
+    profile sets are removed once no running jobs hold references to them.
+
+    :param app: the application object
+    :param profiles_path: the path to the ``profiles.hmm`` file to press
+    :return: the version of the pressed profile set
+
+    """
+    data_path = app["settings"]["data_path"]
+
+    version = await app["run_in_thread"](virtool.hmm.utils.hash_profiles, profiles_path)
+
+    version_path = os.path.join(virtool.hmm.utils.join_pressed_path(data_path), version)
+
+    if not os.path.isdir(version_path):
+        staging_path = version_path + virtool.hmm.utils.STAGING_SUFFIX
+
+        # Remove any staging directory left behind by an interrupted build.
+        await app["run_in_thread"](shutil.rmtree, staging_path, True)
+        await app["run_in_thread"](os.makedirs, staging_path)
+
+        staged_profiles_path = os.path.join(staging_path, "profiles.hmm")
+
+        await app["run_in_thread"](shutil.copyfile, profiles_path, staged_profiles_path)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "hmmpress",
+                staged_profiles_path,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            await app["run_in_thread"](shutil.rmtree, staging_path, True)
+            raise virtool.errors.SubprocessError("Could not press HMM profiles: hmmpress not found")
+
+        _, stderr = await process.communicate()
+
+        if process.returncode != 0:
+            await app["run_in_thread"](shutil.rmtree, staging_path, True)
+            raise virtool.errors.SubprocessError(f"Could not press HMM profiles: {stderr.decode().strip()}")
+
+        await app["run_in_thread"](os.rename, staging_path, version_path)
+
+    await app["run_in_thread"](virtool.hmm.utils.swap_pressed_profiles, data_path, version)
+
+    logger.debug(f"Pressed HMM profiles {version}")
+
+    return version
+
+
+async def press_installed_profiles(app):
+    """
+    Press the installed HMM profiles if there is no current pressed profile set. This is the case for profiles that
+    were installed before pressed profile sets were introduced.
+
+    Failures are logged and NuVs jobs fall back to pressing their own copy of the profiles.
+
+    :param app: the application object
+
+    """
+    data_path = app["settings"]["data_path"]
+
+    profiles_path = os.path.join(data_path, "hmm", "profiles.hmm")
+
+    if not os.path.isfile(profiles_path):
+        return
+
+    if virtool.hmm.utils.get_current_version(virtool.hmm.utils.join_pressed_path(data_path)) is not None:
+        return
+
+    try:
+        await press_profiles(app, profiles_path)
+    except virtool.errors.SubprocessError as err:
+        logger.warning(str(err))
+
+
 async def purge(db, settings: dict):
     """
     Delete HMMs that are not used in analyses. Set `hidden` flag on used HMM documents.
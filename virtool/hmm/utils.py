@@ -1,6 +1,22 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+from typing import Union
+
 import semver
 import virtool.github
 
+#: The name of the symbolic link that points at the pressed profile set new NuVs jobs should use.
+CURRENT_LINK_NAME = "current"
+
+#: The name of the file that is locked while pressed profile sets are acquired, released, swapped, or removed.
+LOCK_FILENAME = ".lock"
+
+#: The suffix of directories that pressed profile sets are built in before being moved into place.
+STAGING_SUFFIX = ".tmp"
+
 
 def format_hmm_release(updated, release, installed):
     # The release dict will only be replaced if there is a 200 response from GitHub. A 304 indicates the release
@@ -18,3 +34,208 @@ def format_hmm_release(updated, release, installed):
     )
 
     return formatted
+
+
+def acquire_pressed_profiles(data_path: str, owner: str) -> Union[str, None]:
+    """
+    Take a reference to the current pressed profile set for `owner` (eg. a job ID). The profile set will not be removed
+    until the reference is released with :func:`release_pressed_profiles` or the calling process exits.
+
+    Returns `None` if no pressed profile set has been built.
+
+    :param data_path: the application data path
+    :param owner: a unique name for the holder of the reference
+    :return: the path to the pressed ``profiles.hmm`` file
+
+    """
+    pressed_path = join_pressed_path(data_path)
+
+    with lock_pressed_profiles(pressed_path):
+        version = get_current_version(pressed_path)
+
+        if version is None:
+            return None
+
+        refs_path = os.path.join(pressed_path, version, "refs")
+
+        os.makedirs(refs_path, exist_ok=True)
+
+        with open(os.path.join(refs_path, owner), "w") as f:
+            f.write(str(os.getpid()))
+
+    return os.path.join(pressed_path, version, "profiles.hmm")
+
+
+def get_current_version(pressed_path: str) -> Union[str, None]:
+    """
+    Get the version of the pressed profile set that new references are taken to. Returns `None` if there is no current
+    profile set.
+
+    :param pressed_path: the path to the pressed profiles directory
+    :return: the current version
+
+    """
+    try:
+        return os.readlink(os.path.join(pressed_path, CURRENT_LINK_NAME))
+    except FileNotFoundError:
+        return None
+
+
+def hash_profiles(path: str) -> str:
+    """
+    Calculate a version string for the ``profiles.hmm`` file at `path` from a hash of its contents.
+
+    :param path: the path to the profiles file
+    :return: the version string
+
+    """
+    sha256 = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+
+    return sha256.hexdigest()[:16]
+
+
+def is_process_alive(pid: int) -> bool:
+    """
+    Check if the process identified by `pid` is running.
+
+    :param pid: the process ID
+    :return: whether the process is running
+
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def join_pressed_path(data_path: str) -> str:
+    """
+    Get the path to the directory that versioned, pressed HMM profile sets are stored in.
+
+    :param data_path: the application data path
+    :return: the pressed profiles path
+
+    """
+    return os.path.join(data_path, "hmm", "pressed")
+
+
+@contextlib.contextmanager
+def lock_pressed_profiles(pressed_path: str):
+    """
+    A context manager that holds an exclusive lock on the pressed profiles directory. The lock is shared between the
+    server and job processes.
+
+    The lock is not reentrant. Functions called while the lock is held must not try to take it again.
+
+    :param pressed_path: the path to the pressed profiles directory
+
+    """
+    os.makedirs(pressed_path, exist_ok=True)
+
+    with open(os.path.join(pressed_path, LOCK_FILENAME), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def release_pressed_profiles(data_path: str, owner: str, profiles_path: str):
+    """
+    Release a reference taken with :func:`acquire_pressed_profiles`. The profile set is removed if it is no longer
+    current and has no other references.
+
+    :param data_path: the application data path
+    :param owner: the name the reference was taken with
+    :param profiles_path: the path returned by :func:`acquire_pressed_profiles`
+
+    """
+    pressed_path = join_pressed_path(data_path)
+
+    with lock_pressed_profiles(pressed_path):
+        try:
+            os.remove(os.path.join(os.path.dirname(profiles_path), "refs", owner))
+        except FileNotFoundError:
+            pass
+
+        remove_unused_pressed_profiles(pressed_path)
+
+
+def remove_unused_pressed_profiles(pressed_path: str):
+    """
+    Remove pressed profile sets that are not current and have no references. References held by processes that are no
+    longer running are discarded first.
+
+    Must be called while holding :func:`lock_pressed_profiles`.
+
+    :param pressed_path: the path to the pressed profiles directory
+
+    """
+    current = get_current_version(pressed_path)
+
+    for name in os.listdir(pressed_path):
+        if name in (current, CURRENT_LINK_NAME, LOCK_FILENAME) or name.endswith(STAGING_SUFFIX):
+            continue
+
+        refs_path = os.path.join(pressed_path, name, "refs")
+
+        referenced = False
+
+        if os.path.isdir(refs_path):
+            for owner in os.listdir(refs_path):
+                ref_path = os.path.join(refs_path, owner)
+
+                with open(ref_path, "r") as f:
+                    pid = f.read()
+
+                if pid.isdigit() and is_process_alive(int(pid)):
+                    referenced = True
+                else:
+                    os.remove(ref_path)
+
+        if not referenced:
+            shutil.rmtree(os.path.join(pressed_path, name))
+
+
+def swap_pressed_profiles(data_path: str, version: Union[str, None]):
+    """
+    Atomically make the pressed profile set identified by `version` current. New references will be taken to that
+    profile set. Profile sets that are no longer used are removed.
+
+    Passing `None` as the `version` removes the current profile set.
+
+    :param data_path: the application data path
+    :param version: the version to make current
+
+    """
+    pressed_path = join_pressed_path(data_path)
+
+    link_path = os.path.join(pressed_path, CURRENT_LINK_NAME)
+
+    with lock_pressed_profiles(pressed_path):
+        if version is None:
+            try:
+                os.remove(link_path)
+            except FileNotFoundError:
+                pass
+        else:
+            temp_link_path = link_path + STAGING_SUFFIX
+
+            try:
+                os.remove(temp_link_path)
+            except FileNotFoundError:
+                pass
+
+            os.symlink(version, temp_link_path)
+            os.replace(temp_link_path, link_path)
+
+        remove_unused_pressed_profiles(pressed_path)
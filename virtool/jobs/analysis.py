@@ -308,14 +308,7 @@ class Job(virtool.jobs.job.Job):
 def get_sequence_otu_map(db, settings, manifest):
     sequence_otu_map = dict()
 
-    for otu_id, otu_version in manifest.items():
-        _, patched, _ = virtool.db.sync.patch_otu_to_version(
-            db,
-            settings,
-            otu_id,
-            otu_version
-        )
-
+    for patched in virtool.db.sync.patch_manifest(db, settings, manifest).values():
         for isolate in patched["isolates"]:
             for sequence in isolate["sequences"]:
                 sequence_id = sequence["_id"]
@@ -38,6 +38,18 @@ async def find(req):
     return json_response(data)
 
 
+@routes.get("/api/jobs/metrics")
+async def get_metrics(req):
+    """
+    Get the job manager's current workload and scheduling latency metrics.
+
+    """
+    if "jobs" not in req.app:
+        return not_found("Job manager not running")
+
+    return json_response(req.app["jobs"].get_metrics())
+
+
 @routes.get("/api/jobs/{job_id}")
 async def get(req):
     """
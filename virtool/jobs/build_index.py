@@ -1,6 +1,12 @@
+import glob
+import hashlib
+import json
 import os
+import shutil
 import typing
 
+import pymongo
+
 import virtool.history.db
 import virtool.indexes.db
 import virtool.otus.db
@@ -11,6 +17,9 @@ import virtool.jobs.job
 import virtool.otus.utils
 import virtool.utils
 
+#: The name of the file in each index directory that records where each OTU's sequences are in ``ref.fa``.
+FRAGMENTS_FILENAME = "fragments.json"
+
 
 class Job(virtool.jobs.job.Job):
     """
@@ -65,30 +74,67 @@ class Job(virtool.jobs.job.Job):
         Generates a FASTA file of all sequences in the reference database. The FASTA headers are
         the accession numbers.
 
+        The FASTA fragments of OTUs that are at the same version as in the last ready index are copied from that index's
+        ``ref.fa`` without being patched. If the content hash of the new FASTA file matches the last ready index, its
+        Bowtie2 files are reused and :meth:`.bowtie_build` is skipped.
+
         """
-        patched_otus = get_patched_otus(
+        manifest = self.params["manifest"]
+
+        previous = get_previous_index(self.db, self.params["ref_id"], self.params["index_id"])
+
+        previous_path = None
+        previous_fragments = dict()
+
+        if previous:
+            previous_path = os.path.join(self.params["reference_path"], previous["_id"])
+            previous_fragments = read_fragments(previous_path)
+
+        reused = get_reusable_otu_ids(manifest, previous_fragments)
+
+        patched_otus = list(get_patched_otus(
             self.db,
             self.settings,
-            self.params["manifest"]
-        )
+            {otu_id: version for otu_id, version in manifest.items() if otu_id not in reused},
+            self.proc
+        ))
+
+        virtool.db.sync.add_checkpoints(self.db, patched_otus)
 
         sequence_otu_map = dict()
 
-        sequences = get_sequences_from_patched_otus(
+        fragments, sequence_hash = write_fasta_fragments(
+            self.params["index_path"],
+            manifest,
             patched_otus,
             self.params["data_type"],
-            sequence_otu_map
+            sequence_otu_map,
+            previous_path,
+            previous_fragments
         )
 
-        fasta_path = os.path.join(self.params["index_path"], "ref.fa")
+        with open(os.path.join(self.params["index_path"], FRAGMENTS_FILENAME), "w") as f:
+            json.dump(fragments, f)
 
-        write_sequences_to_file(fasta_path, sequences)
+        reused_index_id = None
+
+        if previous and previous.get("sequence_hash") == sequence_hash:
+            if link_bowtie_files(previous_path, self.params["index_path"]):
+                reused_index_id = previous["_id"]
+
+        self.params["reused_index_id"] = reused_index_id
 
         index_id = self.params["index_id"]
 
         self.db.indexes.update_one({"_id": index_id}, {
             "$set": {
-                "sequence_otu_map": sequence_otu_map
+                "sequence_otu_map": sequence_otu_map,
+                "sequence_hash": sequence_hash,
+                "build": {
+                    "patched_otu_count": len(patched_otus),
+                    "reused_otu_count": len(reused),
+                    "reused_index_id": reused_index_id
+                }
             }
         })
 
@@ -99,7 +145,12 @@ class Job(virtool.jobs.job.Job):
         Run a standard bowtie-build process using the previously generated FASTA reference.
         The root name for the new reference is 'reference'
 
+        Nothing is built if the Bowtie2 files were reused from the last ready index in :meth:`.write_fasta`.
+
         """
+        if self.params.get("reused_index_id"):
+            return
+
         if self.params["data_type"] != "barcode":
             command = [
                 "bowtie2-build",
@@ -215,56 +266,195 @@ class Job(virtool.jobs.job.Job):
         virtool.utils.rm(self.params["index_path"], True)
 
 
-def get_patched_otus(db, settings: dict, manifest: dict) -> typing.Generator[dict, None, None]:
+def get_previous_index(db, ref_id: str, index_id: str) -> typing.Union[dict, None]:
     """
-    Get joined OTUs patched to a specific version based on a manifest of OTU ids and versions.
+    Get the latest ready index for the reference identified by `ref_id`, excluding the index being built.
 
     :param db: the job database client
-    :param settings: the application settings
-    :param manifest: the manifest
+    :param ref_id: the ID of the reference
+    :param index_id: the ID of the index being built
+    :return: the index ID and sequence hash or `None` if the reference has no ready index
 
     """
-    for patch_id, patch_version in manifest.items():
-        _, joined, _ = virtool.db.sync.patch_otu_to_version(
-            db,
-            settings,
-            patch_id,
-            patch_version
-        )
+    return db.indexes.find_one(
+        {"reference.id": ref_id, "ready": True, "_id": {"$ne": index_id}},
+        ["sequence_hash"],
+        sort=[("version", pymongo.DESCENDING)]
+    )
 
-        yield joined
 
+def read_fragments(index_path: str) -> dict:
+    """
+    Read the FASTA fragment positions recorded for the index at `index_path`. Returns an empty `dict` if the index was
+    built before fragments were recorded or its files have been removed.
 
-def get_sequences_from_patched_otus(
-        otus: typing.Iterable[dict],
-        data_type: str, sequence_otu_map: dict
-) -> typing.Generator[dict, None, None]:
+    :param index_path: the path to the index directory
+    :return: fragment positions keyed by OTU ID
+
+    """
+    try:
+        with open(os.path.join(index_path, FRAGMENTS_FILENAME), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return dict()
+
+
+def get_reusable_otu_ids(manifest: dict, previous_fragments: dict) -> typing.Set[str]:
+    """
+    Get the IDs of OTUs whose versions in `manifest` are the same as in the previous index. Their FASTA fragments can be
+    copied from the previous index instead of being patched and rewritten.
+
+    :param manifest: the manifest of the index being built
+    :param previous_fragments: the fragment positions of the previous index
+    :return: the reusable OTU IDs
+
+    """
+    return {
+        otu_id for otu_id, version in manifest.items()
+        if otu_id in previous_fragments and previous_fragments[otu_id]["version"] == version
+    }
+
+
+def compose_fasta_fragment(otu: dict, data_type: str) -> str:
     """
-    Return sequence documents based on an `Iterable` of joined OTU documents. Writes a map of sequence IDs to OTU IDs
-    into the passed `sequence_otu_map`.
+    Compose the FASTA text for a joined OTU.
 
-    If `data_type` is `barcode`, all sequences are returned. Otherwise, only sequences of default isolates are returned.
+    If `data_type` is `barcode`, all sequences are included. Otherwise, only sequences of the default isolate are
+    included.
 
-    :param otus: an Iterable of joined OTU documents
+    :param otu: a joined OTU document
+    :param data_type: the data type of the parent reference for the OTU
+    :return: the FASTA text
+
+    """
+    if data_type == "barcode":
+        sequences = virtool.otus.utils.extract_sequences(otu)
+    else:
+        sequences = virtool.otus.utils.extract_default_sequences(otu)
+
+    return "".join(f">{sequence['_id']}\n{sequence['sequence']}\n" for sequence in sequences)
+
+
+def write_fasta_fragments(
+        index_path: str,
+        manifest: dict,
+        patched_otus: typing.Iterable[dict],
+        data_type: str,
+        sequence_otu_map: dict,
+        previous_path: typing.Union[str, None] = None,
+        previous_fragments: typing.Union[dict, None] = None
+) -> typing.Tuple[dict, str]:
+    """
+    Write ``ref.fa`` for the OTUs in `manifest` and return the position of each OTU's fragment and a content hash of
+    the file.
+
+    Fragments are written in OTU ID order so that identical content always produces an identical file. OTUs missing
+    from `patched_otus` are copied from ``ref.fa`` in `previous_path` using `previous_fragments`. Writes a map of
+    sequence IDs to OTU IDs into the passed `sequence_otu_map`.
+
+    :param index_path: the path to the index directory to write to
+    :param manifest: the manifest of the index being built
+    :param patched_otus: the patched OTUs that must be written
     :param data_type: the data type of the parent reference for the OTUs
     :param sequence_otu_map: a dict to populate with sequence-OTU map information
-    :return: a generator that yields sequence documents
+    :param previous_path: the path to the previous index directory
+    :param previous_fragments: the fragment positions of the previous index
+    :return: the fragment positions keyed by OTU ID and the SHA-256 hex digest of the file
+
+    """
+    patched_otus = {otu["_id"]: otu for otu in patched_otus}
+
+    fragments = dict()
+
+    sha256 = hashlib.sha256()
 
+    offset = 0
+
+    previous_handle = None
+
+    if previous_path and len(patched_otus) < len(manifest):
+        previous_handle = open(os.path.join(previous_path, "ref.fa"), "rb")
+
+    try:
+        with open(os.path.join(index_path, "ref.fa"), "wb") as handle:
+            for otu_id in sorted(manifest):
+                otu = patched_otus.get(otu_id)
+
+                if otu:
+                    data = compose_fasta_fragment(otu, data_type).encode()
+
+                    sequence_ids = [s["_id"] for isolate in otu["isolates"] for s in isolate["sequences"]]
+                else:
+                    previous = previous_fragments[otu_id]
+
+                    previous_handle.seek(previous["offset"])
+                    data = previous_handle.read(previous["length"])
+
+                    sequence_ids = previous["sequence_ids"]
+
+                handle.write(data)
+                sha256.update(data)
+
+                for sequence_id in sequence_ids:
+                    sequence_otu_map[sequence_id] = otu_id
+
+                fragments[otu_id] = {
+                    "version": manifest[otu_id],
+                    "offset": offset,
+                    "length": len(data),
+                    "sequence_ids": sequence_ids
+                }
+
+                offset += len(data)
+    finally:
+        if previous_handle:
+            previous_handle.close()
+
+    return fragments, sha256.hexdigest()
+
+
+def link_bowtie_files(source_path: str, target_path: str) -> bool:
     """
-    for otu in otus:
-        otu_id = otu["_id"]
+    Hard link the Bowtie2 files in `source_path` into `target_path`. Files are copied if they can't be linked. Only
+    files with Bowtie2 suffixes are linked, so other files in the index directory are not carried over.
 
-        for isolate in otu["isolates"]:
-            for sequence in isolate["sequences"]:
-                sequence_id = sequence["_id"]
-                sequence_otu_map[sequence_id] = otu_id
+    :param source_path: the path to the index directory to reuse
+    :param target_path: the path to the index directory being built
+    :return: `False` if there were no Bowtie2 files to reuse
 
-        if data_type == "barcode":
-            for sequence in virtool.otus.utils.extract_sequences(otu):
-                yield sequence
-        else:
-            for sequence in virtool.otus.utils.extract_default_sequences(otu):
-                yield sequence
+    """
+    paths = [
+        path for suffix in ("bt2", "bt2l") for path in glob.glob(os.path.join(source_path, f"reference.*.{suffix}"))
+    ]
+
+    if not paths:
+        return False
+
+    for path in paths:
+        target = os.path.join(target_path, os.path.basename(path))
+
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copyfile(path, target)
+
+    return True
+
+
+def get_patched_otus(db, settings: dict, manifest: dict, processes: int = 1) -> typing.Iterable[dict]:
+    """
+    Get joined OTUs patched to a specific version based on a manifest of OTU ids and versions.
+
+    The whole manifest is patched at once using :func:`virtool.db.sync.patch_manifest`.
+
+    :param db: the job database client
+    :param settings: the application settings
+    :param manifest: the manifest
+    :param processes: the maximum number of worker processes to use for patching
+    :return: the patched OTUs in manifest order
+
+    """
+    return virtool.db.sync.patch_manifest(db, settings, manifest, processes).values()
 
 
 def remove_unused_index_files(reference_path: str, active_index_ids: list):
@@ -285,21 +475,3 @@ def remove_unused_index_files(reference_path: str, active_index_ids: list):
             except FileNotFoundError:
                 pass
 
-
-def write_sequences_to_file(path: str, sequences: typing.Iterable):
-    """
-    Write a FASTA file based on a given `Iterable` containing sequence documents.
-
-    Headers will contain the `_id` field of the document and the sequence text is from the `sequence` field.
-
-    :param path: the path to write the file to
-    :param sequences: the sequences to write to file
-
-    """
-    with open(path, "w") as handle:
-        for sequence in sequences:
-            sequence_id = sequence["_id"]
-            sequence_data = sequence["sequence"]
-
-            line = f">{sequence_id}\n{sequence_data}\n"
-            handle.write(line)
@@ -5,19 +5,22 @@ Classes, exceptions, and utilities for creating Virtool jobs.
 import io
 import multiprocessing
 import os
-import queue
+import selectors
 import signal
 import subprocess
 import sys
-import threading
 import traceback
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
 
 import pymongo
 
 import virtool.jobs.db
+import virtool.sam
 import virtool.utils
 
+#: The default maximum number of bytes read from a subprocess pipe before the data is passed to handlers.
+PIPE_BUFFER_LIMIT = 64 * 1024
+
 
 class Job(multiprocessing.Process):
     """
@@ -187,16 +190,29 @@ class Job(multiprocessing.Process):
 
         self.flush_log()
 
-    def run_subprocess(self, command: list, stdout_handler=None, stderr_handler=None, env: Optional[dict] = None, cwd: Optional[str] = None):
+    def run_subprocess(self, command: list, stdout_handler=None, stderr_handler=None, env: Optional[dict] = None,
+                       cwd: Optional[str] = None, stdout_block_size: Optional[int] = None,
+                       buffer_limit: int = PIPE_BUFFER_LIMIT):
         """
         A utility method for running a the passed `subprocess` command.
 
         It takes care of running a command and handling STDOUT and STDERR.
 
+        If `stdout_block_size` is set, STDOUT is read in blocks of up to that many bytes and each block is passed to
+        `stdout_handler` instead of each line. Blocks do not respect line boundaries. This is useful for high-volume
+        output such as SAM (see :class:`virtool.sam.SAMBlockReader`).
+
+        STDOUT and STDERR are read in the calling thread using :func:`.pump_pipes`. No more than `buffer_limit` bytes are
+        read from a pipe before they are handled. The subprocess blocks on writes while handlers are running, so slow
+        handlers throttle the subprocess rather than letting output accumulate in memory.
+
         :param command: the command to run in a subprocess
-        :param stdout_handler: a function for handling STDOUT lines
+        :param stdout_handler: a function for handling STDOUT lines or blocks
         :param stderr_handler: a function for handling STDERR lines
         :param env: environmental variables to
+        :param cwd: the working directory for the subprocess
+        :param stdout_block_size: the maximum size of blocks to pass to `stdout_handler`
+        :param buffer_limit: the maximum number of bytes to read from a pipe before handling them
         :return:
         """
         self.add_log(f"Command: {' '.join(command)}")
@@ -216,51 +232,38 @@ class Job(multiprocessing.Process):
 
         self._process = subprocess.Popen(command, stdout=stdout, stderr=subprocess.PIPE, env=env, cwd=cwd)
 
-        stdout_queue = None
-        stdout_thread = None
+        handlers = {
+            self._process.stderr: (_stderr_handler, None)
+        }
 
         if stdout_handler:
-            stdout_queue = queue.Queue()
+            handlers[self._process.stdout] = (stdout_handler, stdout_block_size)
 
-            stdout_thread = threading.Thread(
-                target=watch_pipe,
-                args=(self._process.stdout, stdout_queue),
-                daemon=True
-            )
+        pump_pipes(handlers, buffer_limit)
 
-            stdout_thread.start()
-
-        stderr_queue = queue.Queue()
-
-        stderr_thread = threading.Thread(
-            target=watch_pipe,
-            args=(self._process.stderr, stderr_queue),
-            daemon=True
-        )
+        self._process.wait()
 
-        stderr_thread.start()
+        if self._process.returncode != 0:
+            raise SubprocessError(f"Command failed: {' '.join(command)}. Check job log.")
 
-        while True:
-            if stdout_queue:
-                while not stdout_queue.empty():
-                    out = stdout_queue.get()
-                    stdout_handler(out)
+        self._process = None
 
-            while not stderr_queue.empty():
-                err = stderr_queue.get()
-                _stderr_handler(err)
+    def run_sam_subprocess(self, command: list, batch_handler):
+        """
+        Run an aligner ``command`` that writes SAM to STDOUT.
 
-            alive = (stdout_thread and stdout_thread.is_alive()) or stderr_thread.is_alive()
+        STDOUT is consumed in large blocks and parsed with :class:`virtool.sam.SAMBlockReader`. Mapped alignments are
+        passed to ``batch_handler`` as :class:`virtool.sam.SAMBatch` objects.
 
-            stdout_empty = not stdout_queue or stdout_queue.empty()
+        :param command: the aligner command to run
+        :param batch_handler: a function that handles batches of mapped alignments
 
-            if not alive and stderr_queue.empty() and stdout_empty and self._process.poll() is not None:
-                break
+        """
+        reader = virtool.sam.SAMBlockReader(batch_handler)
 
-        if self._process.returncode != 0:
-            raise SubprocessError(f"Command failed: {' '.join(command)}. Check job log.")
+        self.run_subprocess(command, stdout_handler=reader, stdout_block_size=virtool.sam.BLOCK_SIZE)
 
-        self._process = None
+        reader.close()
 
     def add_status(self, state=None, stage=None):
         """
@@ -414,21 +417,65 @@ def handle_sigterm(*args):
     raise TerminationError
 
 
-def watch_pipe(stream: io.TextIOWrapper, q: queue.Queue):
+def pump_pipes(handlers: Dict[io.BufferedReader, Tuple[Callable[[bytes], None], Optional[int]]],
+               buffer_limit: int = PIPE_BUFFER_LIMIT):
     """
-    A function for watching stdout and stderr pipes on subprocesses. Lines are read and pushed into the `q`. Queued
-    lines are handled in :meth:`.Job.run`.
+    Read from subprocess pipes until all of them are closed, passing the output to handlers in the calling thread.
+
+    The ``handlers`` map each pipe to a handler function and a block size. If the block size is ``None``, the handler is
+    called once for each line. Each line includes its trailing newline. Otherwise, the handler is called with blocks of
+    up to the block size or ``buffer_limit``, whichever is smaller. Blocks do not respect line boundaries.
 
-    This function is intended to be run in a separate thread.
+    Waiting on the pipes uses :mod:`selectors`, so no CPU time is used while the subprocess is quiet. All lines read
+    from a pipe at once are split and handled together. If a single line grows longer than ``buffer_limit`` bytes, it
+    is handled in pieces so memory use remains bounded.
 
-    :param stream: a stdout or stderr file object
-    :param q: a queue to push lines into
+    :param handlers: a dict mapping pipes to handler functions and block sizes
+    :param buffer_limit: the maximum number of bytes to read from a pipe before handling them
 
     """
-    while True:
-        line = stream.readline()
+    selector = selectors.DefaultSelector()
+
+    for stream, (handler, block_size) in handlers.items():
+        selector.register(stream, selectors.EVENT_READ, (handler, block_size, bytearray()))
+
+    try:
+        while selector.get_map():
+            for key, _ in selector.select():
+                handler, block_size, pending = key.data
+
+                data = os.read(key.fd, min(block_size or buffer_limit, buffer_limit))
+
+                if not data:
+                    selector.unregister(key.fileobj)
+
+                    if pending:
+                        handler(bytes(pending))
+
+                    continue
+
+                if block_size:
+                    handler(data)
+                    continue
+
+                pending += data
+
+                end = pending.rfind(b"\n") + 1
+
+                if end == 0:
+                    if len(pending) >= buffer_limit:
+                        handler(bytes(pending))
+                        pending.clear()
+
+                    continue
+
+                # Split only on newlines like readline() does. Carriage returns written by progress output stay
+                # inside their lines.
+                lines = bytes(pending[:end - 1]).split(b"\n")
 
-        if not line:
-            return
+                del pending[:end]
 
-        q.put(line)
+                for line in lines:
+                    handler(line + b"\n")
+    finally:
+        selector.close()
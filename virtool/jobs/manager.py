@@ -1,6 +1,10 @@
 import asyncio
+import collections
 import logging
 import multiprocessing
+import threading
+import time
+from typing import Dict, List
 
 import virtool.db.core
 import virtool.indexes.db
@@ -11,6 +15,7 @@ import virtool.db.utils
 import virtool.dispatcher
 import virtool.errors
 import virtool.jobs.classes
+import virtool.settings.schema
 import virtool.utils
 
 TASK_LG = "lg"
@@ -26,6 +31,17 @@ TASK_SIZES = {
     "update_sample": TASK_SM
 }
 
+#: Application settings that control the order in which waiting jobs are started. See :func:`.schedule`.
+SCHEDULING_SETTINGS = (
+    "job_priorities",
+    "job_fair_share",
+    "job_backfill",
+    "job_backfill_timeout"
+)
+
+#: The longest time in seconds the manager loop will sleep without an event waking it.
+POLL_INTERVAL = 5
+
 
 class IntegratedManager:
     """
@@ -33,6 +49,12 @@ class IntegratedManager:
 
     The integrated manager makes use of the shared application process and thread pool executors.
 
+    The order in which waiting jobs are started is decided by :func:`.schedule` using the job scheduling settings.
+
+    The manager loop sleeps until something happens that could change what it should do: a job is enqueued, a job
+    process exits, or a job process sends a dispatch message. On each wakeup, finished jobs are removed, every waiting
+    job that fits in the available resources is started, and all pending dispatch messages are handled.
+
     """
 
     def __init__(self, app, capture_exception):
@@ -60,42 +82,54 @@ class IntegratedManager:
         #: A dict to store all the tracked job objects in.
         self._jobs = dict()
 
-    async def run(self):
-        logging.debug("Started job manager")
+        #: Dispatch messages received from job processes that have not been handled yet.
+        self._messages = collections.deque()
 
-        try:
-            while True:
-                to_delete = list()
+        #: Set when the manager loop should wake up and do some work.
+        self._wakeup = asyncio.Event()
 
-                if len(self._jobs):
-                    available = get_available_resources(self.settings, self._jobs)
+        #: The event loop the manager is running in. Value is ``None`` until :meth:`.run` is called.
+        self._loop = None
 
-                    for job_id, job in self._jobs.items():
-                        if not job["process"]:
-                            if job["proc"] <= available["proc"] and job["mem"] <= available["mem"]:
-                                job["process"] = job["class"](
-                                    self.db_connection_string,
-                                    self.db_name,
-                                    self.settings,
-                                    job_id,
-                                    self.queue
-                                )
+        #: Counters and timings describing the manager's scheduling performance. See :meth:`.get_metrics`.
+        self.metrics = {
+            "wakeups": 0,
+            "started": 0,
+            "dispatched": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+            "latency_last": None
+        }
 
-                                job["process"].start()
+    async def run(self):
+        logging.debug("Started job manager")
 
-                                break
+        self._loop = asyncio.get_event_loop()
 
-                        elif not job["process"].is_alive():
-                            to_delete.append(job_id)
+        watcher = threading.Thread(
+            target=watch_queue,
+            args=(self.queue, self._loop, self._receive_message),
+            daemon=True
+        )
 
-                for job_id in to_delete:
-                    del self._jobs[job_id]
+        watcher.start()
+
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
 
-                if not self.queue.empty():
-                    msg = self.queue.get()
-                    await self.dispatch(*msg)
+                self._wakeup.clear()
+                self.metrics["wakeups"] += 1
 
-                await asyncio.sleep(0.1)
+                self.remove_finished()
+                self.start_waiting()
+
+                while self._messages:
+                    await self.dispatch(*self._messages.popleft())
+                    self.metrics["dispatched"] += 1
 
         except asyncio.CancelledError:
             logging.debug("Cancelling running jobs")
@@ -103,13 +137,113 @@ class IntegratedManager:
             for job_id in self._jobs:
                 job_process = self._jobs[job_id]["process"]
 
-                if job_process.is_alive():
+                if job_process and job_process.is_alive():
                     job_process.terminate()
 
+            # Stop the queue watcher thread.
+            self.queue.put(None)
+
         logging.debug("Closed job manager")
 
+    def wake(self):
+        """
+        Wake the manager loop so it can start waiting jobs, remove finished jobs, and handle dispatch messages.
+
+        """
+        self._wakeup.set()
+
+    def remove_finished(self):
+        """
+        Stop tracking jobs whose processes have exited.
+
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job["process"] and not job["process"].is_alive()]
+
+        for job_id in finished:
+            del self._jobs[job_id]
+
+    def start_waiting(self) -> list:
+        """
+        Start the waiting jobs chosen by :func:`.schedule`.
+
+        :return: the ids of the started jobs
+
+        """
+        started = schedule(self.settings, self._jobs, time.monotonic())
+
+        for job_id in started:
+            self.start(job_id)
+
+        return started
+
+    def start(self, job_id: str):
+        """
+        Start the process for the waiting job identified by ``job_id``.
+
+        The manager is woken when the process exits by watching its :attr:`~multiprocessing.Process.sentinel`.
+
+        :param job_id: the id of the job to start
+
+        """
+        job = self._jobs[job_id]
+
+        job["process"] = job["class"](
+            self.db_connection_string,
+            self.db_name,
+            self.settings,
+            job_id,
+            self.queue
+        )
+
+        job["process"].start()
+
+        if self._loop:
+            sentinel = job["process"].sentinel
+            self._loop.add_reader(sentinel, self._handle_exit, sentinel)
+
+        latency = time.monotonic() - job["enqueued_at"]
+
+        self.metrics["started"] += 1
+        self.metrics["latency_total"] += latency
+        self.metrics["latency_max"] = max(self.metrics["latency_max"], latency)
+        self.metrics["latency_last"] = latency
+
+    def get_metrics(self) -> dict:
+        """
+        Get a description of the job manager's current workload and scheduling performance.
+
+        Scheduling latency is the time between a job being enqueued and its process being started. It is reported in
+        seconds.
+
+        :return: the job manager metrics
+
+        """
+        started = self.metrics["started"]
+
+        return {
+            "waiting": sum(1 for job in self._jobs.values() if job["process"] is None),
+            "running": sum(1 for job in self._jobs.values() if job["process"] is not None),
+            "wakeups": self.metrics["wakeups"],
+            "started": started,
+            "dispatched": self.metrics["dispatched"],
+            "pending_messages": len(self._messages),
+            "latency": {
+                "last": self.metrics["latency_last"],
+                "mean": self.metrics["latency_total"] / started if started else None,
+                "max": self.metrics["latency_max"]
+            }
+        }
+
+    def _handle_exit(self, sentinel: int):
+        self._loop.remove_reader(sentinel)
+        self.wake()
+
+    def _receive_message(self, message: tuple):
+        self._messages.append(message)
+        self.wake()
+
     async def enqueue(self, job_id):
-        document = await self.db.jobs.find_one(job_id, ["task", "args", "proc", "mem"])
+        document = await self.db.jobs.find_one(job_id, ["task", "args", "proc", "mem", "user"])
 
         task_name = document["task"]
 
@@ -119,9 +253,13 @@ class IntegratedManager:
             "task_name": task_name,
             "task_args": document["args"],
             "proc": document["proc"],
-            "mem": document["mem"]
+            "mem": document["mem"],
+            "user_id": document["user"]["id"],
+            "enqueued_at": time.monotonic()
         }
 
+        self.wake()
+
     async def dispatch(self, interface, operation, id_list):
 
         if operation == "delete":
@@ -167,6 +305,115 @@ def get_used_resources(jobs):
     }
 
 
+def get_scheduling_settings(settings: dict) -> dict:
+    """
+    Get the job scheduling settings from the application ``settings``. Defaults from
+    :data:`virtool.settings.schema.SCHEMA` are used for settings that have not been stored yet.
+
+    :param settings: the application settings
+    :return: the job scheduling settings
+
+    """
+    return {key: settings.get(key, virtool.settings.schema.SCHEMA[key]["default"]) for key in SCHEDULING_SETTINGS}
+
+
+def get_user_shares(settings: dict, jobs: dict) -> Dict[str, float]:
+    """
+    Calculate the share of the server's resources used by each user's running jobs.
+
+    The share of a job is its dominant share: the larger of the fractions of the ``proc`` and ``mem`` limits it uses.
+
+    :param settings: the application settings
+    :param jobs: the jobs tracked by the job manager
+    :return: the resource share of each user with running jobs
+
+    """
+    shares = collections.defaultdict(float)
+
+    for job in jobs.values():
+        if job["process"]:
+            shares[job["user_id"]] += get_dominant_share(settings, job)
+
+    return shares
+
+
+def get_dominant_share(settings: dict, job: dict) -> float:
+    return max(job["proc"] / settings["proc"], job["mem"] / settings["mem"])
+
+
+def schedule(settings: dict, jobs: dict, now: float) -> List[str]:
+    """
+    Choose which waiting ``jobs`` to start now.
+
+    Waiting jobs are ranked by:
+
+    1. Task priority from the ``job_priorities`` setting. Higher values are started first. Unlisted tasks have a
+       priority of ``0``.
+    2. The resource share already used by the job's user, when the ``job_fair_share`` setting is enabled. Users using
+       less of the server are started first.
+    3. The time the job was enqueued.
+
+    Jobs are started in rank order until the highest ranked waiting job does not fit in the available resources. That
+    job then blocks lower ranked jobs so it is not starved. If the ``job_backfill`` setting is enabled, small
+    (:data:`TASK_SM`) jobs are still started in the idle capacity while the blocked job waits. Backfilling stops once
+    the blocked job has waited longer than ``job_backfill_timeout`` seconds so it can eventually claim the resources.
+
+    Ranks are recalculated after each job is chosen because user shares change as jobs are started.
+
+    :param settings: the application settings
+    :param jobs: the jobs tracked by the job manager
+    :param now: the current :func:`time.monotonic` time
+    :return: the ids of the jobs to start in the order they should be started
+
+    """
+    scheduling = get_scheduling_settings(settings)
+
+    priorities = scheduling["job_priorities"]
+
+    available = get_available_resources(settings, jobs)
+
+    shares = get_user_shares(settings, jobs) if scheduling["job_fair_share"] else collections.defaultdict(float)
+
+    def rank(job_id):
+        job = jobs[job_id]
+        return -priorities.get(job["task_name"], 0), shares[job["user_id"]], job["enqueued_at"]
+
+    waiting = [job_id for job_id, job in jobs.items() if job["process"] is None]
+
+    selected = list()
+
+    while waiting:
+        blocked = False
+
+        for job_id in sorted(waiting, key=rank):
+            job = jobs[job_id]
+
+            if blocked and TASK_SIZES[job["task_name"]] != TASK_SM:
+                continue
+
+            if job["proc"] <= available["proc"] and job["mem"] <= available["mem"]:
+                available["proc"] -= job["proc"]
+                available["mem"] -= job["mem"]
+
+                if scheduling["job_fair_share"]:
+                    shares[job["user_id"]] += get_dominant_share(settings, job)
+
+                waiting.remove(job_id)
+                selected.append(job_id)
+
+                break
+
+            if not blocked:
+                if not scheduling["job_backfill"] or now - job["enqueued_at"] > scheduling["job_backfill_timeout"]:
+                    return selected
+
+                blocked = True
+        else:
+            break
+
+    return selected
+
+
 def get_task_limits(settings, task_name):
     size = TASK_SIZES[task_name]
 
@@ -174,3 +421,27 @@ def get_task_limits(settings, task_name):
     mem = settings[f"{size}_mem"]
 
     return proc, mem
+
+
+def watch_queue(q: multiprocessing.Queue, loop: asyncio.AbstractEventLoop, callback):
+    """
+    Wait for dispatch messages from job processes on ``q`` and pass them to ``callback`` in the event ``loop``.
+
+    This function is intended to be run in a separate thread. It returns when ``None`` is received.
+
+    :param q: the queue job processes put dispatch messages in
+    :param loop: the event loop the job manager is running in
+    :param callback: the function to call with each message
+
+    """
+    while True:
+        message = q.get()
+
+        if message is None:
+            return
+
+        try:
+            loop.call_soon_threadsafe(callback, message)
+        except RuntimeError:
+            # The event loop has been closed.
+            return
@@ -3,16 +3,23 @@ Job class and functions for NuVs.
 
 """
 import collections
+import concurrent.futures
 import os
 import shlex
 import shutil
 import tempfile
+from typing import Generator, List, Tuple
 
 import virtool.bio
 import virtool.db.sync
+import virtool.hmm.utils
 import virtool.jobs.analysis
 
 
+#: The minimum number of contigs to search for ORFs in each process. Smaller assemblies are searched serially.
+ORF_CHUNK_SIZE = 20
+
+
 class SubprocessError(Exception):
     pass
 
@@ -89,21 +96,24 @@ class Job(virtool.jobs.analysis.Job):
         self.run_subprocess(command)
 
     def reunite_pairs(self):
-        if self.params["paired"]:
-            unmapped_path = os.path.join(self.params["analysis_path"], "unmapped_hosts.fq")
-            headers = virtool.bio.read_fastq_headers(unmapped_path)
+        """
+        Write the mates of the reads in ``unmapped_hosts.fq`` from the sample read files to ``unmapped_1.fq`` and
+        ``unmapped_2.fq``.
 
-            unmapped_roots = {h.split(" ")[0] for h in headers}
+        Read roots are held as sorted 64-bit hashes and both sample read files are streamed in a single pass.
+
+        """
+        if self.params["paired"]:
+            analysis_path = self.params["analysis_path"]
 
-            with open(os.path.join(self.params["analysis_path"], "unmapped_1.fq"), "w") as f:
-                for header, seq, quality in virtool.bio.read_fastq_from_path(self.params["read_paths"][0]):
-                    if header.split(" ")[0] in unmapped_roots:
-                        f.write("\n".join([header, seq, "+", quality]) + "\n")
+            root_hashes = virtool.bio.read_fastq_root_hashes(os.path.join(analysis_path, "unmapped_hosts.fq"))
 
-            with open(os.path.join(self.params["analysis_path"], "unmapped_2.fq"), "w") as f:
-                for header, seq, quality in virtool.bio.read_fastq_from_path(self.params["read_paths"][1]):
-                    if header.split(" ")[0] in unmapped_roots:
-                        f.write("\n".join([header, seq, "+", quality]) + "\n")
+            virtool.bio.write_paired_reads(
+                self.params["read_paths"],
+                [os.path.join(analysis_path, f"unmapped_{suffix}.fq") for suffix in (1, 2)],
+                root_hashes,
+                max(1, self.proc // 2)
+            )
 
     def assemble(self):
         """
@@ -168,21 +178,15 @@ class Job(virtool.jobs.analysis.Job):
         Finds ORFs in the contigs assembled by :meth:`.assemble`. Only ORFs that are 100+ amino acids long are recorded.
         Contigs with no acceptable ORFs are discarded.
 
+        Contigs are searched in parallel using up to :attr:`proc` processes.
+
         """
         assembly_path = os.path.join(self.params["analysis_path"], "assembly.fa")
 
-        assembly = virtool.bio.read_fasta(assembly_path)
-
-        for _, sequence in assembly:
-
-            sequence_length = len(sequence)
-
-            # Don't consider the sequence if it is shorter than 300 bp.
-            if sequence_length < 300:
-                continue
-
-            orfs = virtool.bio.find_orfs(sequence)
+        # Don't consider sequences shorter than 300 bp.
+        sequences = [sequence for _, sequence in virtool.bio.read_fasta(assembly_path) if len(sequence) >= 300]
 
+        for sequence, orfs in zip(sequences, find_all_orfs(sequences, self.proc)):
             # Don't consider the sequence if it has no ORFs.
             if len(orfs) == 0:
                 continue
@@ -209,6 +213,18 @@ class Job(virtool.jobs.analysis.Job):
                     f.write(f">sequence_{entry['index']}.{orf['index']}\n{orf['pro']}\n")
 
     def prepare_hmm(self):
+        """
+        Take a reference to the shared, pre-pressed HMM profiles so they are not removed while :meth:`.vfam` is using
+        them.
+
+        If the profiles have not been pressed, a copy is pressed in the analysis directory instead.
+
+        """
+        profiles_path = virtool.hmm.utils.acquire_pressed_profiles(self.settings["data_path"], self.id)
+
+        if profiles_path:
+            self.intermediate["pressed_profiles_path"] = profiles_path
+            return
 
         shutil.copy(os.path.join(self.settings["data_path"], "hmm", "profiles.hmm"), self.params["analysis_path"])
 
@@ -223,6 +239,16 @@ class Job(virtool.jobs.analysis.Job):
 
         os.remove(hmm_path)
 
+    def release_hmm(self):
+        """
+        Release the reference to the shared HMM profiles taken in :meth:`.prepare_hmm`.
+
+        """
+        profiles_path = self.intermediate.pop("pressed_profiles_path", None)
+
+        if profiles_path:
+            virtool.hmm.utils.release_pressed_profiles(self.settings["data_path"], self.id, profiles_path)
+
     def vfam(self):
         """
         Searches for viral motifs in ORF translations generated by :meth:`.process_fasta`. Calls ``hmmscan`` and
@@ -238,40 +264,43 @@ class Job(virtool.jobs.analysis.Job):
         # The path to output the hmmer results to.
         tsv_path = os.path.join(self.params["analysis_path"], "hmm.tsv")
 
+        # Use the shared profiles if a reference was taken in prepare_hmm. Otherwise, use the copy pressed there.
+        profiles_path = self.intermediate.get("pressed_profiles_path")
+
+        if profiles_path is None:
+            profiles_path = os.path.join(self.params["analysis_path"], "profiles.hmm")
+
         command = [
             "hmmscan",
             "--tblout", tsv_path,
             "--noali",
             "--cpu", str(self.proc - 1),
-            os.path.join(self.params["analysis_path"], "profiles.hmm"),
+            profiles_path,
             os.path.join(self.params["analysis_path"], "orfs.fa")
         ]
 
         self.run_subprocess(command)
 
+        self.release_hmm()
+
         hits = collections.defaultdict(lambda: collections.defaultdict(list))
 
-        # Go through the raw HMMER results and annotate the HMM hits with data from the database.
-        with open(tsv_path, "r") as hmm_file:
-            for line in hmm_file:
-                if line.startswith("vFam"):
-                    line = line.split()
+        clusters = set()
+
+        # Go through the raw HMMER results and group the HMM hits by sequence and ORF.
+        for cluster, sequence_index, orf_index, scores in read_tblout(tsv_path):
+            hits[sequence_index][orf_index].append({"hit": cluster, **scores})
+            clusters.add(cluster)
 
-                    cluster_id = int(line[0].split("_")[1])
-                    annotation_id = (self.db.hmm.find_one({"cluster": int(cluster_id)}, {"_id": True}))["_id"]
+        # Annotate the HMM hits with their annotation IDs using a single query.
+        cursor = self.db.hmm.find({"cluster": {"$in": list(clusters)}}, ["cluster"])
 
-                    # Expecting sequence_0.0
-                    sequence_index, orf_index = (int(x) for x in line[2].split("_")[1].split("."))
+        annotation_ids = {document["cluster"]: document["_id"] for document in cursor}
 
-                    hits[sequence_index][orf_index].append({
-                        "hit": annotation_id,
-                        "full_e": float(line[4]),
-                        "full_score": float(line[5]),
-                        "full_bias": float(line[6]),
-                        "best_e": float(line[7]),
-                        "best_bias": float(line[8]),
-                        "best_score": float(line[9])
-                    })
+        for orfs in hits.values():
+            for orf_hits in orfs.values():
+                for hit in orf_hits:
+                    hit["hit"] = annotation_ids[hit["hit"]]
 
         for sequence_index in hits:
             for orf_index in hits[sequence_index]:
@@ -308,7 +337,64 @@ class Job(virtool.jobs.analysis.Job):
     def cleanup(self):
         super().cleanup()
 
+        self.release_hmm()
+
         try:
             self.temp_dir.cleanup()
         except AttributeError:
             pass
+
+
+def find_all_orfs(sequences: List[str], proc: int) -> List[List[dict]]:
+    """
+    Find the ORFs in each of the passed nucleotide `sequences` using :func:`virtool.bio.find_orfs`.
+
+    Sequences are split between a pool of up to `proc` processes. The ORFs are returned in the same order as the
+    sequences. Assemblies too small to benefit from more than one process are searched in the calling process.
+
+    :param sequences: the nucleotide sequences to search
+    :param proc: the maximum number of processes to use
+    :return: a list of ORFs for each sequence
+
+    """
+    max_workers = min(proc, len(sequences) // ORF_CHUNK_SIZE)
+
+    if max_workers < 2:
+        return [virtool.bio.find_orfs(sequence) for sequence in sequences]
+
+    chunksize = max(ORF_CHUNK_SIZE, len(sequences) // (max_workers * 4))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(virtool.bio.find_orfs, sequences, chunksize=chunksize))
+
+
+def read_tblout(path: str) -> Generator[Tuple[int, int, int, dict], None, None]:
+    """
+    Read the vFam hits from a ``hmmscan`` tabular output file.
+
+    The file is read one line at a time. Only the columns used by Virtool are split out of each line. Each hit is
+    yielded as a tuple of the vFam cluster ID, the sequence and ORF indexes parsed from the query name (eg.
+    ``sequence_0.0``), and a `dict` of the hit's scores.
+
+    :param path: the path to the tabular output file
+    :return: a generator of hits
+
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if not line.startswith("vFam"):
+                continue
+
+            fields = line.split(None, 10)
+
+            # Expecting sequence_0.0
+            sequence_index, orf_index = fields[2].split("_")[1].split(".")
+
+            yield int(fields[0].split("_")[1]), int(sequence_index), int(orf_index), {
+                "full_e": float(fields[4]),
+                "full_score": float(fields[5]),
+                "full_bias": float(fields[6]),
+                "best_e": float(fields[7]),
+                "best_bias": float(fields[8]),
+                "best_score": float(fields[9])
+            }
@@ -5,6 +5,7 @@ Functions and job classes for sample analysis.
 import os
 import shlex
 
+import virtool.analyses.utils
 import virtool.caches.db
 import virtool.db.sync
 import virtool.jobs.analysis
@@ -66,30 +67,11 @@ class Job(virtool.jobs.analysis.Job):
 
         to_otus = set()
 
-        def stdout_handler(line):
-            line = line.decode()
-
-            if line[0] == "#" or line[0] == "@":
-                return
-
-            fields = line.split("\t")
-
-            # Bitwise FLAG - 0x4: segment unmapped
-            if int(fields[1]) & 0x4 == 4:
-                return
-
-            ref_id = fields[2]
-
-            if ref_id == "*":
-                return
-
+        def batch_handler(batch):
             # Skip if the p_score does not meet the minimum cutoff.
-            if virtool.pathoscope.find_sam_align_score(fields) < 0.01:
-                return
-
-            to_otus.add(ref_id)
+            to_otus.update(ref_id for ref_id, p_score in zip(batch.ref_ids, batch.scores) if p_score >= 0.01)
 
-        self.run_subprocess(command, stdout_handler=stdout_handler)
+        self.run_sam_subprocess(command, batch_handler)
 
         self.intermediate["to_otus"] = to_otus
 
@@ -107,17 +89,15 @@ class Job(virtool.jobs.analysis.Job):
         # The ids of OTUs whose default sequences had mappings.
         otu_ids = {sequence_otu_map[sequence_id] for sequence_id in self.intermediate["to_otus"]}
 
-        # Get the database documents for the sequences
+        # Get the OTUs referenced by the hit sequence ids patched to their manifest versions.
+        patched_otus = virtool.db.sync.patch_manifest(
+            self.db,
+            self.settings,
+            {otu_id: self.params["manifest"][otu_id] for otu_id in otu_ids}
+        )
+
         with open(fasta_path, "w") as handle:
-            # Iterate through each otu id referenced by the hit sequence ids.
-            for otu_id in otu_ids:
-                otu_version = self.params["manifest"][otu_id]
-                _, patched, _ = virtool.db.sync.patch_otu_to_version(
-                    self.db,
-                    self.settings,
-                    otu_id,
-                    otu_version
-                )
+            for patched in patched_otus.values():
                 for isolate in patched["isolates"]:
                     for sequence in isolate["sequences"]:
                         handle.write(f">{sequence['_id']}\n{sequence['sequence']}\n")
@@ -146,6 +126,8 @@ class Job(virtool.jobs.analysis.Job):
         """
         Using ``bowtie2``, map the sample reads to the index built using :meth:`.build_isolate_index`.
 
+        Alignments are written to the binary VTA file ``to_isolates.vtb`` using :class:`~virtool.pathoscope.VTBWriter`.
+
         """
         command = [
             "bowtie2",
@@ -161,39 +143,18 @@ class Job(virtool.jobs.analysis.Job):
             "-U", ",".join(self.params["read_paths"])
         ]
 
-        with open(os.path.join(self.params["analysis_path"], "to_isolates.vta"), "w") as f:
-            def stdout_handler(line, p_score_cutoff=0.01):
-                line = line.decode()
-
-                if line[0] == "@" or line == "#":
-                    return
-
-                fields = line.split("\t")
-
-                # Bitwise FLAG - 0x4 : segment unmapped
-                if int(fields[1]) & 0x4 == 4:
-                    return
-
-                ref_id = fields[2]
+        vtb_path = os.path.join(self.params["analysis_path"], "to_isolates.vtb")
 
-                if ref_id == "*":
-                    return
+        with virtool.pathoscope.VTBWriter(vtb_path) as writer:
+            def batch_handler(batch, p_score_cutoff=0.01):
+                alignments = zip(batch.read_ids, batch.ref_ids, batch.positions, batch.lengths, batch.scores)
 
-                p_score = virtool.pathoscope.find_sam_align_score(fields)
+                for read_id, ref_id, pos, length, p_score in alignments:
+                    # Skip if the p_score does not meet the minimum cutoff.
+                    if p_score >= p_score_cutoff:
+                        writer.add(read_id, ref_id, pos, length, p_score)
 
-                # Skip if the p_score does not meet the minimum cutoff.
-                if p_score < p_score_cutoff:
-                    return
-
-                f.write(",".join([
-                    fields[0],  # read_id
-                    ref_id,
-                    fields[3],  # pos
-                    str(len(fields[9])),  # length
-                    str(p_score)
-                ]) + "\n")
-
-            self.run_subprocess(command, stdout_handler=stdout_handler)
+            self.run_sam_subprocess(command, batch_handler)
 
     def map_subtraction(self):
         """
@@ -212,36 +173,29 @@ class Job(virtool.jobs.analysis.Job):
 
         to_subtraction = dict()
 
-        def stdout_handler(line):
-            line = line.decode()
-
-            if line[0] == "@" or line == "#":
-                return
+        def batch_handler(batch):
+            to_subtraction.update(zip(batch.read_ids, batch.scores))
 
-            fields = line.split("\t")
+        self.run_sam_subprocess(command, batch_handler)
 
-            # Bitwise FLAG - 0x4 : segment unmapped
-            if int(fields[1]) & 0x4 == 4:
-                return
-
-            # No ref_id assigned.
-            if fields[2] == "*":
-                return
+        self.intermediate["to_subtraction"] = to_subtraction
 
-            to_subtraction[fields[0]] = virtool.pathoscope.find_sam_align_score(fields)
+    def subtract_mapping(self):
+        """
+        Remove alignments for reads that map better to the subtraction host than to any isolate.
 
-        self.run_subprocess(command, stdout_handler=stdout_handler)
+        The binary isolate VTA file is memory-mapped once here. The subtracted alignment columns are kept in :attr:`intermediate` and
+        reused by :meth:`pathoscope` instead of rewriting and re-reading the file.
 
-        self.intermediate["to_subtraction"] = to_subtraction
+        """
+        vta = virtool.pathoscope.read_vtb(os.path.join(self.params["analysis_path"], "to_isolates.vtb"))
 
-    def subtract_mapping(self):
-        subtracted_count = virtool.pathoscope.subtract(
-            self.params["analysis_path"],
-            self.intermediate["to_subtraction"]
-        )
+        vta, subtracted_count = virtool.pathoscope.subtract_vta(vta, self.intermediate["to_subtraction"])
 
         del self.intermediate["to_subtraction"]
 
+        self.intermediate["vta"] = vta
+
         self.results["subtracted_count"] = subtracted_count
 
     def pathoscope(self):
@@ -250,9 +204,13 @@ class Job(virtool.jobs.analysis.Job):
         also parsed and saved to :attr:`intermediate`.
 
         """
-        vta_path = os.path.join(self.params["analysis_path"], "to_isolates.vta")
         reassigned_path = os.path.join(self.params["analysis_path"], "reassigned.vta")
 
+        vta = self.intermediate.pop("vta", None)
+
+        if vta is None:
+            vta = virtool.pathoscope.read_vtb(os.path.join(self.params["analysis_path"], "to_isolates.vtb"))
+
         (
             best_hit_initial_reads,
             best_hit_initial,
@@ -265,8 +223,9 @@ class Job(virtool.jobs.analysis.Job):
             init_pi,
             pi,
             refs,
-            reads
-        ) = run_patho(vta_path, reassigned_path)
+            reads,
+            reassigned
+        ) = run_patho_compact(vta, reassigned_path, log=self.add_log)
 
         read_count = len(reads)
 
@@ -286,8 +245,9 @@ class Job(virtool.jobs.analysis.Job):
             level_2_final
         )
 
-        self.intermediate["coverage"] = virtool.pathoscope.calculate_coverage(
-            reassigned_path,
+        self.intermediate["coverage"], coverage_stats = virtool.pathoscope.calculate_vta_coverage(
+            vta,
+            reassigned,
             self.intermediate["ref_lengths"]
         )
 
@@ -310,25 +270,29 @@ class Job(virtool.jobs.analysis.Job):
                 "id": otu_id
             }
 
-            # Get the coverage for the sequence.
-            hit_coverage = self.intermediate["coverage"][ref_id]
+            # Attach the coverage, mean depth, and median depth calculated along with the coverage list.
+            hit.update(coverage_stats[ref_id])
 
-            # Attach coverage list to hit dict.
-            hit["align"] = hit_coverage
-
-            # Calculate coverage and attach to hit.
-            hit["coverage"] = round(1 - hit_coverage.count(0) / len(hit_coverage), 3)
+            self.results["results"].append(hit)
 
-            # Calculate depth and attach to hit.
-            hit["depth"] = round(sum(hit_coverage) / len(hit_coverage))
+        # Only keep depth lists for the hits in the report.
+        self.intermediate["coverage"] = {ref_id: self.intermediate["coverage"][ref_id] for ref_id in report}
 
-            self.results["results"].append(hit)
+        # Depth lists are stored in a compressed sidecar file instead of in the results. They would otherwise make up
+        # most of the size of the analysis document.
+        virtool.analyses.utils.write_coverage_file(
+            os.path.join(self.params["analysis_path"], virtool.analyses.utils.COVERAGE_FILENAME),
+            self.intermediate["coverage"]
+        )
 
     def import_results(self):
         """
         Commits the results to the database. Data includes the output of Pathoscope, final mapped read count,
         and viral genome coverage maps.
 
+        Coverage coordinates for each zoom level in :data:`virtool.analyses.utils.COVERAGE_LEVELS` are computed and
+        stored in the `coverage` collection so they don't have to be computed when the analysis is first viewed.
+
         Once the import is complete, :meth:`cleanup_index_files` is called to remove
         any otu indexes that may become unused when this analysis completes.
 
@@ -340,6 +304,12 @@ class Job(virtool.jobs.analysis.Job):
         # document.
         results = self.results.pop("results")
 
+        # Store coverage before the analysis is marked ready so it is never computed by the first request instead.
+        depths = {ref_id: d for ref_id, d in self.intermediate["coverage"].items() if len(d)}
+
+        self.db.coverage.delete_many({"analysis.id": analysis_id})
+        self.db.coverage.insert_many(virtool.analyses.utils.compose_coverage_documents(analysis_id, depths))
+
         # Update the database document with the small data.
         self.db.analyses.update_one({"_id": analysis_id}, {
             "$set": self.results
@@ -361,7 +331,27 @@ class Job(virtool.jobs.analysis.Job):
         pass
 
 
-def run_patho(vta_path, reassigned_path):
+def run_patho(vta_path, reassigned_path, em_engine="numpy", log=None):
+    """
+    Run Pathoscope reassignment on the alignments in the VTA file at ``vta_path``.
+
+    The EM implementation is selected from :data:`virtool.pathoscope.EM_ENGINES` using ``em_engine``. The ``numpy``
+    engine is numerically equivalent to the original ``python`` engine, but is much faster and uses far less memory for
+    large libraries because it works on a :class:`~virtool.pathoscope.CompactMatrix`.
+
+    :param vta_path: the path to the VTA file to reassign. Binary VTA files are only supported by the ``numpy`` engine.
+    :param reassigned_path: the path to write the reassigned VTA file to
+    :param em_engine: the name of the EM engine to use
+    :param log: an optional function that will be called with a description of the matrix memory usage
+    :return: the best hit, pi, reference, and read data
+
+    """
+    if em_engine == "numpy":
+        *results, _ = run_patho_compact(virtool.pathoscope.load_vta(vta_path), reassigned_path, log)
+        return tuple(results)
+
+    em = virtool.pathoscope.EM_ENGINES[em_engine]
+
     u, nu, refs, reads = virtool.pathoscope.build_matrix(vta_path)
 
     best_hit_initial_reads, best_hit_initial, level_1_initial, level_2_initial = virtool.pathoscope.compute_best_hit(
@@ -371,7 +361,7 @@ def run_patho(vta_path, reassigned_path):
         reads
     )
 
-    init_pi, pi, _, nu = virtool.pathoscope.em(u, nu, refs, 50, 1e-7, 0, 0)
+    init_pi, pi, _, nu = em(u, nu, refs, 50, 1e-7, 0, 0)
 
     best_hit_final_reads, best_hit_final, level_1_final, level_2_final = virtool.pathoscope.compute_best_hit(
         u,
@@ -396,3 +386,68 @@ def run_patho(vta_path, reassigned_path):
         refs,
         reads
     )
+
+
+def run_patho_compact(vta, reassigned_path, log=None):
+    """
+    Run Pathoscope reassignment on a :class:`~virtool.pathoscope.VTA` using
+    :func:`virtool.pathoscope.build_compact_matrix` and the array-based functions that work with its output.
+
+    Returns the same values as :func:`run_patho` followed by a mask of the alignments in ``vta`` that were kept after
+    reassignment. The mask can be used to calculate coverage without reading the reassigned VTA file.
+
+    """
+    matrix = virtool.pathoscope.build_compact_matrix(vta)
+
+    if log:
+        log(format_matrix_memory(matrix.memory))
+
+    best_hit_initial_reads, best_hit_initial, level_1_initial, level_2_initial = virtool.pathoscope.compute_best_hit_compact(
+        matrix,
+        virtool.pathoscope.normalize_compact_scores(matrix)
+    )
+
+    init_pi, pi, _, x_norm = virtool.pathoscope.em_compact(matrix, 50, 1e-7, 0, 0)
+
+    best_hit_final_reads, best_hit_final, level_1_final, level_2_final = virtool.pathoscope.compute_best_hit_compact(
+        matrix,
+        x_norm
+    )
+
+    reassigned = virtool.pathoscope.reassign_vta(matrix, x_norm, vta, 0.01)
+
+    virtool.pathoscope.write_vta(vta, reassigned, reassigned_path)
+
+    return (
+        best_hit_initial_reads,
+        best_hit_initial,
+        level_1_initial,
+        level_2_initial,
+        best_hit_final_reads,
+        best_hit_final,
+        level_1_final,
+        level_2_final,
+        init_pi,
+        pi,
+        matrix.refs,
+        list(matrix.read_ids),
+        reassigned
+    )
+
+
+def format_matrix_memory(memory: dict) -> str:
+    """
+    Describe the memory figures attached to a :class:`~virtool.pathoscope.CompactMatrix` in a form suitable for the job
+    log.
+
+    :param memory: the memory figures from the matrix
+    :return: a log line
+
+    """
+    matrix_mb = round(memory["matrix"] / 1024 ** 2, 1)
+    peak_mb = round(memory["peak_rss"] / 1024 ** 2, 1)
+
+    return (
+        f"Matrix: {memory['alignments']} alignments, {memory['reads']} reads, {memory['refs']} references, "
+        f"{matrix_mb} MB arrays, {peak_mb} MB peak RSS"
+    )
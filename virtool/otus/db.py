@@ -1,5 +1,6 @@
+import collections
 import pymongo.results
-from typing import Union
+from typing import List, Union
 import virtool.history.db
 import virtool.db.utils
 import virtool.errors
@@ -295,6 +296,26 @@ async def join_and_format(
     return virtool.otus.utils.format_otu(joined, issues, most_recent_change)
 
 
+async def join_many(db, query: dict) -> List[dict]:
+    """
+    Join all of the otus matching ``query`` with their sequences. Only two queries are made regardless of how many otus
+    match.
+
+    :param db: the application database client
+    :param query: a Mongo query for the otus collection
+    :return: the joined otu documents
+
+    """
+    documents = await db.otus.find(query).to_list(None)
+
+    sequences_by_otu = collections.defaultdict(list)
+
+    async for sequence in db.sequences.find({"otu_id": {"$in": [d["_id"] for d in documents]}}):
+        sequences_by_otu[sequence["otu_id"]].append(sequence)
+
+    return [virtool.otus.utils.merge_otu(d, sequences_by_otu[d["_id"]]) for d in documents]
+
+
 async def remove(
         app,
         otu_id: str,
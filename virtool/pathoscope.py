@@ -1,9 +1,59 @@
+import array
 import collections
 import copy
 import csv
 import math
 import os
 import shutil
+import struct
+
+import numpy
+
+import virtool.utils
+
+#: The approximate number of bytes to read from VTA files at a time.
+VTA_CHUNK_SIZE = 8 * 1024 * 1024
+
+#: The alignments in a VTA file stored as typed columns. Read and reference ids are interned to integer indexes in order
+#: of first appearance. See :func:`read_vta`.
+VTA = collections.namedtuple("VTA", [
+    "read_ids",
+    "refs",
+    "read_indexes",
+    "ref_indexes",
+    "positions",
+    "lengths",
+    "scores"
+])
+
+#: Identifies binary VTA files. The last byte is the format version.
+VTB_MAGIC = b"VTB\x01"
+
+#: The binary VTA header: magic, alignment count, read id table size, and reference id table size.
+VTB_HEADER = struct.Struct("<4sQQQ")
+
+#: The fixed-width alignment records stored in binary VTA files. Records are followed by newline-delimited read and
+#: reference id tables.
+VTB_DTYPE = numpy.dtype([
+    ("read", "<u4"),
+    ("ref", "<u4"),
+    ("pos", "<u4"),
+    ("length", "<u4"),
+    ("score", "<f8")
+])
+
+#: A Pathoscope read-to-reference matrix stored as compressed sparse row (CSR) arrays. The ``entries`` array maps each
+#: alignment in the source :class:`VTA` to its entry in the matrix. See :func:`build_compact_matrix`.
+CompactMatrix = collections.namedtuple("CompactMatrix", [
+    "refs",
+    "read_ids",
+    "indptr",
+    "indices",
+    "scores",
+    "weights",
+    "entries",
+    "memory"
+])
 
 
 def rescale_samscore(u, nu, max_score, min_score):
@@ -237,6 +287,781 @@ def em(u, nu, genomes, max_iter, epsilon, pi_prior, theta_prior):
     return init_pi, pi, theta, nu
 
 
+def build_csr(nu):
+    """
+    Pack the multi-mapping read profiles in ``nu`` into compressed sparse row (CSR) arrays.
+
+    Rows follow the iteration order of ``nu``. Each row holds the reference indexes and rescaled scores for one read.
+
+    :param nu: the non-unique read dict produced by :func:`build_matrix`
+    :return: the read indexes, row pointers, reference indexes, scores and per-read maximum scores
+
+    """
+    read_indexes = numpy.fromiter(nu.keys(), dtype=numpy.int64, count=len(nu))
+
+    counts = numpy.fromiter((len(nu[j][0]) for j in nu), dtype=numpy.int64, count=len(nu))
+
+    indptr = numpy.zeros(len(nu) + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=indptr[1:])
+
+    nnz = int(indptr[-1])
+
+    indices = numpy.fromiter((k for j in nu for k in nu[j][0]), dtype=numpy.int64, count=nnz)
+    data = numpy.fromiter((s for j in nu for s in nu[j][1]), dtype=numpy.float64, count=nnz)
+    weights = numpy.fromiter((nu[j][3] for j in nu), dtype=numpy.float64, count=len(nu))
+
+    return read_indexes, indptr, indices, data, weights
+
+
+def em_numpy(u, nu, genomes, max_iter, epsilon, pi_prior, theta_prior):
+    """
+    A vectorized equivalent of :func:`em`.
+
+    The ``nu`` read-to-reference weights are packed into CSR arrays using :func:`build_csr` and the E and M steps are
+    run as batched array operations. Reassigned weights are written back into ``nu`` once the iterations finish, so the
+    return value can be used in place of that of :func:`em`.
+
+    """
+    u_refs = numpy.fromiter((u[i][0] for i in u), dtype=numpy.int64, count=len(u))
+    u_weights = numpy.fromiter((u[i][1] for i in u), dtype=numpy.float64, count=len(u))
+
+    read_indexes, indptr, indices, data, weights = build_csr(nu)
+
+    init_pi, pi, theta, x_norm = em_arrays(
+        u_refs,
+        u_weights,
+        indptr,
+        indices,
+        data,
+        weights,
+        numpy.zeros(len(data)),
+        len(genomes),
+        max_iter,
+        epsilon,
+        pi_prior,
+        theta_prior
+    )
+
+    if max_iter:
+        x_norm_list = x_norm.tolist()
+        bounds = indptr.tolist()
+
+        for row, read_index in enumerate(read_indexes.tolist()):
+            nu[read_index][2] = x_norm_list[bounds[row]:bounds[row + 1]]
+
+    return init_pi.tolist(), pi.tolist(), theta.tolist(), nu
+
+
+def em_arrays(u_refs, u_weights, indptr, indices, data, weights, x_norm, genome_count, max_iter, epsilon, pi_prior,
+              theta_prior):
+    """
+    Run the Pathoscope EM iterations on array inputs.
+
+    Uniquely mapped reads are described by ``u_refs`` and ``u_weights``. Multi-mapping reads are described by the CSR
+    arrays ``indptr``, ``indices`` and ``data`` and by their maximum scores in ``weights``. The passed ``x_norm`` is
+    returned as-is if no iterations are run.
+
+    :return: the initial and final pi, theta and the reassigned weights for each non-zero entry
+
+    """
+    pi = numpy.full(genome_count, 1. / genome_count)
+    init_pi = pi.copy()
+    theta = pi.copy()
+
+    pi_sum_0 = numpy.bincount(u_refs, weights=u_weights, minlength=genome_count)
+
+    max_u_weights = u_weights.max() if len(u_weights) else 0
+    u_total = u_weights.sum()
+
+    max_nu_weights = weights.max() if len(weights) else 0
+    nu_total = weights.sum()
+
+    prior_weight = max(max_u_weights, max_nu_weights)
+    nu_length = len(weights) or 1
+
+    # The owning read's maximum score for every non-zero entry in the matrix.
+    counts = numpy.diff(indptr)
+    entry_weights = numpy.repeat(weights, counts)
+
+    # EM iterations
+    for i in range(max_iter):
+        pi_old = pi
+
+        # E Step
+        if len(data):
+            x_tmp = pi[indices] * theta[indices] * data
+
+            x_sums = numpy.repeat(numpy.add.reduceat(x_tmp, indptr[:-1]), counts)
+
+            # Avoid dividing by 0 at all times.
+            x_norm = numpy.divide(x_tmp, x_sums, out=numpy.zeros_like(x_tmp), where=x_sums != 0)
+
+        theta_sum = numpy.bincount(indices, weights=x_norm * entry_weights, minlength=genome_count)
+
+        # M step
+        pi_sum = theta_sum + pi_sum_0
+        pip = pi_prior * prior_weight
+
+        # Update pi.
+        pi = (pi_sum + pip) / (u_total + nu_total + pip * genome_count)
+
+        if i == 0:
+            init_pi = pi
+
+        theta_p = theta_prior * prior_weight
+
+        nu_total_div = nu_total or 1
+
+        theta = (theta_sum + theta_p) / (nu_total_div + theta_p * genome_count)
+
+        cutoff = numpy.abs(pi_old - pi).sum()
+
+        if cutoff <= epsilon or nu_length == 1:
+            break
+
+    return init_pi, pi, theta, x_norm
+
+
+def read_vta(vta_path, p_score_cutoff=0.01, chunk_size=VTA_CHUNK_SIZE):
+    """
+    Read the VTA file at ``vta_path`` into a :class:`VTA`.
+
+    The file is streamed in chunks of roughly ``chunk_size`` bytes. Read and reference ids are interned to integers and
+    the alignments are accumulated in flat typed arrays. Alignments with scores below ``p_score_cutoff`` are skipped.
+
+    This is the only time the file needs to be parsed. Subtraction, reassignment and coverage calculation can all be
+    done using the returned columns.
+
+    :param vta_path: the path to the VTA file
+    :param p_score_cutoff: the minimum score for an alignment to be included
+    :param chunk_size: the approximate number of bytes to read from the VTA file at a time
+    :return: the alignment columns
+
+    """
+    read_ids = dict()
+    ref_ids = dict()
+
+    read_column = array.array("q")
+    ref_column = array.array("q")
+    pos_column = array.array("q")
+    length_column = array.array("q")
+    score_column = array.array("d")
+
+    with open(vta_path, "r") as handle:
+        while True:
+            lines = handle.readlines(chunk_size)
+
+            if not lines:
+                break
+
+            for line in lines:
+                read_id, ref_id, pos, length, p_score = line.rstrip().split(",")
+
+                p_score = float(p_score)
+
+                if p_score < p_score_cutoff:
+                    continue
+
+                read_column.append(read_ids.setdefault(read_id, len(read_ids)))
+                ref_column.append(ref_ids.setdefault(ref_id, len(ref_ids)))
+                pos_column.append(int(pos))
+                length_column.append(int(length))
+                score_column.append(p_score)
+
+    return VTA(
+        read_ids,
+        list(ref_ids),
+        numpy.frombuffer(read_column, dtype=numpy.int64),
+        numpy.frombuffer(ref_column, dtype=numpy.int64),
+        numpy.frombuffer(pos_column, dtype=numpy.int64),
+        numpy.frombuffer(length_column, dtype=numpy.int64),
+        numpy.frombuffer(score_column, dtype=numpy.float64)
+    )
+
+
+class VTBWriter:
+    """
+    Writes alignments to a binary VTA file.
+
+    Read and reference ids are interned as alignments are added. Alignments are buffered and written as fixed-width
+    records, so the file can be memory-mapped by :func:`read_vtb`. The id tables and header are written when the writer
+    is closed.
+
+    .. code-block:: python
+
+        with VTBWriter(path) as writer:
+            writer.add("read_1", "NC_001836", 42, 101, 198.0)
+
+    :param path: the path to write the file to
+    :param buffer_size: the number of alignments to buffer before writing them to disk
+
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.buffer_size = buffer_size
+
+        self._handle = open(path, "wb")
+        self._handle.write(VTB_HEADER.pack(VTB_MAGIC, 0, 0, 0))
+
+        self._read_ids = dict()
+        self._ref_ids = dict()
+        self._buffer = list()
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, read_id, ref_id, pos, length, p_score):
+        """
+        Add an alignment.
+
+        """
+        self._buffer.append((
+            self._read_ids.setdefault(read_id, len(self._read_ids)),
+            self._ref_ids.setdefault(ref_id, len(self._ref_ids)),
+            pos,
+            length,
+            p_score
+        ))
+
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered alignments to disk.
+
+        """
+        if self._buffer:
+            self._handle.write(numpy.array(self._buffer, dtype=VTB_DTYPE).tobytes())
+            self._count += len(self._buffer)
+            self._buffer = list()
+
+    def close(self):
+        """
+        Write any buffered alignments, the id tables and the final header, then close the file.
+
+        """
+        if self._handle.closed:
+            return
+
+        self.flush()
+
+        read_table = "\n".join(self._read_ids).encode()
+        ref_table = "\n".join(self._ref_ids).encode()
+
+        self._handle.write(read_table)
+        self._handle.write(ref_table)
+
+        self._handle.seek(0)
+        self._handle.write(VTB_HEADER.pack(VTB_MAGIC, self._count, len(read_table), len(ref_table)))
+
+        self._handle.close()
+
+
+def is_vtb(path):
+    """
+    Check if the file at ``path`` is a binary VTA file.
+
+    """
+    with open(path, "rb") as f:
+        return f.read(len(VTB_MAGIC)) == VTB_MAGIC
+
+
+def read_vtb(vtb_path, p_score_cutoff=0.01):
+    """
+    Load a binary VTA file written by :class:`VTBWriter` into a :class:`VTA`.
+
+    The alignment columns are memory-mapped views of the file rather than in-memory copies. Only the id tables are read
+    into memory. Alignments with scores below ``p_score_cutoff`` are removed using :func:`filter_vta`, which copies the
+    remaining alignments into memory. This is rare because jobs never write them.
+
+    :param vtb_path: the path to the binary VTA file
+    :param p_score_cutoff: the minimum score for an alignment to be included
+    :return: the alignment columns
+
+    """
+    with open(vtb_path, "rb") as f:
+        magic, count, read_table_size, ref_table_size = VTB_HEADER.unpack(f.read(VTB_HEADER.size))
+
+        if magic != VTB_MAGIC:
+            raise ValueError(f"Not a binary VTA file: {vtb_path}")
+
+        f.seek(VTB_HEADER.size + count * VTB_DTYPE.itemsize)
+
+        read_table = f.read(read_table_size).decode()
+        ref_table = f.read(ref_table_size).decode()
+
+    if count:
+        records = numpy.memmap(vtb_path, dtype=VTB_DTYPE, mode="r", offset=VTB_HEADER.size, shape=(count,))
+        records = numpy.asarray(records)
+    else:
+        records = numpy.zeros(0, dtype=VTB_DTYPE)
+
+    read_ids = read_table.split("\n") if read_table else list()
+
+    vta = VTA(
+        dict(zip(read_ids, range(len(read_ids)))),
+        ref_table.split("\n") if ref_table else list(),
+        records["read"],
+        records["ref"],
+        records["pos"],
+        records["length"],
+        records["score"]
+    )
+
+    below_cutoff = vta.scores < p_score_cutoff
+
+    if below_cutoff.any():
+        return filter_vta(vta, ~below_cutoff)
+
+    return vta
+
+
+def load_vta(path, p_score_cutoff=0.01):
+    """
+    Load a binary or text VTA file into a :class:`VTA` using :func:`read_vtb` or :func:`read_vta`.
+
+    """
+    if is_vtb(path):
+        return read_vtb(path, p_score_cutoff)
+
+    return read_vta(path, p_score_cutoff)
+
+
+def convert_vta(vta_path, vtb_path):
+    """
+    Convert the text VTA file at ``vta_path`` to a binary VTA file at ``vtb_path``. All alignments are converted
+    regardless of score.
+
+    This can be used to convert the VTA files of existing analyses.
+
+    """
+    with open(vta_path, "r") as handle, VTBWriter(vtb_path) as writer:
+        for line in handle:
+            read_id, ref_id, pos, length, p_score = line.rstrip().split(",")
+            writer.add(read_id, ref_id, int(pos), int(length), float(p_score))
+
+
+def subtract_vta(vta, host_scores):
+    """
+    An equivalent of :func:`subtract` for a :class:`VTA`.
+
+    Alignments for reads whose best isolate score does not exceed their score against the subtraction host are removed.
+    Read and reference indexes are reassigned so the result is identical to calling :func:`read_vta` on the subtracted
+    file.
+
+    :param vta: the alignment columns
+    :param host_scores: the best alignment score of each read against the host
+    :return: the subtracted alignment columns and the number of reads that were subtracted
+
+    """
+    read_count = len(vta.read_ids)
+
+    high_scores = numpy.zeros(read_count)
+    numpy.maximum.at(high_scores, vta.read_indexes, vta.scores)
+
+    read_host_scores = numpy.fromiter(
+        (host_scores.get(read_id, 0) for read_id in vta.read_ids),
+        dtype=numpy.float64,
+        count=read_count
+    )
+
+    kept_reads = high_scores > read_host_scores
+    subtracted_count = read_count - int(kept_reads.sum())
+
+    if not subtracted_count:
+        return vta, 0
+
+    return filter_vta(vta, kept_reads[vta.read_indexes]), subtracted_count
+
+
+def filter_vta(vta, mask):
+    """
+    Select the alignments in ``vta`` where ``mask`` is ``True``.
+
+    Read and reference indexes are renumbered in order of their first appearance in the selected alignments, so the
+    result is identical to calling :func:`read_vta` on a file containing only the selected alignments.
+
+    :param vta: the alignment columns
+    :param mask: a boolean mask over the alignments
+    :return: the selected alignment columns
+
+    """
+    read_indexes = vta.read_indexes[mask]
+    ref_indexes = vta.ref_indexes[mask]
+
+    read_order, read_map = order_by_first_appearance(read_indexes, len(vta.read_ids))
+    ref_order, ref_map = order_by_first_appearance(ref_indexes, len(vta.refs))
+
+    read_ids = list(vta.read_ids)
+
+    return VTA(
+        {read_ids[i]: read_index for read_index, i in enumerate(read_order.tolist())},
+        [vta.refs[i] for i in ref_order.tolist()],
+        read_map[read_indexes],
+        ref_map[ref_indexes],
+        vta.positions[mask],
+        vta.lengths[mask],
+        vta.scores[mask]
+    )
+
+
+def order_by_first_appearance(indexes, count):
+    """
+    Find the order in which the values in ``indexes`` first appear.
+
+    :param indexes: an integer array with values less than ``count``
+    :param count: the number of possible values
+    :return: the values in order of first appearance and an array mapping each value to its position in that order
+
+    """
+    _, first = numpy.unique(indexes, return_index=True)
+    order = indexes[numpy.sort(first)]
+
+    index_map = numpy.zeros(count, dtype=numpy.int64)
+    index_map[order] = numpy.arange(len(order))
+
+    return order, index_map
+
+
+def build_compact_matrix(vta, p_score_cutoff=0.01):
+    """
+    A memory-bounded equivalent of :func:`build_matrix`.
+
+    The matrix is built from the typed columns of a :class:`VTA` rather than a nested list per read. A path to a text
+    or binary VTA file can be passed instead of a :class:`VTA`, in which case the file is loaded with :func:`load_vta`. The matrix is stored in
+    compressed sparse row (CSR) form with one row per read, ordered by read index.
+
+    Rows with a single entry correspond to the ``u`` reads of :func:`build_matrix` and rows with multiple entries to
+    the ``nu`` reads. Use :func:`expand_compact_matrix` to convert the result to the :func:`build_matrix` format.
+
+    The ``memory`` field of the returned matrix reports the alignment, read and reference counts, the size of the
+    matrix arrays and the peak RSS of the process after the build in bytes.
+
+    :param vta: the alignment columns or a path to a VTA file
+    :param p_score_cutoff: the minimum score for an alignment to be included when reading from a path
+    :return: the compact matrix
+    :rtype: :class:`CompactMatrix`
+
+    """
+    if isinstance(vta, str):
+        vta = load_vta(vta, p_score_cutoff)
+
+    read_count = len(vta.read_ids)
+    ref_count = len(vta.refs)
+
+    if len(vta.scores):
+        min_score = min(vta.scores.min(), 0)
+        max_score = max(vta.scores.max(), 0)
+
+        # Only the first alignment of each read to a given reference is kept.
+        _, first, inverse = numpy.unique(
+            vta.read_indexes.astype(numpy.int64) * ref_count + vta.ref_indexes,
+            return_index=True,
+            return_inverse=True
+        )
+
+        # Group the alignments by read while retaining their order in the file.
+        kept = numpy.sort(first)
+        order = kept[numpy.argsort(vta.read_indexes[kept], kind="stable")]
+
+        indices = vta.ref_indexes[order]
+        scores = rescale_scores(vta.scores[order], max_score, min_score)
+
+        counts = numpy.bincount(vta.read_indexes[order], minlength=read_count)
+
+        # Map every alignment, including duplicates, to the matrix entry for its read and reference.
+        rank = numpy.empty(len(vta.scores), dtype=numpy.int64)
+        rank[order] = numpy.arange(len(order))
+
+        entries = rank[first][inverse.reshape(-1)]
+    else:
+        indices = numpy.zeros(0, dtype=numpy.int64)
+        scores = numpy.zeros(0)
+        counts = numpy.zeros(0, dtype=numpy.int64)
+        entries = numpy.zeros(0, dtype=numpy.int64)
+
+    indptr = numpy.zeros(read_count + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=indptr[1:])
+
+    weights = numpy.maximum.reduceat(scores, indptr[:-1]) if len(scores) else numpy.zeros(0)
+
+    memory = {
+        "alignments": len(indices),
+        "reads": read_count,
+        "refs": ref_count,
+        "matrix": indptr.nbytes + indices.nbytes + scores.nbytes + weights.nbytes + entries.nbytes,
+        "peak_rss": virtool.utils.get_peak_rss()
+    }
+
+    return CompactMatrix(vta.refs, vta.read_ids, indptr, indices, scores, weights, entries, memory)
+
+
+def rescale_scores(scores, max_score, min_score):
+    """
+    A vectorized equivalent of the score rescaling done in :func:`rescale_samscore`.
+
+    """
+    if min_score < 0:
+        return numpy.exp((scores - min_score) * (100.0 / max_score - min_score))
+
+    return numpy.exp(scores * (100.0 / max_score))
+
+
+def normalize_compact_scores(matrix):
+    """
+    Normalize the scores in each row of a :class:`CompactMatrix` so they sum to one.
+
+    This gives the initial read-to-reference weights that :func:`build_matrix` stores for ``nu`` reads.
+
+    """
+    if not len(matrix.scores):
+        return numpy.zeros(0)
+
+    counts = numpy.diff(matrix.indptr)
+
+    return matrix.scores / numpy.repeat(numpy.add.reduceat(matrix.scores, matrix.indptr[:-1]), counts)
+
+
+def expand_compact_matrix(matrix):
+    """
+    Convert a :class:`CompactMatrix` to the ``(u, nu, refs, reads)`` format returned by :func:`build_matrix`.
+
+    """
+    u = dict()
+    nu = dict()
+
+    bounds = matrix.indptr.tolist()
+    indices = matrix.indices.tolist()
+    scores = matrix.scores.tolist()
+    x_norm = normalize_compact_scores(matrix).tolist()
+    weights = matrix.weights.tolist()
+
+    for read_index in range(len(matrix.read_ids)):
+        start = bounds[read_index]
+        end = bounds[read_index + 1]
+
+        if end - start == 1:
+            u[read_index] = [indices[start], scores[start]]
+        else:
+            nu[read_index] = [indices[start:end], scores[start:end], x_norm[start:end], weights[read_index]]
+
+    return u, nu, list(matrix.refs), list(matrix.read_ids)
+
+
+def em_compact(matrix, max_iter, epsilon, pi_prior, theta_prior):
+    """
+    Run the Pathoscope EM algorithm on a :class:`CompactMatrix`.
+
+    The returned weights cover every entry in the matrix. Entries for uniquely mapped reads are always ``1.0``.
+
+    :return: the initial and final pi, theta and the reassigned weights for each entry in the matrix
+
+    """
+    counts = numpy.diff(matrix.indptr)
+
+    unique = counts == 1
+    unique_entries = numpy.repeat(unique, counts)
+
+    multi_counts = counts[~unique]
+
+    indptr = numpy.zeros(len(multi_counts) + 1, dtype=numpy.int64)
+    numpy.cumsum(multi_counts, out=indptr[1:])
+
+    x_norm = normalize_compact_scores(matrix)
+
+    init_pi, pi, theta, multi_x_norm = em_arrays(
+        matrix.indices[unique_entries],
+        matrix.scores[unique_entries],
+        indptr,
+        matrix.indices[~unique_entries],
+        matrix.scores[~unique_entries],
+        matrix.weights[~unique],
+        x_norm[~unique_entries],
+        len(matrix.refs),
+        max_iter,
+        epsilon,
+        pi_prior,
+        theta_prior
+    )
+
+    x_norm[~unique_entries] = multi_x_norm
+
+    return init_pi.tolist(), pi.tolist(), theta.tolist(), x_norm
+
+
+def compute_best_hit_compact(matrix, x_norm):
+    """
+    A vectorized equivalent of :func:`compute_best_hit` for a :class:`CompactMatrix` and a weight for each entry in it.
+
+    """
+    ref_count = len(matrix.refs)
+    read_count = len(matrix.read_ids)
+
+    if len(x_norm):
+        counts = numpy.diff(matrix.indptr)
+
+        is_best = x_norm == numpy.repeat(numpy.maximum.reduceat(x_norm, matrix.indptr[:-1]), counts)
+
+        num_best = numpy.repeat(numpy.add.reduceat(is_best, matrix.indptr[:-1]), counts)
+
+        best_refs = matrix.indices[is_best]
+        best_x = x_norm[is_best]
+
+        best_hit_reads = numpy.bincount(best_refs, weights=1.0 / num_best[is_best], minlength=ref_count)
+        level_1_reads = numpy.bincount(best_refs[best_x >= 0.5], minlength=ref_count)
+        level_2_reads = numpy.bincount(best_refs[(best_x < 0.5) & (best_x >= 0.01)], minlength=ref_count)
+    else:
+        best_hit_reads = level_1_reads = level_2_reads = numpy.zeros(ref_count)
+
+    best_hit_reads = best_hit_reads.astype(numpy.float64)
+
+    return (
+        best_hit_reads.tolist(),
+        (best_hit_reads / read_count).tolist(),
+        (level_1_reads / read_count).tolist(),
+        (level_2_reads / read_count).tolist()
+    )
+
+
+def reassign_vta(matrix, x_norm, vta, p_score_cutoff):
+    """
+    Find the alignments in ``vta`` that should be kept after reassignment.
+
+    This selects the same alignments that :func:`rewrite_align` writes: the first alignment of each uniquely mapped read
+    and every alignment of a multi-mapping read whose reassigned weight meets ``p_score_cutoff``.
+
+    :param matrix: the compact matrix built from ``vta``
+    :param x_norm: the reassigned weight of each entry in ``matrix``
+    :param vta: the alignment columns
+    :param p_score_cutoff: the minimum reassigned weight
+    :return: a boolean mask over the alignments in ``vta``
+
+    """
+    if not len(vta.scores):
+        return numpy.zeros(0, dtype=bool)
+
+    unique_reads = numpy.diff(matrix.indptr) == 1
+
+    first_alignments = numpy.zeros(len(vta.scores), dtype=bool)
+    first_alignments[numpy.unique(vta.read_indexes, return_index=True)[1]] = True
+
+    return numpy.where(
+        unique_reads[vta.read_indexes],
+        first_alignments,
+        x_norm[matrix.entries] >= p_score_cutoff
+    )
+
+
+def write_vta(vta, mask, path):
+    """
+    Write the alignments in ``vta`` selected by ``mask`` to a VTA file at ``path``.
+
+    Lines are written exactly as they appeared in the source file.
+
+    """
+    read_ids = list(vta.read_ids)
+
+    selected = zip(
+        vta.read_indexes[mask].tolist(),
+        vta.ref_indexes[mask].tolist(),
+        vta.positions[mask].tolist(),
+        vta.lengths[mask].tolist(),
+        vta.scores[mask].tolist()
+    )
+
+    with open(path, "w") as handle:
+        for read_index, ref_index, pos, length, p_score in selected:
+            handle.write(f"{read_ids[read_index]},{vta.refs[ref_index]},{pos},{length},{p_score}\n")
+
+
+def calculate_vta_coverage(vta, mask, ref_lengths):
+    """
+    Calculate per-base depth for the alignments in ``vta`` selected by ``mask``.
+
+    Depths are calculated using difference arrays: each alignment adds one at its start position and subtracts one just
+    past its end, and a cumulative sum gives the depth at every position. All references are laid out in a single array
+    so the whole calculation is a handful of NumPy operations regardless of read depth. Alignments extending past the
+    end of a reference are truncated, as in :func:`calculate_coverage`.
+
+    Coverage, mean depth and median depth are calculated for each reference at the same time. They match the values
+    calculated from the depth lists by the Pathoscope job and :func:`virtool.analyses.format.calculate_median_depths`.
+
+    :param vta: the alignment columns
+    :param mask: a boolean mask selecting the alignments to use
+    :param ref_lengths: the lengths of the references keyed by reference id
+    :return: a dict of depth lists and a dict of coverage statistics, both keyed by reference id
+
+    """
+    ref_indexes = vta.ref_indexes[mask]
+
+    # References in order of their first appearance in the selected alignments.
+    ref_order = order_by_first_appearance(ref_indexes, len(vta.refs))[0].tolist()
+
+    lengths = numpy.array([ref_lengths[vta.refs[i]] for i in ref_order], dtype=numpy.int64)
+
+    # Each reference gets a region one element longer than itself so that end positions never spill into the next.
+    offsets = numpy.zeros(len(vta.refs), dtype=numpy.int64)
+    offsets[ref_order] = numpy.cumsum(lengths + 1) - (lengths + 1)
+
+    ref_capacity = numpy.zeros(len(vta.refs), dtype=numpy.int64)
+    ref_capacity[ref_order] = lengths
+
+    starts = vta.positions[mask] - 1
+    ends = numpy.minimum(starts + vta.lengths[mask], ref_capacity[ref_indexes])
+
+    valid = starts < ends
+
+    size = int((lengths + 1).sum())
+
+    diff = numpy.bincount(offsets[ref_indexes[valid]] + starts[valid], minlength=size)
+    diff -= numpy.bincount(offsets[ref_indexes[valid]] + ends[valid], minlength=size)
+
+    depths = numpy.cumsum(diff)
+
+    coverage_dict = dict()
+    stats = dict()
+
+    for ref_index, length in zip(ref_order, lengths.tolist()):
+        ref_id = vta.refs[ref_index]
+
+        offset = int(offsets[ref_index])
+        ref_depths = depths[offset:offset + length]
+
+        coverage_dict[ref_id] = ref_depths.tolist()
+
+        stats[ref_id] = {
+            "coverage": round(1 - (length - numpy.count_nonzero(ref_depths)) / length, 3),
+            "depth": round(int(ref_depths.sum()) / length),
+            "median": calculate_median(ref_depths)
+        }
+
+    return coverage_dict, stats
+
+
+def calculate_median(values):
+    """
+    Calculate the median of an integer array.
+
+    The return value is identical to that of :func:`statistics.median` called on the same values as a list: an
+    :class:`int` for odd-length input and a :class:`float` otherwise.
+
+    """
+    middle = len(values) // 2
+
+    if len(values) % 2:
+        return int(numpy.partition(values, middle)[middle])
+
+    partitioned = numpy.partition(values, [middle - 1, middle])
+
+    return (int(partitioned[middle - 1]) + int(partitioned[middle])) / 2
+
+
 def find_updated_score(nu, read_index, ref_index):
     try:
         index = nu[read_index][0].index(ref_index)
@@ -491,3 +1316,10 @@ def subtract(analysis_path, host_scores):
     shutil.move(out_path, vta_path)
 
     return len(subtracted_read_ids)
+
+
+#: The available implementations of the Pathoscope EM algorithm. See :func:`virtool.jobs.pathoscope.run_patho`.
+EM_ENGINES = {
+    "python": em,
+    "numpy": em_numpy
+}
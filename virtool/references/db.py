@@ -1,8 +1,9 @@
 import asyncio
+import hashlib
 import json.decoder
 import logging
 import os
-from typing import List, Union
+from typing import List, Tuple, Union
 
 import aiohttp
 import aiojobs.aiohttp
@@ -16,6 +17,7 @@ import virtool.github
 import virtool.history.db
 import virtool.history.utils
 import virtool.http.utils
+import virtool.indexes.db
 import virtool.otus.db
 import virtool.otus.utils
 import virtool.processes.db
@@ -45,6 +47,9 @@ PROJECTION = [
     "user"
 ]
 
+#: The number of OTUs written by each round of bulk writes when importing, cloning, or updating a reference.
+BULK_OTU_BATCH_SIZE = 500
+
 
 class CloneReferenceProcess(virtool.processes.process.Process):
 
@@ -64,40 +69,29 @@ class CloneReferenceProcess(virtool.processes.process.Process):
 
         tracker = self.get_tracker(len(manifest))
 
-        inserted_otu_ids = list()
-
-        for source_otu_id, version in manifest.items():
-            _, patched, _ = await virtool.history.db.patch_to_version(
-                self.app,
-                source_otu_id,
-                version
-            )
+        patched_otus = await virtool.history.db.patch_manifest(self.app, manifest)
 
-            otu_id = await insert_joined_otu(
-                self.db,
-                patched,
-                created_at,
-                ref_id,
-                user_id
-            )
-
-            inserted_otu_ids.append(otu_id)
+        inserted = await insert_joined_otus(
+            self.db,
+            list(patched_otus.values()),
+            created_at,
+            ref_id,
+            user_id,
+            progress_handler=tracker.add
+        )
 
-            await tracker.add(1)
+        self.intermediate["inserted"] = inserted
 
         await self.update_context({
-            "inserted_otu_ids": inserted_otu_ids
+            "inserted_otu_ids": [otu["_id"] for otu in inserted]
         })
 
     async def create_history(self):
-        user_id = self.context["user_id"]
-        inserted_otu_ids = self.context["inserted_otu_ids"]
+        inserted = self.intermediate["inserted"]
 
-        tracker = self.get_tracker(len(inserted_otu_ids))
+        tracker = self.get_tracker(len(inserted))
 
-        for otu_id in inserted_otu_ids:
-            await insert_change(self.app, otu_id, "clone", user_id)
-            await tracker.add(1)
+        await insert_changes(self.app, inserted, "clone", self.context["user_id"], progress_handler=tracker.add)
 
     async def cleanup(self):
         ref_id = self.context["ref_id"]
@@ -113,6 +107,7 @@ class CloneReferenceProcess(virtool.processes.process.Process):
             self.db.references.delete_one({"_id": ref_id}),
             self.db.history.delete_many(query),
             self.db.otus.delete_many(query),
+            self.db.snapshots.delete_many(query),
             self.db.sequences.delete_many(query),
             virtool.history.utils.remove_diff_files(self.app, diff_file_change_ids)
         )
@@ -127,17 +122,23 @@ class ImportReferenceProcess(virtool.processes.process.Process):
             self.load_file,
             self.set_metadata,
             self.validate,
-            self.import_otus,
-            self.create_history
+            self.import_otus
         ]
 
-        self.import_data = None
-
     async def load_file(self):
+        """
+        Stream through the reference file once to read its metadata, count its OTUs, and check it for errors. The OTUs
+        are read again in batches when they are imported.
+
+        """
         path = self.context["path"]
 
         try:
-            self.import_data = await self.run_in_thread(virtool.references.utils.load_reference_file, path)
+            metadata, otu_count, errors = await self.run_in_thread(
+                virtool.references.utils.check_reference_file,
+                path,
+                False
+            )
         except json.decoder.JSONDecodeError as err:
             return await self.error([{
                 "id": "json_error",
@@ -155,23 +156,20 @@ class ImportReferenceProcess(virtool.processes.process.Process):
                     "message": str(err)
                 }])
 
+        self.intermediate.update({
+            "metadata": metadata,
+            "otu_count": otu_count,
+            "errors": errors
+        })
+
     async def set_metadata(self):
         ref_id = self.context["ref_id"]
 
-        try:
-            data_type = self.import_data["data_type"]
-        except (TypeError, KeyError):
-            data_type = "genome"
+        metadata = self.intermediate["metadata"]
 
-        try:
-            organism = self.import_data["organism"]
-        except (TypeError, KeyError):
-            organism = ""
-
-        try:
-            targets = self.import_data["targets"]
-        except (TypeError, KeyError):
-            targets = None
+        data_type = metadata.get("data_type", "genome")
+        organism = metadata.get("organism", "")
+        targets = metadata.get("targets")
 
         update_dict = {
             "data_type": data_type,
@@ -186,50 +184,37 @@ class ImportReferenceProcess(virtool.processes.process.Process):
         })
 
     async def validate(self):
-        errors = virtool.references.utils.check_import_data(
-            self.import_data,
-            strict=False,
-            verify=True
-        )
+        errors = self.intermediate["errors"]
 
         if errors:
             return await self.error(errors)
 
     async def import_otus(self):
+        """
+        Stream the OTUs from the reference file in batches. Each batch is inserted and its history is recorded before
+        the next batch is parsed, so only one batch of OTUs is held in memory at a time.
+
+        """
         created_at = self.context["created_at"]
         ref_id = self.context["ref_id"]
         user_id = self.context["user_id"]
 
-        otus = self.import_data["otus"]
-
-        tracker = self.get_tracker(len(otus))
+        tracker = self.get_tracker(self.intermediate["otu_count"])
 
         inserted_otu_ids = list()
 
-        for otu in otus:
-            otu_id = await insert_joined_otu(self.db, otu, created_at, ref_id, user_id)
-            inserted_otu_ids.append(otu_id)
-            await tracker.add(1)
+        async for batch in read_reference_batches(self.app, self.context["path"]):
+            inserted = await insert_joined_otus(self.db, batch, created_at, ref_id, user_id)
 
-        await self.update_context({
-            "inserted_otu_ids": inserted_otu_ids
-        })
+            await insert_changes(self.app, inserted, "import", user_id)
 
-    async def create_history(self):
-        inserted_otu_ids = self.context["inserted_otu_ids"]
-        user_id = self.context["user_id"]
+            inserted_otu_ids += [otu["_id"] for otu in inserted]
 
-        tracker = self.get_tracker(len(inserted_otu_ids))
+            await tracker.add(len(batch))
 
-        for otu_id in inserted_otu_ids:
-            await insert_change(
-                self.app,
-                otu_id,
-                "import",
-                user_id
-            )
-
-            await tracker.add(1)
+        await self.update_context({
+            "inserted_otu_ids": inserted_otu_ids
+        })
 
 
 class RemoveReferenceProcess(virtool.processes.process.Process):
@@ -274,6 +259,7 @@ class RemoveReferenceProcess(virtool.processes.process.Process):
         await asyncio.gather(
             self.db.otus.delete_many({"_id": {"$in": unreferenced_otu_ids}}),
             self.db.history.delete_many({"otu.id": {"$in": unreferenced_otu_ids}}),
+            self.db.snapshots.delete_many({"otu.id": {"$in": unreferenced_otu_ids}}),
             self.db.sequences.delete_many({"otu_id": {"$in": unreferenced_otu_ids}}),
             virtool.history.utils.remove_diff_files(self.app, diff_file_change_ids)
         )
@@ -306,7 +292,6 @@ class UpdateRemoteReferenceProcess(virtool.processes.process.Process):
         self.steps = [
             self.download_and_extract,
             self.update_otus,
-            self.create_history,
             self.remove_otus,
             self.update_reference
         ]
@@ -317,81 +302,71 @@ class UpdateRemoteReferenceProcess(virtool.processes.process.Process):
 
         tracker = self.get_tracker(file_size)
 
-        try:
-            with virtool.utils.get_temp_dir() as tempdir:
-                temp_path = str(tempdir)
-
-                download_path = os.path.join(temp_path, "reference.tar.gz")
+        # The downloaded file is kept until the OTUs have been streamed from it in :meth:`.update_otus`. It is removed
+        # in :meth:`.cleanup` if the process fails before then.
+        temp_dir = virtool.utils.get_temp_dir()
 
-                await virtool.http.utils.download_file(
-                    self.app,
-                    url,
-                    download_path,
-                    tracker.add
-                )
+        self.intermediate["temp_dir"] = temp_dir
 
-                self.intermediate["update_data"] = await self.run_in_thread(
-                    virtool.references.utils.load_reference_file,
-                    download_path
-                )
+        download_path = os.path.join(temp_dir.name, "reference.tar.gz")
 
+        try:
+            await virtool.http.utils.download_file(
+                self.app,
+                url,
+                download_path,
+                tracker.add
+            )
         except (aiohttp.ClientConnectorError, virtool.errors.GitHubError):
             return await self.error([{
                 "id": "download_error",
                 "message": "Could not download reference data"
             }])
 
-    async def update_otus(self):
-        update_data = self.intermediate["update_data"]
-
-        tracker = self.get_tracker(len(update_data["otus"]))
+        try:
+            # Only the OTU count is needed. Updates from the official remote are not checked for errors.
+            _, otu_count, _ = await self.run_in_thread(virtool.references.utils.check_reference_file, download_path)
+        except Exception:
+            await self.cleanup()
+            raise
 
-        # The remote ids in the update otus.
-        otu_ids_in_update = {otu["_id"] for otu in update_data["otus"]}
+        self.intermediate.update({
+            "download_path": download_path,
+            "otu_count": otu_count
+        })
 
-        updated_list = list()
+    async def update_otus(self):
+        """
+        Stream the OTUs from the downloaded update in batches. Each batch is applied and its history is recorded before
+        the next batch is parsed.
 
-        for otu in update_data["otus"]:
-            old_or_id = await update_joined_otu(
-                self.db,
-                otu,
-                self.context["created_at"],
-                self.context["ref_id"],
-                self.context["user_id"]
-            )
+        """
+        user_id = self.context["user_id"]
 
-            if old_or_id is not None:
-                updated_list.append(old_or_id)
+        tracker = self.get_tracker(self.intermediate["otu_count"])
 
-            await tracker.add(1)
+        # The remote ids in the update otus.
+        otu_ids_in_update = set()
 
-        self.intermediate.update({
-            "otu_ids_in_update": otu_ids_in_update,
-            "updated_list": updated_list
-        })
+        try:
+            async for batch in read_reference_batches(self.app, self.intermediate["download_path"]):
+                otu_ids_in_update.update(otu["_id"] for otu in batch)
+
+                updated, inserted = await update_joined_otus(
+                    self.db,
+                    batch,
+                    self.context["created_at"],
+                    self.context["ref_id"],
+                    user_id
+                )
 
-    async def create_history(self):
-        updated_list = self.intermediate["updated_list"]
+                await insert_remote_changes(self.app, updated, inserted, user_id)
 
-        tracker = self.get_tracker(len(updated_list))
+                await tracker.add(len(batch))
+        finally:
+            await self.cleanup()
 
-        for old_or_id in updated_list:
-            try:
-                otu_id = old_or_id["_id"]
-                old = old_or_id
-            except TypeError:
-                otu_id = old_or_id
-                old = None
-
-            await insert_change(
-                self.app,
-                otu_id,
-                "update" if old else "remote",
-                self.context["user_id"],
-                old
-            )
-
-            await tracker.add(1)
+        self.intermediate["otu_ids_in_update"] = otu_ids_in_update
 
     async def remove_otus(self):
         # Delete OTUs with remote ids that were not in the update.
@@ -413,6 +388,16 @@ class UpdateRemoteReferenceProcess(virtool.processes.process.Process):
 
             await tracker.add(1)
 
+    async def cleanup(self):
+        """
+        Remove the temporary directory containing the downloaded update if it still exists.
+
+        """
+        temp_dir = self.intermediate.pop("temp_dir", None)
+
+        if temp_dir is not None:
+            await self.run_in_thread(temp_dir.cleanup)
+
     async def update_reference(self):
         ref_id = self.context["ref_id"]
         release = self.context["release"]
@@ -1039,24 +1024,30 @@ async def create_remote(db, settings: dict, release: dict, remote_from: str, use
     }
 
 
-async def download_and_parse_release(app, url: str, process_id: str, progress_handler: callable):
-    db = app["db"]
+async def download_and_check_release(app, url: str, path: str, process_id: str, progress_handler: callable):
+    """
+    Download a reference release to `path` and check it using :func:`virtool.references.utils.check_reference_file`.
 
-    with virtool.utils.get_temp_dir() as tempdir:
-        temp_path = str(tempdir)
+    :param app: the application object
+    :param url: the download URL for the release
+    :param path: the path to download the release to
+    :param process_id: the ID of the process installing the release
+    :param progress_handler: a coroutine function called with the number of bytes downloaded
+    :return: the release metadata, the number of OTUs in the release, and any errors
 
-        download_path = os.path.join(temp_path, "reference.tar.gz")
+    """
+    db = app["db"]
 
-        await virtool.http.utils.download_file(
-            app,
-            url,
-            download_path,
-            progress_handler
-        )
+    await virtool.http.utils.download_file(
+        app,
+        url,
+        path,
+        progress_handler
+    )
 
-        await virtool.processes.db.update(db, process_id, progress=0.3, step="unpack")
+    await virtool.processes.db.update(db, process_id, progress=0.3, step="unpack")
 
-        return await app["run_in_thread"](virtool.references.utils.load_reference_file, download_path)
+    return await app["run_in_thread"](virtool.references.utils.check_reference_file, path)
 
 
 async def edit(db, ref_id: str, data: dict) -> dict:
@@ -1105,47 +1096,110 @@ async def edit(db, ref_id: str, data: dict) -> dict:
     return virtool.utils.base_processor(document)
 
 
-async def export(app, ref_id, scope):
-    db = app["db"]
+async def get_export_manifest(db, ref_id: str) -> dict:
+    """
+    Get a manifest of the last indexed version of every built OTU in the reference identified by `ref_id`. This is the
+    manifest used for the ``built`` and ``remote`` export scopes.
+
+    :param db: the application database client
+    :param ref_id: the ID of the reference
+    :return: a manifest of OTU IDs and versions
+
+    """
+    return {d["_id"]: d["last_indexed_version"] async for d in db.otus.find({
+        "reference.id": ref_id,
+        "last_indexed_version": {"$ne": None}
+    }, ["last_indexed_version"])}
+
+
+async def get_export_cache_path(app, ref_id: str, scope: str, metadata: dict, manifest: dict) -> Union[str, None]:
+    """
+    Get the path where a ``built`` or ``remote`` scope export of the reference identified by `ref_id` is cached.
+
+    Exports are cached in the directory of the latest ready index, so they are removed along with the index files. The
+    file name includes a hash of the scope, metadata, and manifest, so any change to the exported data results in a
+    new path. Returns `None` if the reference has no index files to cache in.
+
+    :param app: the application object
+    :param ref_id: the ID of the reference
+    :param scope: the export scope
+    :param metadata: the reference metadata written to the export
+    :param manifest: the export manifest from :func:`.get_export_manifest`
+    :return: the cache path
+
+    """
+    index_id, _ = await virtool.indexes.db.get_current_id_and_version(app["db"], ref_id)
+
+    if index_id is None:
+        return None
+
+    index_path = os.path.join(app["settings"]["data_path"], "references", ref_id, index_id)
 
-    otu_list = list()
+    if not os.path.isdir(index_path):
+        return None
+
+    key = json.dumps([scope, metadata, sorted(manifest.items())], sort_keys=True)
+
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    # The name must not match ``reference.*`` so cached exports are not mistaken for Bowtie2 files.
+    return os.path.join(index_path, f"export.{scope}.{digest}.json.gz")
+
+
+async def iter_export(app, ref_id: str, scope: str, manifest: Union[dict, None] = None):
+    """
+    Asynchronously iterate over the cleaned OTUs in an export of the reference identified by `ref_id`.
+
+    OTUs are patched or joined in batches of :data:`.BULK_OTU_BATCH_SIZE` and yielded as soon as each batch is ready, so
+    the whole export is never held in memory.
+
+    :param app: the application object
+    :param ref_id: the ID of the reference
+    :param scope: the export scope
+    :param manifest: the manifest for the ``built`` and ``remote`` scopes if it has already been fetched
+    :return: an async generator that yields cleaned OTUs
+
+    """
+    db = app["db"]
 
     query = {
         "reference.id": ref_id
     }
 
-    if scope == "built" or scope == "remote":
-        query["last_indexed_version"] = {"$ne": None}
+    remote = scope == "remote"
+
+    if scope == "built" or remote:
+        if manifest is None:
+            manifest = await get_export_manifest(db, ref_id)
 
-        async for document in db.otus.find(query):
-            _, joined, _ = await virtool.history.db.patch_to_version(
+        items = list(manifest.items())
+
+        for offset in range(0, len(items), BULK_OTU_BATCH_SIZE):
+            patched_otus = await virtool.history.db.patch_manifest(
                 app,
-                document["_id"],
-                document["last_indexed_version"]
+                dict(items[offset:offset + BULK_OTU_BATCH_SIZE])
             )
 
-            otu_list.append(joined)
+            for otu in virtool.references.utils.clean_export_list(patched_otus.values(), remote):
+                yield otu
 
     elif scope == "unbuilt":
-        async for document in db.otus.find(query):
+        async for document in db.otus.find(query, ["_id"]):
             last_verified = await virtool.history.db.patch_to_verified(
                 app,
                 document["_id"]
             )
 
-            otu_list.append(last_verified)
+            yield virtool.references.utils.clean_export_list([last_verified], remote)[0]
 
     else:
-        async for document in db.otus.find(query):
-            current = await virtool.otus.db.join(
-                db,
-                document["_id"],
-                document
-            )
+        otu_ids = await db.otus.distinct("_id", query)
 
-            otu_list.append(current)
+        for offset in range(0, len(otu_ids), BULK_OTU_BATCH_SIZE):
+            joined = await virtool.otus.db.join_many(db, {"_id": {"$in": otu_ids[offset:offset + BULK_OTU_BATCH_SIZE]}})
 
-    return virtool.references.utils.clean_export_list(otu_list, scope == "remote")
+            for otu in virtool.references.utils.clean_export_list(joined, remote):
+                yield otu
 
 
 async def finish_remote(app, release, ref_id: str, created_at: str, process_id: str, user_id: str):
@@ -1159,155 +1213,202 @@ async def finish_remote(app, release, ref_id: str, created_at: str, process_id:
         increment=0.02
     )
 
-    try:
-        import_data = await download_and_parse_release(
-            app,
-            release["download_url"],
-            process_id,
-            progress_tracker.add
-        )
-    except (aiohttp.ClientConnectorError, virtool.errors.GitHubError):
-        return await virtool.processes.db.update(
+    with virtool.utils.get_temp_dir() as tempdir:
+        download_path = os.path.join(str(tempdir), "reference.tar.gz")
+
+        try:
+            metadata, otu_count, errors = await download_and_check_release(
+                app,
+                release["download_url"],
+                download_path,
+                process_id,
+                progress_tracker.add
+            )
+        except (aiohttp.ClientConnectorError, virtool.errors.GitHubError):
+            return await virtool.processes.db.update(
+                db,
+                process_id,
+                errors=["Could not download reference data"]
+            )
+
+        try:
+            data_type = metadata["data_type"]
+        except KeyError:
+            return await virtool.processes.db.update(
+                db,
+                process_id,
+                errors=["Could not infer data type"]
+            )
+
+        await db.references.update_one({"_id": ref_id}, {
+            "$set": {
+                "data_type": data_type,
+                "organism": metadata.get("organism", "Unknown")
+            }
+        })
+
+        if errors:
+            return await virtool.processes.db.update(db, process_id, errors=errors)
+
+        await virtool.processes.db.update(
             db,
             process_id,
-            errors=["Could not download reference data"]
+            progress=0.4,
+            step="import"
         )
 
-    try:
-        data_type = import_data["data_type"]
-    except KeyError:
-        return await virtool.processes.db.update(
+        progress_tracker = virtool.processes.process.ProgressTracker(
             db,
             process_id,
-            errors=["Could not infer data type"]
+            otu_count,
+            factor=0.6,
+            initial=0.4
         )
 
-    await db.references.update_one({"_id": ref_id}, {
+        async for batch in read_reference_batches(app, download_path):
+            inserted = await insert_joined_otus(db, batch, created_at, ref_id, user_id, remote=True)
+
+            await insert_changes(app, inserted, "remote", user_id)
+
+            await progress_tracker.add(len(batch))
+
+    await db.references.update_one({"_id": ref_id, "updates.id": release["id"]}, {
         "$set": {
-            "data_type": data_type,
-            "organism": import_data.get("organism", "Unknown")
+            "installed": virtool.github.create_update_subdocument(release, True, user_id),
+            "updates.$.ready": True,
+            "updating": False
         }
     })
 
-    errors = virtool.references.utils.check_import_data(
-        import_data,
-        strict=True,
-        verify=True
-    )
+    await fetch_and_update_release(app, ref_id)
 
-    if errors:
-        return await virtool.processes.db.update(db, process_id, errors=errors)
+    await virtool.processes.db.update(db, process_id, progress=1)
 
-    await virtool.processes.db.update(
-        db,
-        process_id,
-        progress=0.4,
-        step="import"
-    )
 
-    otus = import_data["otus"]
+async def insert_changes(
+        app,
+        otus: List[dict],
+        verb: str,
+        user_id: str,
+        olds: Union[None, List[dict]] = None,
+        progress_handler: Union[None, callable] = None
+):
+    """
+    Insert history documents for many OTUs in bulk. The joined OTUs are passed in instead of being read from the
+    database.
 
-    progress_tracker = virtool.processes.process.ProgressTracker(
-        db,
-        process_id,
-        len(otus),
-        factor=0.3,
-        initial=0.4
-    )
+    :param app: the application object
+    :param otus: the joined OTUs the changes are for
+    :param verb: the change verb (eg. import, clone)
+    :param user_id: the ID of the requesting user
+    :param olds: the old joined OTU documents in the same order as `otus`
+    :param progress_handler: a coroutine function called with the number of changes inserted after each batch
 
-    inserted_otu_ids = list()
+    """
+    olds = olds or [None] * len(otus)
 
-    for otu in otus:
-        otu_id = await insert_joined_otu(
-            db,
-            otu,
-            created_at,
-            ref_id,
-            user_id,
-            remote=True
-        )
-        inserted_otu_ids.append(otu_id)
-        await progress_tracker.add(1)
+    for offset in range(0, len(otus), BULK_OTU_BATCH_SIZE):
+        batch = otus[offset:offset + BULK_OTU_BATCH_SIZE]
 
-    await virtool.processes.db.update(
-        db,
-        process_id,
-        progress=0.7,
-        step="create_history"
-    )
+        await virtool.history.db.add_many(app, [
+            (verb, old, otu, virtool.references.utils.compose_change_description(verb, otu))
+            for otu, old in zip(batch, olds[offset:offset + BULK_OTU_BATCH_SIZE])
+        ], user_id)
 
-    progress_tracker = virtool.processes.process.ProgressTracker(
-        db,
-        process_id,
-        len(otus),
-        factor=0.3,
-        initial=0.7
-    )
+        if progress_handler:
+            await progress_handler(len(batch))
 
-    for otu_id in inserted_otu_ids:
-        await insert_change(
-            app,
-            otu_id,
-            "remote",
-            user_id
-        )
 
-        await progress_tracker.add(1)
+async def insert_remote_changes(app, updated: List[dict], inserted: List[dict], user_id: str):
+    """
+    Insert history documents for OTUs updated and inserted by :func:`.update_joined_otus`.
 
-    await db.references.update_one({"_id": ref_id, "updates.id": release["id"]}, {
-        "$set": {
-            "installed": virtool.github.create_update_subdocument(release, True, user_id),
-            "updates.$.ready": True,
-            "updating": False
-        }
-    })
+    Updated OTUs are joined again in bulk because sequences missing from the update are left in place.
 
-    await fetch_and_update_release(app, ref_id)
+    :param app: the application object
+    :param updated: the old joined documents of updated OTUs
+    :param inserted: the joined documents of inserted OTUs
+    :param user_id: the ID of the requesting user
 
-    await virtool.processes.db.update(db, process_id, progress=1)
+    """
+    if updated:
+        joined = {otu["_id"]: otu for otu in await virtool.otus.db.join_many(app["db"], {
+            "_id": {
+                "$in": [old["_id"] for old in updated]
+            }
+        })}
+
+        await insert_changes(app, [joined[old["_id"]] for old in updated], "update", user_id, olds=updated)
+
+    await insert_changes(app, inserted, "remote", user_id)
 
 
-async def insert_change(app, otu_id: str, verb: str, user_id: str, old: Union[None, dict] = None):
+async def insert_joined_otus(
+        db,
+        otus: List[dict],
+        created_at,
+        ref_id: str,
+        user_id: str,
+        remote: bool = False,
+        progress_handler: Union[None, callable] = None
+) -> List[dict]:
     """
-    Insert a history document for the OTU identified by `otu_id` and the passed `verb`.
+    Insert many joined OTUs and their sequences using unordered bulk inserts of :data:`.BULK_OTU_BATCH_SIZE` OTUs at a
+    time. No messages are dispatched.
 
-    :param app: the application object
-    :param otu_id: the ID of the OTU the change is for
-    :param verb: the change verb (eg. remove, insert)
+    :param db: the application database client
+    :param otus: the joined OTUs to insert
+    :param created_at: the creation timestamp for the OTUs
+    :param ref_id: the ID of the reference the OTUs are being added to
     :param user_id: the ID of the requesting user
-    :param old: the old joined OTU document
+    :param remote: the OTUs are from a remote reference and their IDs should be stored as remote IDs
+    :param progress_handler: a coroutine function called with the number of OTUs inserted after each batch
+    :return: the inserted OTUs joined with their inserted sequences
 
     """
-    db = app["db"]
+    inserted = list()
 
-    # Join the otu document into a complete otu record. This will be used for recording history.
-    joined = await virtool.otus.db.join(db, otu_id)
+    for offset in range(0, len(otus), BULK_OTU_BATCH_SIZE):
+        batch = [
+            prepare_joined_otu(otu, created_at, ref_id, user_id, remote=remote)
+            for otu in otus[offset:offset + BULK_OTU_BATCH_SIZE]
+        ]
 
-    name = joined["name"]
+        await virtool.db.utils.insert_many_with_new_ids(db.otus, [otu for otu, _ in batch])
 
-    e = "" if verb[-1] == "e" else "e"
+        for otu, sequences in batch:
+            for sequence in sequences:
+                sequence["otu_id"] = otu["_id"]
 
-    # Build a ``description`` field for the otu creation change document.
-    description = f"{verb.capitalize()}{e}d {name}"
+        await virtool.db.utils.insert_many_with_new_ids(db.sequences, [s for _, sequences in batch for s in sequences])
 
-    abbreviation = joined.get("abbreviation")
+        inserted += [virtool.otus.utils.merge_otu(otu, sequences) for otu, sequences in batch]
 
-    # Add the abbreviation to the description if there is one.
-    if abbreviation:
-        description = f"{description} ({abbreviation})"
+        if progress_handler:
+            await progress_handler(len(batch))
 
-    await virtool.history.db.add(
-        app,
-        verb,
-        old,
-        joined,
-        description,
-        user_id,
-        silent=True
-    )
+    return inserted
+
+
+def prepare_joined_otu(
+        otu: dict,
+        created_at,
+        ref_id: str,
+        user_id: str,
+        remote: bool = False
+) -> Tuple[dict, List[dict]]:
+    """
+    Split an imported joined OTU into an OTU document and sequence documents ready for insertion. The sequence documents
+    are not assigned an ``otu_id``.
 
+    :param otu: the joined OTU to prepare
+    :param created_at: the creation timestamp for the OTU
+    :param ref_id: the ID of the reference the OTU is being added to
+    :param user_id: the ID of the requesting user
+    :param remote: the OTU is from a remote reference and its ID should be stored as its remote ID
+    :return: the OTU document and its sequence documents
 
-async def insert_joined_otu(db, otu, created_at, ref_id, user_id, remote=False):
+    """
     all_sequences = list()
 
     issues = virtool.otus.utils.verify(otu)
@@ -1359,12 +1460,28 @@ async def insert_joined_otu(db, otu, created_at, ref_id, user_id, remote=False):
                 }
             })
 
-    document = await db.otus.insert_one(otu, silent=True)
+    return otu, all_sequences
 
-    for sequence in all_sequences:
-        await db.sequences.insert_one(dict(sequence, otu_id=document["_id"]), silent=True)
 
-    return document["_id"]
+async def read_reference_batches(app, path: str):
+    """
+    Asynchronously iterate over batches of :data:`.BULK_OTU_BATCH_SIZE` OTUs streamed from the reference file at `path`.
+    Each batch is parsed in a thread so the event loop isn't blocked.
+
+    :param app: the application object
+    :param path: the path to the gzipped reference file
+    :return: an async generator that yields lists of OTUs
+
+    """
+    batches = virtool.references.utils.read_reference_batches(path, BULK_OTU_BATCH_SIZE)
+
+    while True:
+        batch = await app["run_in_thread"](next, batches, None)
+
+        if batch is None:
+            return
+
+        yield batch
 
 
 async def refresh_remotes(app):
@@ -1417,65 +1534,128 @@ async def update(req, created_at, process_id, ref_id, release, user_id):
     return release, update_subdocument
 
 
-async def update_joined_otu(db, otu, created_at, ref_id, user_id):
-    remote_id = otu["_id"]
+def compose_remote_otu_update(otu: dict, otu_id: str, ref_id: str) -> Tuple[dict, List[dict]]:
+    """
+    Compose the update for an existing OTU from a remote joined OTU and the sequence documents that should be updated
+    or inserted. The sequences are removed from the isolates in `otu`.
 
-    old = await virtool.otus.db.join(db, {"reference.id": ref_id, "remote.id": remote_id})
+    :param otu: the joined OTU from the remote reference
+    :param otu_id: the ID of the existing OTU
+    :param ref_id: the ID of the reference being updated
+    :return: the OTU update and the sequence updates
 
-    if old:
-        if not virtool.references.utils.check_will_change(old, otu):
-            return None
+    """
+    sequence_updates = list()
 
-        sequence_updates = list()
+    for isolate in otu["isolates"]:
+        for sequence in isolate.pop("sequences"):
+            sequence_updates.append({
+                "accession": sequence["accession"],
+                "definition": sequence["definition"],
+                "host": sequence["host"],
+                "segment": sequence.get("segment", ""),
+                "sequence": sequence["sequence"],
+                "otu_id": otu_id,
+                "isolate_id": isolate["id"],
+                "reference": {
+                    "id": ref_id
+                },
+                "remote": {
+                    "id": sequence["_id"]
+                }
+            })
 
-        for isolate in otu["isolates"]:
-            for sequence in isolate.pop("sequences"):
-                sequence_updates.append({
-                    "accession": sequence["accession"],
-                    "definition": sequence["definition"],
-                    "host": sequence["host"],
-                    "segment": sequence.get("segment", ""),
-                    "sequence": sequence["sequence"],
-                    "otu_id": old["_id"],
-                    "isolate_id": isolate["id"],
-                    "reference": {
-                        "id": ref_id
-                    },
-                    "remote": {
-                        "id": sequence["_id"]
-                    }
-                })
-
-        await db.otus.update_one({"_id": old["_id"]}, {
-            "$inc": {
-                "version": 1
-            },
-            "$set": {
-                "abbreviation": otu["abbreviation"],
-                "name": otu["name"],
-                "lower_name": otu["name"].lower(),
-                "isolates": otu["isolates"],
-                "schema": otu.get("schema", list())
+    update = {
+        "$inc": {
+            "version": 1
+        },
+        "$set": {
+            "abbreviation": otu["abbreviation"],
+            "name": otu["name"],
+            "lower_name": otu["name"].lower(),
+            "isolates": otu["isolates"],
+            "schema": otu.get("schema", list())
+        }
+    }
+
+    return update, sequence_updates
+
+
+async def update_joined_otus(
+        db,
+        otus: List[dict],
+        created_at,
+        ref_id: str,
+        user_id: str,
+        progress_handler: Union[None, callable] = None
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Update or insert many remote joined OTUs using unordered bulk writes of :data:`.BULK_OTU_BATCH_SIZE` OTUs at a time.
+    No messages are dispatched.
+
+    :param db: the application database client
+    :param otus: the joined OTUs from the remote reference update
+    :param created_at: the creation timestamp for inserted OTUs
+    :param ref_id: the ID of the reference being updated
+    :param user_id: the ID of the requesting user
+    :param progress_handler: a coroutine function called with the number of OTUs handled after each batch
+    :return: the old joined documents of updated OTUs and the joined documents of inserted OTUs
+
+    """
+    updated = list()
+    inserted = list()
+
+    for offset in range(0, len(otus), BULK_OTU_BATCH_SIZE):
+        batch = otus[offset:offset + BULK_OTU_BATCH_SIZE]
+
+        olds = {old["remote"]["id"]: old for old in await virtool.otus.db.join_many(db, {
+            "reference.id": ref_id,
+            "remote.id": {
+                "$in": [otu["_id"] for otu in batch]
             }
-        })
+        })}
 
-        for sequence_update in sequence_updates:
-            remote_sequence_id = sequence_update["remote"]["id"]
+        otu_requests = list()
+        sequence_requests = list()
+        new_otus = list()
 
-            update_result = await db.sequences.update_one({"reference.id": ref_id, "remote.id": remote_sequence_id}, {
-                "$set": sequence_update
-            })
+        for otu in batch:
+            old = olds.get(otu["_id"])
 
-            if not update_result.matched_count:
-                await db.sequences.insert_one(sequence_update)
+            if old is None:
+                new_otus.append(otu)
+                continue
 
-        return old
+            if not virtool.references.utils.check_will_change(old, otu):
+                continue
 
-    return await insert_joined_otu(
-        db,
-        otu,
-        created_at,
-        ref_id,
-        user_id,
-        remote=True
-    )
+            update, sequence_updates = compose_remote_otu_update(otu, old["_id"], ref_id)
+
+            otu_requests.append(pymongo.UpdateOne({"_id": old["_id"]}, update))
+
+            for sequence_update in sequence_updates:
+                sequence_requests.append(pymongo.UpdateOne(
+                    {"reference.id": ref_id, "remote.id": sequence_update["remote"]["id"]},
+                    {
+                        "$set": sequence_update,
+                        "$setOnInsert": {
+                            "_id": virtool.utils.random_alphanumeric(8)
+                        }
+                    },
+                    upsert=True
+                ))
+
+            updated.append(old)
+
+        if otu_requests:
+            await db.otus.bulk_write(otu_requests, ordered=False)
+
+        if sequence_requests:
+            await db.sequences.bulk_write(sequence_requests, ordered=False)
+
+        inserted += await insert_joined_otus(db, new_otus, created_at, ref_id, user_id, remote=True)
+
+        if progress_handler:
+            await progress_handler(len(batch))
+
+    return updated, inserted
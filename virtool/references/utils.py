@@ -1,5 +1,7 @@
 import gzip
 import json
+import re
+from typing import Generator, List, Tuple
 
 from cerberus import Validator
 from operator import itemgetter
@@ -33,42 +35,192 @@ SEQUENCE_KEYS = [
     "sequence"
 ]
 
+#: The number of decompressed characters read from a reference file at a time by :class:`.ReferenceFileReader`.
+STREAM_CHUNK_SIZE = 64 * 1024
 
-def check_import_data(import_data, strict=True, verify=True):
-    errors = detect_duplicates(import_data["otus"])
+WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
 
-    v = Validator(get_import_schema(require_meta=strict), allow_unknown=True)
 
-    v.validate(import_data)
+class ReferenceFileReader:
+    """
+    Incrementally parses a gzipped reference file. Iterating over the reader yields the OTUs in the file one at a time
+    without loading the whole file into memory.
 
-    if v.errors:
-        errors.append({
-            "id": "file",
-            "issues": v.errors
-        })
+    Other top-level fields are collected in :attr:`metadata` as they are encountered, so they are only complete once
+    iteration has finished. They are parsed whole and are expected to be small. Each iteration reads the file again.
 
-    otus = dict()
+    :param path: the path to the gzipped reference file
+    :param chunk_size: the number of decompressed characters to read at a time
 
-    for otu in import_data["otus"]:
-        verification = None
+    """
 
-        if verify:
-            verification = virtool.otus.utils.verify(otu)
+    def __init__(self, path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
 
-        validation = validate_otu(otu, strict)
+        #: The top-level fields of the reference file other than the OTU list.
+        self.metadata = dict()
 
-        issues = dict()
+        #: Whether a top-level ``otus`` list was found.
+        self.has_otus = False
 
-        if verification:
-            issues["verification"] = verification
+        self._decoder = json.JSONDecoder()
+        self._handle = None
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
 
-        if validation:
-            issues["validation"] = validation
+    def __iter__(self) -> Generator[dict, None, None]:
+        self.metadata = dict()
+        self.has_otus = False
 
-        if issues:
-            otus[otu["_id"]] = issues
+        with gzip.open(self.path, "rt") as handle:
+            self._handle = handle
+            self._buffer = ""
+            self._pos = 0
+            self._eof = False
 
-    return errors
+            yield from self._parse_object()
+
+    def _parse_object(self) -> Generator[dict, None, None]:
+        self._consume("{")
+
+        if self._peek() == "}":
+            return
+
+        while True:
+            key = self._decode()
+
+            self._consume(":")
+
+            if key == "otus" and self._peek() == "[":
+                self.has_otus = True
+                yield from self._parse_otus()
+            else:
+                self.metadata[key] = self._decode()
+
+            if self._consume(",}") == "}":
+                return
+
+    def _parse_otus(self) -> Generator[dict, None, None]:
+        self._consume("[")
+
+        if self._peek() == "]":
+            self._consume("]")
+            return
+
+        while True:
+            yield self._decode()
+
+            if self._consume(",]") == "]":
+                return
+
+    def _read(self):
+        """
+        Read more data into the buffer, discarding what has already been parsed. At least as much data as remains
+        unparsed is read so that large values are decoded in a number of attempts logarithmic in their size.
+
+        """
+        data = self._handle.read(max(self.chunk_size, len(self._buffer) - self._pos))
+
+        if not data:
+            self._eof = True
+
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+
+    def _peek(self) -> str:
+        """
+        Skip whitespace and return the next character without consuming it.
+
+        """
+        while True:
+            self._pos = WHITESPACE_RE.match(self._buffer, self._pos).end()
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if self._eof:
+                raise json.JSONDecodeError("Unexpected end of file", self._buffer, self._pos)
+
+            self._read()
+
+    def _consume(self, expected: str) -> str:
+        """
+        Skip whitespace and consume the next character. It must be one of the characters in `expected`.
+
+        """
+        char = self._peek()
+
+        if char not in expected:
+            raise json.JSONDecodeError(f"Expected one of '{expected}'", self._buffer, self._pos)
+
+        self._pos += 1
+
+        return char
+
+    def _decode(self):
+        """
+        Decode the next JSON value. More data is read until the value can be decoded and is followed by at least one
+        character, so that values like numbers are not cut short at the end of the buffer.
+
+        """
+        self._peek()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+
+            self._read()
+
+
+def check_reference_file(path: str, strict: bool = True) -> Tuple[dict, int, list]:
+    """
+    Check a gzipped reference file for duplicates and invalid metadata while streaming through it once. The file is
+    never loaded into memory whole.
+
+    :param path: the path to the gzipped reference file
+    :param strict: require metadata fields
+    :return: the file metadata, the number of OTUs in the file, and any errors
+
+    """
+    reader = ReferenceFileReader(path)
+
+    otu_count = 0
+
+    def count_otus():
+        nonlocal otu_count
+
+        for otu in reader:
+            otu_count += 1
+            yield otu
+
+    errors = detect_duplicates(count_otus())
+
+    document = dict(reader.metadata)
+
+    if reader.has_otus:
+        document["otus"] = list()
+
+    v = Validator(get_import_schema(require_meta=strict), allow_unknown=True)
+
+    v.validate(document)
+
+    if v.errors:
+        errors.append({
+            "id": "file",
+            "issues": v.errors
+        })
+
+    return reader.metadata, otu_count, errors
 
 
 def check_will_change(old, imported):
@@ -166,6 +318,28 @@ def clean_otu(otu, otu_keys=None, sequence_keys=None):
     return cleaned
 
 
+def compose_change_description(verb: str, otu: dict) -> str:
+    """
+    Compose a description for a change recording a bulk reference operation on an OTU (eg. Imported Foo virus (FV)).
+
+    :param verb: the change verb (eg. import, clone)
+    :param otu: the joined OTU
+    :return: the description
+
+    """
+    e = "" if verb[-1] == "e" else "e"
+
+    description = f"{verb.capitalize()}{e}d {otu['name']}"
+
+    abbreviation = otu.get("abbreviation")
+
+    # Add the abbreviation to the description if there is one.
+    if abbreviation:
+        description = f"{description} ({abbreviation})"
+
+    return description
+
+
 def detect_duplicate_abbreviation(joined, duplicates, seen):
     abbreviation = joined.get("abbreviation", "")
 
@@ -399,20 +573,26 @@ def get_sequence_schema(require_id):
     }
 
 
-def load_reference_file(path):
+def read_reference_batches(path: str, batch_size: int) -> Generator[List[dict], None, None]:
     """
-    Load a list of merged otus documents from a file associated with a Virtool reference file.
+    Stream the OTUs in a gzipped reference file in lists of up to `batch_size` OTUs.
 
-    :param path: the path to the otus.json.gz file
-    :type path: str
-
-    :return: the otus data to import
-    :rtype: dict
+    :param path: the path to the gzipped reference file
+    :param batch_size: the maximum number of OTUs in each batch
+    :return: a generator that yields lists of OTUs
 
     """
-    with open(path, "rb") as handle:
-        with gzip.open(handle, "rt") as gzip_file:
-            return json.load(gzip_file)
+    batch = list()
+
+    for otu in ReferenceFileReader(path):
+        batch.append(otu)
+
+        if len(batch) == batch_size:
+            yield batch
+            batch = list()
+
+    if batch:
+        yield batch
 
 
 def validate_otu(otu, strict):
@@ -0,0 +1,135 @@
+"""
+Block-oriented parsing of SAM output from aligners.
+
+Jobs receive aligner output from subprocess pipes in large blocks rather than one line at a time. Only the columns
+needed by Virtool are extracted and they are handed to handlers in batches.
+
+"""
+import collections
+from typing import Callable, List
+
+#: The maximum number of bytes to read from an aligner's STDOUT at a time.
+BLOCK_SIZE = 1024 * 1024
+
+#: A batch of mapped alignments. Each field is a list with one item per alignment. Scores are Bowtie2 alignment scores
+#: plus read length, as calculated by :func:`virtool.pathoscope.find_sam_align_score`.
+SAMBatch = collections.namedtuple("SAMBatch", [
+    "read_ids",
+    "flags",
+    "ref_ids",
+    "positions",
+    "lengths",
+    "scores"
+])
+
+
+class SAMBlockReader:
+    """
+    A callable that receives SAM text in arbitrary blocks of bytes, parses every complete line, and passes the mapped
+    alignments to ``handler`` as a :class:`SAMBatch`.
+
+    Incomplete trailing lines are held until the next block arrives. Call :meth:`.close` once the stream has ended to
+    parse any remaining partial line.
+
+    :param handler: a function that is called with a :class:`SAMBatch` for each block
+
+    """
+
+    def __init__(self, handler: Callable[[SAMBatch], None]):
+        self._handler = handler
+        self._remainder = b""
+
+    def __call__(self, block: bytes):
+        data = self._remainder + block
+
+        end = data.rfind(b"\n")
+
+        if end == -1:
+            self._remainder = data
+            return
+
+        self._remainder = data[end + 1:]
+
+        batch = parse_sam_lines(data[:end].decode().split("\n"))
+
+        if batch.read_ids:
+            self._handler(batch)
+
+    def close(self):
+        """
+        Parse and handle any partial line left over from the last block.
+
+        """
+        if self._remainder:
+            batch = parse_sam_lines([self._remainder.decode()])
+
+            self._remainder = b""
+
+            if batch.read_ids:
+                self._handler(batch)
+
+
+def parse_sam_lines(lines: List[str]) -> SAMBatch:
+    """
+    Extract the read id, flag, reference id, position, sequence length, and alignment score from each mapped alignment
+    in ``lines``.
+
+    Header lines, unmapped alignments, and alignments with no reference are skipped. Only the first eleven columns are
+    split out of each line. The optional fields are searched as a single string for the ``AS:i`` tag.
+
+    :param lines: SAM lines without trailing newlines
+    :return: the mapped alignments
+
+    """
+    batch = SAMBatch([], [], [], [], [], [])
+
+    for line in lines:
+        if not line or line[0] == "@" or line[0] == "#":
+            continue
+
+        fields = line.split("\t", 11)
+
+        flag = int(fields[1])
+
+        # Bitwise FLAG - 0x4: segment unmapped
+        if flag & 0x4:
+            continue
+
+        ref_id = fields[2]
+
+        if ref_id == "*":
+            continue
+
+        read_length = len(fields[9])
+
+        batch.read_ids.append(fields[0])
+        batch.flags.append(flag)
+        batch.ref_ids.append(ref_id)
+        batch.positions.append(int(fields[3]))
+        batch.lengths.append(read_length)
+        batch.scores.append(find_align_score(fields[11] if len(fields) == 12 else "") + read_length)
+
+    return batch
+
+
+def find_align_score(tags: str) -> float:
+    """
+    Find the Bowtie2 alignment score in the tab-separated optional fields of a SAM line.
+
+    :param tags: the optional fields of a SAM line
+    :return: the alignment score
+
+    """
+    if tags.startswith("AS:i:"):
+        start = 5
+    else:
+        start = tags.find("\tAS:i:")
+
+        if start == -1:
+            raise ValueError("Could not find alignment score")
+
+        start += 6
+
+    end = tags.find("\t", start)
+
+    return float(tags[start:] if end == -1 else tags[start:end])
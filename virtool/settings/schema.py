@@ -72,6 +72,31 @@ SCHEMA = {
             "isolate",
             "strain"
         ]
+    },
+
+    # Job scheduling
+    "job_priorities": {
+        "type": "dict",
+        "keysrules": {
+            "type": "string"
+        },
+        "valuesrules": {
+            "type": "integer"
+        },
+        "default": {}
+    },
+    "job_fair_share": {
+        "type": "boolean",
+        "default": True
+    },
+    "job_backfill": {
+        "type": "boolean",
+        "default": True
+    },
+    "job_backfill_timeout": {
+        "type": "integer",
+        "min": 0,
+        "default": 3600
     }
 }
 
@@ -2,6 +2,7 @@ import datetime
 import gzip
 import os
 import re
+import resource
 import shutil
 import subprocess
 import sys
@@ -195,6 +196,24 @@ async def get_client_path() -> str:
             return path
 
 
+def get_peak_rss() -> int:
+    """
+    Return the peak resident set size of the calling process in bytes.
+
+    Job processes can use this to report how much memory a stage actually needed.
+
+    :return: the peak RSS in bytes
+
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # The value is reported in bytes on macOS and in kilobytes everywhere else.
+    if sys.platform == "darwin":
+        return peak
+
+    return peak * 1024
+
+
 def get_static_hash(req):
     try:
         client_path = req.app["client_path"]